@@ -0,0 +1,52 @@
+"""
+Gunicorn configuration for running new_api in production.
+
+Usage:
+    gunicorn -c gunicorn.conf.py new_api.wsgi:application
+
+Every setting can be overridden through the environment variables below.
+"""
+
+import multiprocessing
+import os
+
+from decouple import config
+
+
+def default_workers():
+    # Gunicorn's recommended starting point: (2 x CPUs) + 1
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+bind = config("GUNICORN_BIND", default="0.0.0.0:8000")
+workers = config("GUNICORN_WORKERS", default=default_workers(), cast=int)
+worker_class = config("GUNICORN_WORKER_CLASS", default="gthread")
+threads = config("GUNICORN_THREADS", default=4, cast=int)
+timeout = config("GUNICORN_TIMEOUT", default=30, cast=int)
+graceful_timeout = config("GUNICORN_GRACEFUL_TIMEOUT", default=30, cast=int)
+keepalive = config("GUNICORN_KEEPALIVE", default=5, cast=int)
+
+# Recycle workers periodically to cap memory growth; jitter avoids
+# restarting every worker at the same moment.
+max_requests = config("GUNICORN_MAX_REQUESTS", default=1000, cast=int)
+max_requests_jitter = config("GUNICORN_MAX_REQUESTS_JITTER", default=100, cast=int)
+
+# Import Django once in the master and fork ready workers from it.
+preload_app = config("GUNICORN_PRELOAD", default=True, cast=bool)
+
+# Heartbeat files on tmpfs so workers are not stalled by a slow disk (Docker).
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = config("GUNICORN_ACCESS_LOG", default="-")
+errorlog = "-"
+loglevel = config("GUNICORN_LOG_LEVEL", default="info")
+
+
+def post_fork(server, worker):
+    # With preload_app the master may have opened database connections while
+    # importing the app; a forked worker must never reuse the parent's socket.
+    from django.db import connections
+
+    for conn in connections.all(initialized_only=True):
+        conn.close()
@@ -1,5 +1,52 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Exists, OuterRef
+from django.http import JsonResponse
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ValidationError
+
 from .models import Asset
+from .pagination import ORDERING, after_q, decode_cursor, encode_cursor
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Uses PostgreSQL's planner estimate instead of COUNT(*) for unfiltered
+    changelists on large tables; exact counts everywhere else.
+
+    A partitioned table has no rows of its own (its reltuples stays -1), so
+    the estimate is the sum over its partitions; a partition that was never
+    analyzed makes it unknown, and the count exact.
+    """
+    estimate_threshold = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT COALESCE(
+                        (SELECT CASE WHEN bool_or(part.reltuples < 0) THEN -1 ELSE sum(part.reltuples) END
+                         FROM pg_inherits JOIN pg_class part ON part.oid = pg_inherits.inhrelid
+                         WHERE pg_inherits.inhparent = table_class.oid),
+                        table_class.reltuples
+                    )::bigint
+                    FROM pg_class table_class
+                    WHERE table_class.oid = to_regclass(%s)
+                    """,
+                    [connection.ops.quote_name(queryset.model._meta.db_table)],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.estimate_threshold:
+                return row[0]
+        return super().count
+
 
 @admin.register(Asset)
 class AssetAdmin(admin.ModelAdmin):
@@ -9,3 +56,61 @@ class AssetAdmin(admin.ModelAdmin):
     )
     list_filter = ('asset_type', 'is_active')
     search_fields = ('asset_name', 'description')
+    list_select_related = ('parent',)
+    autocomplete_fields = ('parent',)  # no <select> of every asset in the table
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Children per tree request; the tree page loads further pages on demand
+    tree_page_size = 500
+
+    def get_urls(self):
+        urls = [
+            path('tree/', self.admin_site.admin_view(self.tree_view), name='hierarchy_asset_tree'),
+            path('tree/children/', self.admin_site.admin_view(self.tree_children_view),
+                 name='hierarchy_asset_tree_children'),
+        ]
+        return urls + super().get_urls()
+
+    def tree_view(self, request):
+        """Browse the hierarchy, expanding one level at a time."""
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Asset tree',
+        }
+        return TemplateResponse(request, 'admin/hierarchy/asset/tree.html', context)
+
+    def tree_children_view(self, request):
+        """
+        One page of the direct children of ?parent=<id> (organizations when
+        omitted), as JSON. ?root=<id> (the parent's root_id) prunes the
+        lookup to one partition; ?cursor=<next_cursor> continues a level.
+        """
+        if not self.has_view_or_change_permission(request):
+            return JsonResponse({"error": "Forbidden"}, status=403)
+
+        try:
+            parent_id, root_id = (
+                int(request.GET[name]) if request.GET.get(name) else None for name in ('parent', 'root')
+            )
+            after = decode_cursor(request.GET['cursor']) if request.GET.get('cursor') else None
+        except ValueError:
+            return JsonResponse({"error": "parent and root must be asset ids"}, status=400)
+        except ValidationError:
+            return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+        queryset = Asset.objects.filter(parent_id=parent_id) if parent_id else Asset.objects.filter(parent__isnull=True)
+        if root_id is not None:
+            queryset = queryset.filter(root_id=root_id)
+        if after is not None:
+            queryset = queryset.filter(after_q(*after[1:]))
+        nodes = list(
+            queryset.annotate(
+                has_children=Exists(Asset.objects.filter(root_id=OuterRef('root_id'), parent_id=OuterRef('pk')))
+            ).order_by(*ORDERING)
+            .values('id', 'root_id', 'asset_name', 'asset_type', 'is_active', 'has_children')[:self.tree_page_size + 1]
+        )
+        has_more = len(nodes) > self.tree_page_size
+        nodes = nodes[:self.tree_page_size]
+        next_cursor = encode_cursor(0, nodes[-1]['asset_name'], nodes[-1]['id']) if has_more else None
+        return JsonResponse({"children": nodes, "has_more": has_more, "next_cursor": next_cursor})
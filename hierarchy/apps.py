@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class HierarchyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hierarchy'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .telemetry import configure_tracing
+
+        configure_tracing()
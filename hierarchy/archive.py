@@ -0,0 +1,88 @@
+"""
+Moving decommissioned assets from hierarchy_asset to ArchivedAsset.
+
+An asset is expired when it is inactive or its end_date has passed. Only
+expired assets without live children are archived, so every batch takes
+leaves and a fully expired subtree drains bottom-up over successive batches,
+while an expired asset that still has a live child stays put. Each batch is
+its own short transaction (copy, then delete), so the job can be stopped at
+any point and simply re-run.
+
+Batches walk the expired rows in id order from where the previous batch
+stopped (``after_id``) through the partial ``asset_expirable_id_idx`` index,
+so no batch rescans what earlier ones passed. Parents only become leaves once
+their children are gone, so when a pass over the table archived anything,
+another pass starts from the first id; the job ends after a pass that moved
+nothing.
+"""
+
+import datetime
+
+from django.db import router, transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .models import ArchivedAsset, Asset
+
+
+def expired_q(today=None):
+    today = today or datetime.date.today()
+    return Q(is_active=False) | Q(end_date__lt=today)
+
+
+def archivable(today=None):
+    """Expired assets that no live asset points to as parent."""
+    return (
+        Asset.objects.filter(expired_q(today))
+        .filter(~Exists(Asset.objects.filter(root_id=OuterRef('root_id'), parent_id=OuterRef('pk'))))
+        .order_by('id')
+    )
+
+
+def archive_batch(batch_size, today=None, after_id=0):
+    """
+    Archive up to ``batch_size`` leaves with an id above ``after_id``.
+    Returns how many were moved and the last id considered, which the next
+    batch continues after (None when there were no candidates left).
+    """
+    using = router.db_for_write(Asset)
+    candidates = list(
+        archivable(today).using(using).filter(id__gt=after_id).values_list('id', flat=True)[:batch_size]
+    )
+    if not candidates:
+        return 0, None
+
+    with transaction.atomic(using=using):
+        # Re-check under row locks: a child may have been added meanwhile.
+        # Rows other transactions hold are skipped until a later pass.
+        rows = list(
+            archivable(today).using(using).filter(id__in=candidates)
+            .select_for_update(skip_locked=True, of=('self',))
+            .values_list(*ArchivedAsset.COPIED_FIELDS)
+        )
+        if rows:
+            ArchivedAsset.objects.using(using).bulk_create(
+                [ArchivedAsset(**dict(zip(ArchivedAsset.COPIED_FIELDS, row))) for row in rows]
+            )
+            # Regular delete so the change feed records tombstones (one INSERT per batch)
+            Asset.objects.using(using).filter(id__in=[row[0] for row in rows]).delete()
+    return len(rows), candidates[-1]
+
+
+def archive_batches(batch_size, today=None, after_id=0):
+    """
+    Run batches until a pass over the table archives nothing, yielding
+    ``(moved, last_id)`` after each; ``last_id`` resumes an interrupted run.
+    """
+    # Only a pass from the first id that moved nothing proves there is no
+    # more work; a resumed run's first pass covers just the tail
+    full_pass, moved_in_pass = after_id == 0, 0
+    while True:
+        moved, last_id = archive_batch(batch_size, today, after_id)
+        if last_id is None:
+            if full_pass and not moved_in_pass:
+                return
+            full_pass, moved_in_pass, after_id = True, 0, 0  # parents that became leaves
+            continue
+        moved_in_pass += moved
+        after_id = last_id
+        yield moved, last_id
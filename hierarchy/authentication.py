@@ -0,0 +1,153 @@
+"""
+Authentication classes that skip the per-request database work.
+
+``CachedTokenAuthentication`` resolves tokens from a bounded in-process
+TTL/LRU cache instead of running the token + user join on every request.
+``CachedBasicAuthentication`` remembers verified credentials so the password
+hash runs once per TTL instead of on every request.
+
+Every entry records the auth version it was filled under. The version lives
+in a cache shared by all workers (``AUTH_CACHE_ALIAS``) and is replaced once a
+token, user, group or permission change commits (see ``hierarchy.signals``),
+so every worker stops serving its entries on the next request. A hit costs
+one read of that key instead of the database join. The version is read
+before the database lookup that fills an entry, so a lookup racing with a
+change is stored under the old version and never served.
+
+Each request gets its own copy of the cached user, without the permission
+caches Django fills on it.
+"""
+
+import copy
+import hashlib
+import hmac
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.authentication import BasicAuthentication, TokenAuthentication
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire ``ttl`` seconds after insertion."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+auth_cache = TTLCache(
+    maxsize=getattr(settings, 'AUTH_CACHE_MAXSIZE', 10_000),
+    ttl=getattr(settings, 'AUTH_CACHE_TTL', 60),
+)
+
+
+VERSION_KEY = 'auth-version'
+
+# Filled by ModelBackend on the user instance; never kept across requests
+PERMISSION_CACHES = ('_perm_cache', '_user_perm_cache', '_group_perm_cache')
+
+
+def _shared_cache():
+    return caches[getattr(settings, 'AUTH_CACHE_ALIAS', 'default')]
+
+
+def current_version():
+    return _shared_cache().get(VERSION_KEY)
+
+
+def invalidate():
+    """Retire every cached credential in every worker once the current transaction commits."""
+    transaction.on_commit(
+        lambda: _shared_cache().set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    )
+
+
+def _cache_key(*parts):
+    # Keyed HMAC so raw tokens and passwords never sit in memory as dict keys
+    message = '\0'.join(parts).encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def _detach(user, auth):
+    """Copies of ``user`` and its token (``auth``, None for Basic) private to one request."""
+    user = copy.copy(user)
+    if auth is not None:
+        auth = copy.copy(auth)
+        auth.user = user
+    return user, auth
+
+
+def _cached(cache_key):
+    """
+    (version, credentials) for ``cache_key``: the current auth version and the
+    cached (user, auth), or None unless it was cached under that version.
+    """
+    version = current_version()
+    entry = auth_cache.get(cache_key)
+    if entry is None or entry[0] != version:
+        return version, None
+    return version, _detach(*entry[1])
+
+
+def _store(cache_key, version, user, auth):
+    user, auth = _detach(user, auth)
+    for name in PERMISSION_CACHES:
+        user.__dict__.pop(name, None)
+    auth_cache.set(cache_key, (version, (user, auth)))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key('token', key)
+        version, cached = _cached(cache_key)
+        if cached is not None:
+            return cached
+
+        user, token = super().authenticate_credentials(key)
+        _store(cache_key, version, user, token)
+        return user, token
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    def authenticate_credentials(self, userid, password, request=None):
+        cache_key = _cache_key('basic', userid, password)
+        version, cached = _cached(cache_key)
+        if cached is not None:
+            return cached
+
+        user, auth = super().authenticate_credentials(userid, password, request)
+        _store(cache_key, version, user, auth)
+        return user, auth
@@ -0,0 +1,230 @@
+"""
+Change feed over AssetChange.
+
+Consumers call ``/api/assets/changes/?since=<cursor>`` with the cursor of
+the last page they applied and receive the current state of every asset
+changed after it, or a tombstone for deleted ones. With ``wait=<seconds>``
+the request long-polls and returns as soon as a change is committed.
+
+Sequence numbers are allocated at insert time, so a long transaction (a bulk
+ingest partition, an archive batch) can commit a low seq after others have
+committed higher ones. Paging by seq would skip it for good. The feed is
+therefore read in (xact_id, seq) order, the id of the writing transaction
+first, and on PostgreSQL only up to ``pg_snapshot_xmin``, the oldest
+transaction still running: every change below it is committed or rolled
+back, and every later commit sorts above it. The price is that a running
+transaction holds back newer changes until it ends. The cursor is that
+(xact_id, seq) position.
+
+Deleting assets records their tombstones with one bulk INSERT per delete
+call (``batched_tombstones``), and ``prune_changes`` compacts the log: it drops
+changes older than CHANGE_FEED_RETENTION_DAYS that a newer change to the same
+asset supersedes, and old tombstones. ``since=0`` therefore still returns
+every live asset; a consumer further behind than the retention period may
+miss deletions and should resync from ``since=0``.
+"""
+
+import contextlib
+import contextvars
+import datetime
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Asset, AssetChange, fetch_values
+
+# Woken on every local commit that recorded a change; waiters in other worker
+# processes fall back to polling every POLL_INTERVAL seconds.
+_changed = threading.Condition()
+POLL_INTERVAL = 1.0
+
+
+def _notify():
+    with _changed:
+        _changed.notify_all()
+
+
+# Tombstones collected by pre_delete while a batched_tombstones block is open
+_pending_tombstones = contextvars.ContextVar('pending_tombstones', default=None)
+
+
+def record_change(asset, operation):
+    AssetChange.objects.create(asset_id=asset.pk, asset_uuid=asset.uuid, operation=operation)
+    transaction.on_commit(_notify)
+
+
+def record_deletion(asset):
+    """Tombstone of ``asset``, queued if a batched_tombstones block is open."""
+    pending = _pending_tombstones.get()
+    if pending is None:
+        record_change(asset, 'delete')
+    else:
+        pending.append(AssetChange(asset_id=asset.pk, asset_uuid=asset.uuid, operation='delete'))
+
+
+@contextlib.contextmanager
+def batched_tombstones(using):
+    """
+    Insert the tombstones of every asset deleted inside the block with one
+    bulk INSERT, in the same transaction as the DELETEs. Nested blocks are
+    flushed by the outermost one.
+    """
+    if _pending_tombstones.get() is not None:
+        yield
+        return
+    pending = []
+    token = _pending_tombstones.set(pending)
+    try:
+        with transaction.atomic(using=using):
+            yield
+            if pending:
+                AssetChange.objects.using(using).bulk_create(pending, batch_size=1000)
+                transaction.on_commit(_notify, using=using)
+    finally:
+        _pending_tombstones.reset(token)
+
+
+def prunable_changes(before):
+    """Changes made before ``before`` that consumers no longer need."""
+    superseded = AssetChange.objects.filter(asset_id=OuterRef('asset_id'), seq__gt=OuterRef('seq'))
+    return AssetChange.objects.filter(changed_at__lt=before).filter(
+        Q(operation='delete') | Exists(superseded)
+    )
+
+
+def prune_changes(before=None, batch_size=1000):
+    """
+    Delete prunable changes older than ``before`` (default: now minus
+    CHANGE_FEED_RETENTION_DAYS) in batches of ``batch_size`` rows, each in its
+    own short transaction. Returns the number of rows deleted.
+    """
+    if before is None:
+        before = timezone.now() - datetime.timedelta(days=retention_days())
+    total = 0
+    while True:
+        with transaction.atomic():
+            seqs = list(prunable_changes(before).order_by('seq').values_list('seq', flat=True)[:batch_size])
+            if not seqs:
+                return total
+            total += AssetChange.objects.filter(seq__in=seqs).delete()[0]
+
+
+# Feed position (xact_id, seq) before the first change
+START = (0, 0)
+
+
+def encode_cursor(position):
+    return '%d.%d' % position
+
+
+def decode_cursor(cursor):
+    if not cursor or cursor == '0':
+        return START
+    try:
+        xact_id, seq = (int(part) for part in cursor.split('.'))
+    except ValueError:
+        raise ValidationError({"since": ["Invalid cursor"]})
+    return xact_id, seq
+
+
+def settled(queryset):
+    """
+    Changes no running transaction can still sort before: on PostgreSQL those
+    of transactions older than the oldest one running, plus the reader's own.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset  # one writer at a time
+    return queryset.filter(
+        Q(xact_id__lt=RawSQL("pg_snapshot_xmin(pg_current_snapshot())::text::bigint", []))
+        | Q(xact_id=RawSQL("pg_current_xact_id_if_assigned()::text::bigint", []))
+    )
+
+
+def after(position):
+    """Settled changes after ``position`` in feed order."""
+    xact_id, seq = position
+    return settled(
+        AssetChange.objects.filter(xact_id__gte=xact_id)  # sargable bound for the index
+        .filter(Q(xact_id__gt=xact_id) | Q(seq__gt=seq))
+    )
+
+
+def latest_position(using=None):
+    """Position of the newest settled change, START if there is none."""
+    queryset = AssetChange.objects.using(using) if using else AssetChange.objects.all()
+    return settled(queryset).order_by('-xact_id', '-seq').values_list('xact_id', 'seq').first() or START
+
+
+def changes_since(position, limit):
+    """
+    The latest change per asset among the next ``limit`` settled changes
+    after ``position``, as (changes, last position, has_more).
+    """
+    page = list(
+        after(position)
+        .order_by('xact_id', 'seq')
+        .values_list('xact_id', 'seq', 'asset_id', 'asset_uuid', 'operation')[:limit + 1]
+    )
+    has_more = len(page) > limit
+    page = page[:limit]
+    if not page:
+        return [], position, False
+
+    latest = {}
+    for change in page:
+        latest.pop(change[2], None)  # keep the position of the newest change
+        latest[change[2]] = change[1:]
+    return list(latest.values()), page[-1][:2], has_more
+
+
+def wait_for_changes(position, timeout):
+    """Block until a settled change after ``position`` exists or ``timeout`` seconds pass."""
+    deadline = time.monotonic() + timeout
+    while True:
+        if after(position).exists():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        with _changed:
+            _changed.wait(min(remaining, POLL_INTERVAL))
+
+
+def build_feed(position, limit, reader):
+    """Response payload for one page of the change feed."""
+    changes, position, has_more = changes_since(position, limit)
+
+    live_ids = [asset_id for _, asset_id, _, operation in changes if operation != 'delete']
+    columns = reader.query_columns('id')
+    id_index = columns.index('id')
+    rows = {
+        row[id_index]: row
+        for row in fetch_values(Asset.objects.filter(id__in=live_ids).order_by(), columns)
+    } if live_ids else {}
+    serialized = dict(zip(rows, reader.serialize_rows(list(rows.values()))))
+
+    results = []
+    for seq, asset_id, asset_uuid, operation in changes:
+        results.append({
+            "seq": seq,
+            "operation": operation,
+            "id": asset_id,
+            "uuid": str(asset_uuid),
+            # None is a tombstone: the asset no longer exists
+            "asset": serialized.get(asset_id),
+        })
+    return {"changes": results, "cursor": encode_cursor(position), "has_more": has_more}
+
+
+def max_wait():
+    return getattr(settings, 'CHANGE_FEED_MAX_WAIT', 30)
+
+
+def retention_days():
+    return getattr(settings, 'CHANGE_FEED_RETENTION_DAYS', 30)
@@ -0,0 +1,177 @@
+"""
+Read-replica routing for the hierarchy app.
+
+Reads of hierarchy models go to one of ``settings.DATABASE_REPLICAS``;
+everything else (writes, other apps, transactions) goes to ``default``.
+``ReplicaPinningMiddleware`` pins a request to the primary while it writes and
+for ``REPLICA_STICKY_SECONDS`` afterwards, so a client always reads its own
+writes.
+
+A request reads from one replica only, chosen at its first read: replicas lag
+by different amounts, and a response assembled from two of them (the change
+feed and the rows it points at, say) could contradict itself. A replica that
+fails a query is re-probed, marked down if the probe fails too, and the
+request is answered again from the primary.
+"""
+
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'default'
+
+_pinned = contextvars.ContextVar('replica_pinned', default=False)
+_request_replica = contextvars.ContextVar('request_replica', default=None)
+
+# alias -> (is_healthy, checked_at)
+_health = {}
+_health_lock = threading.Lock()
+
+
+def pin_to_primary(pinned=True):
+    """Route reads in the current context to the primary. Returns a reset token."""
+    return _pinned.set(pinned)
+
+
+def unpin(token):
+    _pinned.reset(token)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+class ReplicaChoice:
+    """The replica serving one request's reads, chosen on the first read."""
+
+    def __init__(self):
+        self.alias = None
+        self.failed = False
+
+
+def begin_request():
+    """Start a per-request replica choice. Returns a reset token."""
+    return _request_replica.set(ReplicaChoice())
+
+
+def end_request(token):
+    _request_replica.reset(token)
+
+
+def request_replica():
+    """The replica the current request reads from, or None."""
+    choice = _request_replica.get()
+    alias = choice.alias if choice is not None else None
+    return alias if alias != PRIMARY else None
+
+
+def note_error(exc):
+    """
+    Called with the exception that ended a request. If it is a connection
+    error and the request's replica no longer answers, the replica is marked
+    down and the request flagged for a retry on the primary (see
+    ``replica_failed``). Returns True in that case.
+    """
+    alias = request_replica()
+    if alias is None or not isinstance(exc, (OperationalError, InterfaceError)):
+        return False
+    if confirm_down(alias):
+        _request_replica.get().failed = True
+        return True
+    return False
+
+
+def replica_failed():
+    """True if the current request's replica failed (see ``note_error``)."""
+    choice = _request_replica.get()
+    return choice is not None and choice.failed
+
+
+def _check_replica(alias):
+    """
+    True if the replica answers. An open connection is probed with a query
+    (``is_usable``); a closed one is opened, bounded by the alias'
+    ``connect_timeout``.
+    """
+    connection = connections[alias]
+    try:
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
+        connection.ensure_connection()
+        return True
+    except Exception:
+        try:
+            connection.close()
+        except Exception:
+            pass
+        logger.warning("Replica %s is unreachable, routing reads to the primary", alias)
+        return False
+
+
+def confirm_down(alias):
+    """
+    Re-probe ``alias`` after a query on it failed. If it does not answer,
+    route reads away from it until its next health check and return True.
+    """
+    if _check_replica(alias):
+        return False
+    _health[alias] = (False, time.monotonic())
+    return True
+
+
+def is_healthy(alias):
+    """Cached replica health; re-checked every REPLICA_HEALTH_CHECK_INTERVAL seconds."""
+    interval = getattr(settings, 'REPLICA_HEALTH_CHECK_INTERVAL', 10)
+    now = time.monotonic()
+    healthy, checked_at = _health.get(alias, (True, None))
+    if checked_at is not None and now - checked_at < interval:
+        return healthy
+
+    with _health_lock:
+        healthy, checked_at = _health.get(alias, (True, None))
+        if checked_at is None or now - checked_at >= interval:
+            healthy = _check_replica(alias)
+            _health[alias] = (healthy, now)
+    return healthy
+
+
+def choose_replica():
+    replicas = [alias for alias in getattr(settings, 'DATABASE_REPLICAS', []) if is_healthy(alias)]
+    if not replicas:
+        return PRIMARY
+    return random.choice(replicas)
+
+
+class ReplicaRouter:
+    route_app_labels = {'hierarchy'}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in self.route_app_labels:
+            return PRIMARY
+        # Reads inside a transaction must see that transaction's writes
+        if is_pinned() or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        choice = _request_replica.get()
+        if choice is None:
+            return choose_replica()
+        if choice.alias is None:
+            choice.alias = choose_replica()
+        return choice.alias
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so rows from any alias may be related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        return db not in getattr(settings, 'DATABASE_REPLICAS', [])
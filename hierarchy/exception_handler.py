@@ -4,6 +4,8 @@ from rest_framework.response import Response
 from rest_framework import status
 from opentelemetry.trace import get_current_span
 
+from . import db_routers
+
 # Create a logger for this module
 logger = logging.getLogger(__name__)
 
@@ -30,8 +32,9 @@ def custom_exception_handler(exc, context):
     if response is not None:
         # Log warning-level handled errors
         logger.warning(
-            f"[{view_name}] User={username} TraceID={trace_id} SpanID={span_id} "
-            f"Handled exception: {exc} — Status: {response.status_code}"
+            "[%s] User=%s TraceID=%s SpanID=%s Handled exception: %s — Status: %s",
+            view_name, username, trace_id, span_id, exc, response.status_code,
+            extra={"trace_id": trace_id, "span_id": span_id, "status": response.status_code},
         )
 
         custom_response = {
@@ -43,12 +46,20 @@ def custom_exception_handler(exc, context):
         }
         return Response(custom_response, status=response.status_code)
 
-    # Log critical unhandled exceptions
-    logger.error(
-        f"[{view_name}] User={username} TraceID={trace_id} SpanID={span_id} "
-        f"Unhandled exception: {exc}",
-        exc_info=True
-    )
+    if db_routers.note_error(exc):
+        # ReplicaPinningMiddleware answers the request again from the primary
+        logger.warning(
+            "[%s] TraceID=%s Replica failed, retrying on the primary: %s", view_name, trace_id, exc,
+            extra={"trace_id": trace_id, "span_id": span_id},
+        )
+    else:
+        # Log critical unhandled exceptions
+        logger.error(
+            "[%s] User=%s TraceID=%s SpanID=%s Unhandled exception: %s",
+            view_name, username, trace_id, span_id, exc,
+            exc_info=True,
+            extra={"trace_id": trace_id, "span_id": span_id},
+        )
 
     return Response({
         "success": False,
@@ -0,0 +1,130 @@
+"""
+Query-string filters and facet counts for the asset list.
+
+    ?asset_type=plant,Building    one or more types (default: organization)
+    ?is_active=true               true / false
+    ?root=<id>                    assets of one organization (any type unless
+                                  asset_type is given)
+    ?start_date_from=2025-01-01   inclusive date ranges, also start_date_to,
+                                  end_date_from and end_date_to
+    ?facets=asset_type,is_active  add per-value counts to the response
+
+Any list broader than the organizations (other asset types, ?root= or
+?include_archived=) is paginated; see hierarchy/pagination.py.
+
+Facets are disjunctive: the counts for one facet ignore that facet's own
+filter but apply every other one, so clients can show how many rows each
+alternative value would return. All counts come from one GROUP BY over the
+(asset_type, is_active) index, combined in Python.
+"""
+
+import datetime
+
+from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+
+from .models import Asset
+
+ASSET_TYPES = [value for value, _ in Asset.ASSET_TYPES]
+FACETS = ('asset_type', 'is_active')
+DATE_FILTERS = {
+    'start_date_from': 'start_date__gte',
+    'start_date_to': 'start_date__lte',
+    'end_date_from': 'end_date__gte',
+    'end_date_to': 'end_date__lte',
+}
+BOOLEANS = {'true': True, '1': True, 'false': False, '0': False}
+
+
+class AssetFilter:
+    """
+    Parsed filters for one request; ``facet_q`` holds the faceted ones
+    separately, and ``facet_values`` the values each of them accepts.
+    """
+
+    def __init__(self, params):
+        errors = {}
+        self.q = Q()
+        self.facet_q = {}
+        self.facet_values = {}
+
+        asset_types = [value.strip() for value in params.get('asset_type', '').split(',') if value.strip()]
+        unknown = sorted(set(asset_types) - set(ASSET_TYPES))
+        if unknown:
+            errors['asset_type'] = [f"Unknown asset type(s): {', '.join(unknown)}"]
+        if not asset_types and 'root' not in params:
+            asset_types = ['organization']  # the list's historical behaviour
+        # Anything but the organization list can be arbitrarily long: paginate it
+        self.broad = asset_types != ['organization']
+        if asset_types:
+            self.facet_q['asset_type'] = Q(asset_type__in=asset_types)
+            self.facet_values['asset_type'] = set(asset_types)
+
+        if 'is_active' in params:
+            value = BOOLEANS.get(params['is_active'].lower())
+            if value is None:
+                errors['is_active'] = ["Must be true or false"]
+            else:
+                self.facet_q['is_active'] = Q(is_active=value)
+                self.facet_values['is_active'] = {value}
+
+        if 'root' in params:
+            try:
+                self.q &= Q(root_id=int(params['root']))
+            except ValueError:
+                errors['root'] = ["Must be an asset id"]
+
+        for param, lookup in DATE_FILTERS.items():
+            if param in params:
+                try:
+                    self.q &= Q(**{lookup: datetime.date.fromisoformat(params[param])})
+                except ValueError:
+                    errors[param] = ["Must be a date in YYYY-MM-DD format"]
+
+        facets = [name.strip() for name in params.get('facets', '').split(',') if name.strip()]
+        unknown = sorted(set(facets) - set(FACETS))
+        if unknown:
+            errors['facets'] = [f"Unknown facet(s): {', '.join(unknown)}"]
+        self.facets = [name for name in FACETS if name in facets]
+
+        if errors:
+            raise ValidationError(errors)
+
+    def combined(self, exclude=None):
+        q = self.q
+        for name, facet_q in self.facet_q.items():
+            if name != exclude:
+                q &= facet_q
+        return q
+
+    def facet_counts(self, queryset):
+        """``{"count": n, facet: {value: n}}`` for the requested facets, in one query."""
+        # Filters on facets that were not requested can narrow the scan; the
+        # requested ones are applied per group below
+        q = self.q
+        for name, facet_q in self.facet_q.items():
+            if name not in self.facets:
+                q &= facet_q
+        groups = [
+            ({'asset_type': row['asset_type'], 'is_active': bool(row['is_active'])}, row['rows'])
+            for row in queryset.filter(q).order_by().values('asset_type', 'is_active').annotate(rows=Count('*'))
+        ]
+
+        def matches(group, exclude=None):
+            return all(
+                group[name] in values
+                for name, values in self.facet_values.items() if name in self.facets and name != exclude
+            )
+
+        result = {'count': sum(rows for group, rows in groups if matches(group))}
+        values = {'asset_type': ASSET_TYPES, 'is_active': [True, False]}
+        for facet in self.facets:
+            counts = dict.fromkeys(values[facet], 0)
+            for group, rows in groups:
+                if group[facet] in counts and matches(group, exclude=facet):
+                    counts[group[facet]] += rows
+            result[facet] = {
+                str(value).lower() if isinstance(value, bool) else value: count
+                for value, count in counts.items()
+            }
+        return result
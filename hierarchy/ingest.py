@@ -0,0 +1,190 @@
+"""
+Bulk creation of assets from uploaded rows (JSON objects or CSV lines).
+
+Rows name their parent by ``asset_name``; organizations come first, then
+every other row in file order, so a parent must appear before its children.
+
+``ingest_rows`` is the sequential path used by BulkUploadView.
+``parallel_ingest`` first creates the organizations, then splits the rest
+into independent subtrees (one per asset directly below an organization),
+packs them into one partition per worker and ingests every partition in its
+own transaction. Results are merged per partition.
+
+Only the bulk_ingest command runs the partitions in a pool of forked
+processes, each with its own connection. Forking a request-serving Gunicorn
+worker (with its other threads, sockets and connection pool) is unsafe, so
+``BulkUploadView`` ingests the same partitions one after the other.
+"""
+
+import csv
+import heapq
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from django.conf import settings
+from django.db import DatabaseError, connection, connections, transaction
+
+from .models import Asset
+from .serializers import AssetSerializer
+
+
+class IngestError(Exception):
+    """A row could not be created; ``detail`` is the 400 response body."""
+
+    def __init__(self, detail):
+        super().__init__(detail)
+        self.detail = detail
+
+
+def read_csv_rows(file):
+    """Rows of an uploaded CSV file, with empty cells as None."""
+    reader = csv.DictReader(io.StringIO(file.read().decode('utf-8')))
+    return [{key: (value if value != "" else None) for key, value in row.items()} for row in reader]
+
+
+def _create(row, root_id=None):
+    serializer = AssetSerializer(data=row)
+    if root_id is not None:
+        # The parent lives below root_id: look it up in that partition only
+        serializer.fields['parent'].queryset = Asset.objects.filter(root_id=root_id)
+    if not serializer.is_valid():
+        raise IngestError(dict(serializer.errors))
+    return serializer.save()
+
+
+def ingest_rows(rows, parents=None):
+    """
+    Create ``rows`` in hierarchy order. ``parents`` maps names of
+    organizations that already exist to their ids. Returns the name -> id map
+    of created assets.
+    """
+    known = dict(parents or {})
+    roots = dict(known)  # name -> root id, for organizations their own id
+    created = {}
+
+    # First pass: create top-level assets (organization)
+    for row in rows:
+        if row.get('asset_type') == 'organization':
+            asset = _create({**row, 'parent': None})
+            known[asset.asset_name] = created[asset.asset_name] = asset.id
+            roots[asset.asset_name] = asset.root_id
+
+    # Second pass: create child assets
+    for row in rows:
+        if row.get('asset_type') == 'organization':
+            continue
+        parent_name = row.get('parent')  # parent should be asset_name now
+        if parent_name not in known:
+            raise IngestError({"error": f"Parent '{parent_name}' not found. Upload parents first."})
+        asset = _create({**row, 'parent': known[parent_name]}, roots.get(parent_name))
+        known[asset.asset_name] = created[asset.asset_name] = asset.id
+        roots[asset.asset_name] = asset.root_id
+    return created
+
+
+# -------------------- Partitioning --------------------
+def split_subtrees(rows):
+    """
+    Non-organization rows grouped by the subtree they belong to, keyed by the
+    name of the asset directly below the organization. Raises IngestError
+    before anything is written if a row's ancestry doesn't reach one.
+    """
+    by_name = {row.get('asset_name'): row for row in rows}
+    subtree_of = {}
+    subtrees = {}
+    for row in rows:
+        if row.get('asset_type') == 'organization':
+            continue
+        path = []
+        current = row
+        while True:
+            name = current.get('asset_name')
+            if name in subtree_of:
+                key = subtree_of[name]
+                break
+            parent = by_name.get(current.get('parent'))
+            if parent is None or name in path:
+                raise IngestError({"error": f"Parent '{current.get('parent')}' not found. Upload parents first."})
+            path.append(name)
+            if parent.get('asset_type') == 'organization':
+                key = name
+                break
+            current = parent
+        for name in path:
+            subtree_of[name] = key
+        subtrees.setdefault(key, []).append(row)
+    return subtrees
+
+
+def pack(subtrees, partitions):
+    """
+    Spread subtrees over at most ``partitions`` lists of roughly equal row
+    counts (largest first onto the lightest partition). Rows keep file order
+    within each subtree.
+    """
+    heap = [(0, index, []) for index in range(partitions)]
+    for key in sorted(subtrees, key=lambda key: len(subtrees[key]), reverse=True):
+        size, index, names = heapq.heappop(heap)
+        names.append(key)
+        heapq.heappush(heap, (size + len(subtrees[key]), index, names))
+    return [names for _, _, names in sorted(heap, key=lambda item: item[1]) if names]
+
+
+def ingest_partition(rows, parents, subtrees):
+    """Ingest one partition atomically; runs in a pool process."""
+    try:
+        with transaction.atomic():
+            count = len(ingest_rows(rows, parents))
+    except IngestError as exc:
+        return {"subtrees": subtrees, "count": 0, "error": exc.detail}
+    except DatabaseError as exc:
+        return {"subtrees": subtrees, "count": 0, "error": {"error": str(exc)}}
+    return {"subtrees": subtrees, "count": count}
+
+
+def default_workers():
+    return getattr(settings, 'BULK_INGEST_WORKERS', None) or os.cpu_count() or 1
+
+
+def parallel_ingest(rows, workers=None, processes=True):
+    """
+    Ingest ``rows`` as up to ``workers`` partitions. Organizations are
+    created (and committed) first; each partition then succeeds or fails as
+    a whole. With ``processes`` the partitions run in a process pool,
+    otherwise in this thread. Returns {"count", "organizations", "partitions"}.
+    """
+    workers = workers or default_workers()
+    subtrees = split_subtrees(rows)
+
+    with transaction.atomic():
+        organizations = ingest_rows([row for row in rows if row.get('asset_type') == 'organization'])
+
+    partitions = pack(subtrees, workers)
+    jobs = [[row for key in keys for row in subtrees[key]] for keys in partitions]
+
+    # In-process instead when forking can't help: inside a transaction the
+    # children wouldn't see uncommitted rows (tests run inside one), and
+    # SQLite allows a single writer anyway
+    parallel = (
+        processes
+        and len(jobs) > 1
+        and not connection.in_atomic_block
+        and connection.vendor != 'sqlite'
+        and 'fork' in multiprocessing.get_all_start_methods()
+    )
+    if parallel:
+        # Children must open their own connections, never share the parent's socket
+        connections.close_all()
+        with ProcessPoolExecutor(len(jobs), mp_context=multiprocessing.get_context('fork')) as pool:
+            results = list(pool.map(ingest_partition, jobs, repeat(organizations), partitions))
+    else:
+        results = [ingest_partition(job, organizations, keys) for job, keys in zip(jobs, partitions)]
+
+    return {
+        "count": len(organizations) + sum(result["count"] for result in results),
+        "organizations": len(organizations),
+        "partitions": results,
+    }
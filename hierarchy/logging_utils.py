@@ -0,0 +1,137 @@
+"""
+Logging building blocks for the LOGGING setting.
+
+``QueueListenerHandler`` hands records to a background thread that does all
+formatting and I/O, so request threads never block on disk or stdout.
+``JSONFormatter`` emits one JSON object per line, including ``extra=``
+fields. ``RateLimitFilter`` samples and rate-limits chatty loggers such as
+the per-request lines of RequestTracingMiddleware.
+"""
+
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+TEXT_FORMAT = '[{asctime}] {levelname} in {name}: {message}'
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "timestamp": datetime.datetime.fromtimestamp(record.created, tz=datetime.timezone.utc)
+            .isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class QueueListenerHandler(logging.handlers.QueueHandler):
+    """
+    Non-blocking handler: records go onto a bounded in-memory queue and a
+    listener thread formats and writes them to the console and/or a file.
+
+    When the queue is full the record is dropped (and counted in
+    ``dropped``) rather than blocking the caller. Message formatting is
+    deferred to the listener thread as well, so ``args`` are interpolated
+    there. The listener is restarted in forked children (Gunicorn preload).
+    """
+
+    def __init__(self, filename=None, console=True, json_format=True, maxsize=10_000):
+        formatter = JSONFormatter() if json_format else logging.Formatter(TEXT_FORMAT, style='{')
+        self.targets = []
+        if console:
+            self.targets.append(logging.StreamHandler(sys.stderr))
+        if filename:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            self.targets.append(logging.FileHandler(filename))
+        for target in self.targets:
+            target.setFormatter(formatter)
+
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.listener = None
+        super().__init__(queue.Queue(maxsize))
+        self._start()
+
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        # A forked child inherits the queue but not the listener thread
+        self.queue = queue.Queue(self.maxsize)
+        self.listener = logging.handlers.QueueListener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+
+    def prepare(self, record):
+        # Same process, no pickling: leave formatting to the listener thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Block until every queued record has been written (tests, shutdown)."""
+        if self.listener is not None and self.listener._thread is not None:
+            deadline = time.monotonic() + 5
+            while not self.queue.empty() and time.monotonic() < deadline:
+                time.sleep(0.005)
+        for target in self.targets:
+            target.flush()
+
+    def close(self):
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+        for target in self.targets:
+            target.close()
+        super().close()
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Keeps a ``sample`` fraction of records, then at most ``rate`` records per
+    second per logger (bursts up to ``burst``). WARNING and above always pass.
+    """
+
+    def __init__(self, rate=50.0, burst=None, sample=1.0):
+        super().__init__()
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self.sample = float(sample)
+        self._buckets = {}  # logger name -> (tokens, last refill)
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.sample < 1.0 and random.random() >= self.sample:
+            return False
+
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(record.name, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[record.name] = (tokens - 1 if allowed else tokens, now)
+        return allowed
@@ -0,0 +1,51 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hierarchy.archive import archivable, archive_batches
+
+
+class Command(BaseCommand):
+    help = (
+        "Move inactive and expired assets to the archive table in small "
+        "batches, leaves first. Each batch is its own transaction, so the "
+        "command can be interrupted and re-run at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help="Stop after this many batches (resume with another run)")
+        parser.add_argument('--after-id', type=int, default=0,
+                            help="Start after this asset id (the position a stopped run printed)")
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help="Seconds to pause between batches to spread the load")
+        parser.add_argument('--today', default=None,
+                            help="Reference date for end_date expiry (YYYY-MM-DD, default today)")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only count the assets the first batch would consider")
+
+    def handle(self, *args, batch_size, max_batches, after_id, sleep, today, dry_run, **options):
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive")
+        try:
+            today = datetime.date.fromisoformat(today) if today else None
+        except ValueError:
+            raise CommandError("--today must be a date in YYYY-MM-DD format")
+
+        if dry_run:
+            self.stdout.write(f"{archivable(today).count()} asset(s) can be archived now")
+            return
+
+        total = batches = 0
+        for moved, last_id in archive_batches(batch_size, today, after_id):
+            total += moved
+            batches += 1
+            self.stdout.write(f"batch {batches}: archived {moved} (total {total}, up to id {last_id})")
+            if max_batches is not None and batches >= max_batches:
+                self.stdout.write(f"Stopped after {batches} batch(es); resume with --after-id={last_id}")
+                break
+            if sleep:
+                time.sleep(sleep)
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} asset(s) in {batches} batch(es)"))
@@ -0,0 +1,100 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from hierarchy.models import Asset, fetch_values
+from hierarchy.renderers import FastJSONRenderer
+from hierarchy.serializers import AssetSerializer, AssetReadSerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare AssetSerializer + JSONRenderer against AssetReadSerializer + "
+        "FastJSONRenderer on generated rows, end-to-end and for serialization "
+        "alone. The rows are created inside a transaction that is rolled back; "
+        "run it against a development database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=3, help="Best of N runs per path")
+        parser.add_argument('--min-speedup', type=float, default=5.0,
+                            help="Fail when the fast path is slower than this factor")
+
+    def handle(self, *args, rows, repeat, min_speedup, **options):
+        try:
+            with transaction.atomic():
+                self.seed(rows)
+                results = self.measure(repeat)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        for label, (baseline, fast, identical) in results.items():
+            speedup = baseline / fast
+            self.stdout.write(
+                f"{label}: rows={rows} drf={baseline:.3f}s fast={fast:.3f}s "
+                f"speedup={speedup:.1f}x identical_output={identical}"
+            )
+            if not identical:
+                raise CommandError(f"{label}: fast path output differs from AssetSerializer output")
+            if speedup < min_speedup:
+                raise CommandError(f"{label}: speedup {speedup:.1f}x is below the required {min_speedup}x")
+
+    def seed(self, rows):
+        org = Asset.objects.create(asset_name="Benchmark Org", asset_type='organization')
+        start = datetime.date(2025, 1, 1)
+        Asset.objects.bulk_create(
+            (
+                Asset(
+                    asset_name=f"Benchmark Line {i}",
+                    asset_type='Line',
+                    hierarchy_level=1,
+                    parent=org,
+                    root=org,
+                    description="Generated by benchmark_serializers",
+                    start_date=start,
+                    end_date=start + datetime.timedelta(days=i % 3650) if i % 2 else None,
+                )
+                for i in range(rows - 1)
+            ),
+            batch_size=5000,
+        )
+
+    def measure(self, repeat):
+        queryset = Asset.objects.all()
+        reader = AssetReadSerializer()
+
+        def best(func, *args):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                output = func(*args)
+                timings.append(time.perf_counter() - started)
+            return min(timings), output
+
+        def drf(instances):
+            return JSONRenderer().render(AssetSerializer(instances, many=True).data)
+
+        def fast(rows):
+            return FastJSONRenderer().render(reader.serialize_rows(rows))
+
+        results = {}
+
+        baseline, expected = best(lambda: drf(queryset.all()))
+        fast_time, actual = best(lambda: fast(fetch_values(queryset, reader.columns)))
+        results['end-to-end'] = (baseline, fast_time, expected == actual)
+
+        instances = list(queryset)
+        rows = fetch_values(queryset, reader.columns)
+        baseline, expected = best(drf, instances)
+        fast_time, actual = best(fast, rows)
+        results['serialize'] = (baseline, fast_time, expected == actual)
+        return results
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hierarchy.tree_index import snapshot_path, write_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the tree index snapshot that workers map with TREE_INDEX_ENABLED. "
+        "The file is replaced atomically, so it is safe to run while serving. "
+        "Workers never build it themselves: run this with --watch as a process "
+        "of its own to keep the snapshot current."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=None, help="Defaults to TREE_INDEX_PATH")
+        parser.add_argument(
+            '--watch', action='store_true',
+            help="Keep running, rebuilding whenever assets changed since the last snapshot",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help="Seconds between change checks with --watch (default: 5)",
+        )
+
+    def handle(self, *args, path, watch, interval, **options):
+        path = path or snapshot_path()
+        self.build(path, only_if_stale=False)
+        while watch:
+            time.sleep(interval)
+            self.build(path, only_if_stale=True)
+
+    def build(self, path, only_if_stale):
+        started = time.perf_counter()
+        index = write_snapshot(path, only_if_stale=only_if_stale)
+        if index is None:
+            return
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            "Indexed {} assets at change {}.{} into {} in {:.2f}s".format(
+                len(index), *index.version, path, elapsed,
+            )
+        ))
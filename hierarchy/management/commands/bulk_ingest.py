@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hierarchy.ingest import IngestError, default_workers, parallel_ingest, read_csv_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-create assets from a JSON or CSV file in the upload format, "
+        "ingesting independent subtrees in parallel worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="A .json file (list, or {\"assets\": [...]}) or a .csv file")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Worker processes (default BULK_INGEST_WORKERS or the CPU count)")
+
+    def handle(self, *args, path, workers, **options):
+        try:
+            with open(path, 'rb') as fh:
+                if path.lower().endswith('.csv'):
+                    rows = read_csv_rows(fh)
+                else:
+                    rows = json.load(fh)
+                    rows = rows if isinstance(rows, list) else rows.get('assets', [])
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not read {path}: {exc}")
+
+        try:
+            result = parallel_ingest(rows, workers or default_workers())
+        except IngestError as exc:
+            raise CommandError(json.dumps(exc.detail))
+
+        for partition in result["partitions"]:
+            status = f"error {json.dumps(partition['error'])}" if "error" in partition else "ok"
+            self.stdout.write(f"{len(partition['subtrees'])} subtree(s)\t{partition['count']} created\t{status}")
+        failed = sum("error" in partition for partition in result["partitions"])
+        message = f"Created {result['count']} asset(s) ({result['organizations']} organization(s))"
+        if failed:
+            raise CommandError(f"{message}; {failed} partition(s) failed and were rolled back")
+        self.stdout.write(self.style.SUCCESS(message))
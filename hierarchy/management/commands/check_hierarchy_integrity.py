@@ -0,0 +1,158 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+
+from hierarchy.models import MAX_TREE_DEPTH, Asset
+
+
+class Command(BaseCommand):
+    help = (
+        "Scan hierarchy_asset for cycles, orphans, wrong hierarchy levels, wrong "
+        "roots and asset type rule violations. The table is streamed in chunks "
+        "and the tree walk runs in the database, so memory stays bounded "
+        "regardless of table size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10_000)
+        parser.add_argument('--max-report', type=int, default=100,
+                            help="Issues printed per category; all are counted")
+        parser.add_argument('--fail-on-issues', action='store_true',
+                            help="Exit with an error when any issue is found")
+
+    def handle(self, *args, chunk_size, max_report, fail_on_issues, **options):
+        self.chunk_size = chunk_size
+        self.max_report = max_report
+        self.counts = Counter()
+        self.connection = connections[router.db_for_read(Asset)]
+        self.table = self.connection.ops.quote_name(Asset._meta.db_table)
+
+        self.check_type_rules()
+        self.check_orphans()
+        self.check_levels_and_roots()
+        self.check_unreachable()
+
+        for category in ('type_rule', 'orphan', 'wrong_level', 'wrong_root', 'cycle', 'detached'):
+            self.stdout.write(f"{category}: {self.counts[category]}")
+        total = sum(self.counts.values())
+        if total and fail_on_issues:
+            raise CommandError(f"{total} integrity issue(s) found")
+        if not total:
+            self.stdout.write(self.style.SUCCESS("No integrity issues found"))
+
+    def report(self, category, asset_id, detail):
+        self.counts[category] += 1
+        if self.counts[category] <= self.max_report:
+            self.stdout.write(f"{category}\tid={asset_id}\t{detail}")
+
+    def stream(self, sql, params=()):
+        """Rows of ``sql`` through a server-side cursor where the backend has one."""
+        with transaction.atomic(using=self.connection.alias):
+            cursor = self.connection.chunked_cursor()
+            try:
+                cursor.execute(sql, params)
+                while rows := cursor.fetchmany(self.chunk_size):
+                    yield from rows
+            finally:
+                cursor.close()
+
+    def check_type_rules(self):
+        """Organizations are roots and everything else has a parent (Asset.clean)."""
+        last_id = 0
+        queryset = Asset.objects.using(self.connection.alias).order_by('id')
+        while True:
+            chunk = list(
+                queryset.filter(id__gt=last_id).values_list('id', 'asset_type', 'parent_id')[:self.chunk_size]
+            )
+            if not chunk:
+                return
+            for asset_id, asset_type, parent_id in chunk:
+                if asset_type == 'organization' and parent_id is not None:
+                    self.report('type_rule', asset_id, f"organization has parent {parent_id}")
+                elif asset_type != 'organization' and parent_id is None:
+                    self.report('type_rule', asset_id, f"{asset_type} has no parent")
+            last_id = chunk[-1][0]
+
+    def check_orphans(self):
+        rows = self.stream(
+            f"""
+            SELECT a.id, a.parent_id FROM {self.table} a
+            LEFT JOIN {self.table} p ON p.id = a.parent_id
+            WHERE a.parent_id IS NOT NULL AND p.id IS NULL
+            """
+        )
+        for asset_id, parent_id in rows:
+            self.report('orphan', asset_id, f"parent {parent_id} does not exist")
+
+    # Walk down from every root in the database, carrying depth and root id
+    TREE_CTE = """
+        WITH RECURSIVE tree (id, depth, root) AS (
+            SELECT id, 0, id FROM {table} WHERE parent_id IS NULL
+            UNION ALL
+            SELECT a.id, tree.depth + 1, tree.root
+            FROM {table} a JOIN tree ON a.parent_id = tree.id
+            WHERE tree.depth < %s
+        )
+    """
+
+    def check_levels_and_roots(self):
+        rows = self.stream(
+            self.TREE_CTE.format(table=self.table) + f"""
+            SELECT a.id, tree.depth, a.hierarchy_level, tree.root, a.root_id
+            FROM tree JOIN {self.table} a ON a.id = tree.id
+            WHERE a.hierarchy_level <> tree.depth OR a.root_id IS NULL OR a.root_id <> tree.root
+            """,
+            [MAX_TREE_DEPTH],
+        )
+        for asset_id, depth, level, root, stored_root in rows:
+            if level != depth:
+                self.report('wrong_level', asset_id, f"hierarchy_level={level}, depth={depth}")
+            if stored_root != root:
+                self.report('wrong_root', asset_id, f"root_id={stored_root}, expected {root}")
+
+    def check_unreachable(self):
+        """Rows (other than orphans) no root leads to sit on a cycle, or below a cycle or an orphan."""
+        rows = self.stream(
+            self.TREE_CTE.format(table=self.table) + f"""
+            SELECT a.id FROM {self.table} a
+            JOIN {self.table} p ON p.id = a.parent_id
+            LEFT JOIN tree ON tree.id = a.id
+            WHERE tree.id IS NULL
+            """,
+            [MAX_TREE_DEPTH],
+        )
+        for (asset_id,) in rows:
+            chain, on_cycle = self.ancestor_chain(asset_id)
+            path = " -> ".join(map(str, chain))
+            if on_cycle:
+                self.report('cycle', asset_id, f"ancestor chain: {path}")
+            else:
+                self.report('detached', asset_id, f"not reachable from any organization: {path}")
+
+    def ancestor_chain(self, asset_id):
+        """
+        Ids from ``asset_id`` upwards until an id repeats or the chain ends,
+        and whether the chain loops back to ``asset_id``. UNION (not UNION
+        ALL) makes the recursion stop on any cycle.
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH RECURSIVE up (id, parent_id) AS (
+                    SELECT id, parent_id FROM {self.table} WHERE id = %s
+                    UNION
+                    SELECT a.id, a.parent_id FROM {self.table} a JOIN up ON a.id = up.parent_id
+                )
+                SELECT id, parent_id FROM up
+                """,
+                [asset_id],
+            )
+            parents = dict(cursor.fetchall())
+
+        chain = [asset_id]
+        while parents.get(chain[-1]) is not None and len(chain) <= len(parents):
+            chain.append(parents[chain[-1]])
+            if chain[-1] == asset_id:
+                return chain, True
+        return chain, False
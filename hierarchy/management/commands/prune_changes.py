@@ -0,0 +1,36 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from hierarchy.changes import prunable_changes, prune_changes, retention_days
+
+
+class Command(BaseCommand):
+    help = (
+        "Compact the asset change feed: delete changes older than the "
+        "retention period that a newer change to the same asset supersedes, "
+        "and old tombstones. The latest change of every live asset is kept. "
+        "Each batch is its own transaction; run it daily from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Retention in days (default CHANGE_FEED_RETENTION_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only count the changes that would be deleted")
+
+    def handle(self, *args, days, batch_size, dry_run, **options):
+        days = retention_days() if days is None else days
+        if days < 0:
+            raise CommandError("--days must not be negative")
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive")
+        before = timezone.now() - datetime.timedelta(days=days)
+
+        if dry_run:
+            self.stdout.write(f"{prunable_changes(before).count()} change(s) can be pruned")
+            return
+        deleted = prune_changes(before, batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} change(s) older than {days} day(s)"))
@@ -1,24 +1,118 @@
 import uuid
+import hashlib
 import logging
 import time
+from django.conf import settings
+from django.core.cache import cache
 from django.utils.deprecation import MiddlewareMixin
 
+from . import db_routers, profiling
+from .db_routers import pin_to_primary, unpin
+
 logger = logging.getLogger(__name__)
 
 class RequestTracingMiddleware(MiddlewareMixin):
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        # Decided once per process so the disabled path costs one attribute check
+        self.profiling = profiling.enabled()
+
     def process_request(self, request):
         # Assign a unique trace ID for every request
         trace_id = str(uuid.uuid4())
         request.trace_id = trace_id
-        request.start_time = time.time()
+        request.start_time = time.perf_counter()
+
+        if self.profiling:
+            trigger = profiling.trigger(request)
+            request._profile = profiling.RequestProfile.start(trigger) if trigger else None
 
-        logger.info(f"[TRACE {trace_id}] Incoming {request.method} {request.path}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "[TRACE %s] Incoming %s %s", trace_id, request.method, request.path,
+                extra={"trace_id": trace_id, "method": request.method, "path": request.path},
+            )
         return None
 
     def process_response(self, request, response):
         trace_id = getattr(request, "trace_id", "unknown")
-        duration = time.time() - getattr(request, "start_time", time.time())
 
-        logger.info(f"[TRACE {trace_id}] Completed {request.method} {request.path} in {duration:.3f}s — Status {response.status_code}")
+        profile = getattr(request, "_profile", None) if self.profiling else None
+        if profile is not None:
+            response["X-Profile-ID"] = str(profile.finish(request, response))
+
+        if logger.isEnabledFor(logging.INFO):
+            duration = time.perf_counter() - getattr(request, "start_time", time.perf_counter())
+            logger.info(
+                "[TRACE %s] Completed %s %s in %.3fs — Status %s",
+                trace_id, request.method, request.path, duration, response.status_code,
+                extra={
+                    "trace_id": trace_id,
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "duration_ms": round(duration * 1000, 3),
+                },
+            )
         response["X-Trace-ID"] = trace_id  # Add trace ID to the response headers
         return response
+
+
+class ReplicaPinningMiddleware(MiddlewareMixin):
+    """
+    Read-your-writes for ReplicaRouter: requests that write, and every request
+    from the same client for REPLICA_STICKY_SECONDS afterwards, read from the
+    primary. The pin is stored in the cache (shared across workers when the
+    cache backend is) and in a cookie for clients that keep cookies.
+
+    Other requests read from one replica throughout. If that replica fails
+    and no longer answers a probe, it is marked down and a safe request is
+    served again from the primary.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+    COOKIE_NAME = 'pin_primary'
+
+    @staticmethod
+    def client_key(request):
+        ident = (
+            request.META.get('HTTP_AUTHORIZATION')
+            or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+            or request.META.get('REMOTE_ADDR', '')
+        )
+        return 'replica-pin:' + hashlib.sha256(ident.encode()).hexdigest()
+
+    def process_request(self, request):
+        pinned = (
+            request.method not in self.SAFE_METHODS
+            or request.COOKIES.get(self.COOKIE_NAME) == '1'
+            or cache.get(self.client_key(request)) is not None
+        )
+        request._replica_pin_token = pin_to_primary(pinned)
+        request._replica_token = db_routers.begin_request()
+        return None
+
+    def process_exception(self, request, exception):
+        # DRF views report through custom_exception_handler instead
+        db_routers.note_error(exception)
+        return None
+
+    def process_response(self, request, response):
+        if request.method in self.SAFE_METHODS and db_routers.replica_failed():
+            retry = pin_to_primary()
+            try:
+                response = self.get_response(request)
+            finally:
+                unpin(retry)
+
+        token = getattr(request, '_replica_token', None)
+        if token is not None:
+            db_routers.end_request(token)
+        token = getattr(request, '_replica_pin_token', None)
+        if token is not None:
+            unpin(token)
+
+        if request.method not in self.SAFE_METHODS and response.status_code < 400:
+            sticky = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+            cache.set(self.client_key(request), 1, timeout=sticky)
+            response.set_cookie(self.COOKIE_NAME, '1', max_age=sticky, httponly=True, samesite='Lax')
+        return response
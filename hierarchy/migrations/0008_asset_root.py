@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_root(apps, schema_editor):
+    """Set root on existing rows, walking down one hierarchy level at a time."""
+    Asset = apps.get_model('hierarchy', 'Asset')
+    db = schema_editor.connection.alias
+
+    roots = list(Asset.objects.using(db).filter(parent__isnull=True).values_list('id', flat=True))
+    for root_id in roots:
+        Asset.objects.using(db).filter(pk=root_id).update(root_id=root_id)
+        frontier = [root_id]
+        seen = {root_id}
+        while frontier:
+            frontier = [
+                pk for pk in Asset.objects.using(db).filter(parent_id__in=frontier).values_list('id', flat=True)
+                if pk not in seen
+            ]
+            seen.update(frontier)
+            if frontier:
+                Asset.objects.using(db).filter(id__in=frontier).update(root_id=root_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hierarchy', '0007_alter_asset_asset_type_alter_asset_start_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='root',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hierarchy.asset'),
+        ),
+        migrations.RunPython(backfill_root, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['root', 'parent'], name='asset_root_parent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['root', 'asset_type'], name='asset_root_type_idx'),
+        ),
+    ]
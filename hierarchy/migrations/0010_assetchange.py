@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hierarchy', '0009_throttlecounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('asset_id', models.BigIntegerField(db_index=True)),
+                ('asset_uuid', models.UUIDField()),
+                ('operation', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('move', 'Move'), ('delete', 'Delete')], max_length=10)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['seq'],
+            },
+        ),
+    ]
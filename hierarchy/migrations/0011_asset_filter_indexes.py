@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hierarchy', '0010_assetchange'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['asset_type', 'is_active'], name='asset_type_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['asset_type', 'start_date'], name='asset_type_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['asset_type', 'asset_name'], name='asset_active_type_name_idx'),
+        ),
+    ]
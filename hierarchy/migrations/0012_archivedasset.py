@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hierarchy', '0011_asset_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAsset',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('uuid', models.UUIDField(unique=True)),
+                ('asset_name', models.CharField(max_length=255)),
+                ('asset_type', models.CharField(choices=[('organization', 'Organization'), ('group', 'Group'), ('subgroup', 'Subgroup'), ('plant', 'Plant'), ('location', 'Location'), ('Building', 'Building'), ('Floor', 'Floor'), ('Rooms', 'Rooms'), ('Line', 'Line'), ('other', 'Other')], max_length=50)),
+                ('hierarchy_level', models.PositiveIntegerField(default=0)),
+                ('parent_id', models.BigIntegerField(blank=True, null=True)),
+                ('root_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=False)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['asset_name'],
+            },
+        ),
+    ]
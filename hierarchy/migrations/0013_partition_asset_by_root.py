@@ -0,0 +1,116 @@
+"""
+Hash-partition hierarchy_asset by root_id on PostgreSQL.
+
+Every subtree, ancestor and ?root= query carries root_id, so the planner
+prunes it to the one partition holding that organization. A partitioned
+table's primary key and unique constraints must include the partition key,
+so the primary key becomes (root_id, id) and uuid is unique per root (ids
+and uuids still come from one sequence / uuid4 for the whole table). For the
+same reason parent and root lose their database foreign keys.
+
+Other databases only drop the foreign keys. The partition count is fixed
+here; changing it means another migration that rebuilds the table the same
+way.
+
+Downtime: the rebuild copies the whole table (INSERT ... SELECT) and then
+builds its keys and indexes, all in the migration's single transaction. The
+RENAME takes an ACCESS EXCLUSIVE lock on hierarchy_asset that is held until
+commit, so every read and write of assets waits for the full copy and index
+build. Run it in a maintenance window sized for the table. A failure rolls
+everything back, which leaves the unpartitioned table in place.
+"""
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+PARTITIONS = 16
+TABLE = 'hierarchy_asset'
+OLD_TABLE = 'hierarchy_asset_rebuild'
+
+
+def _secondary_indexes(cursor):
+    """CREATE INDEX statements of the indexes not backing a constraint."""
+    cursor.execute(
+        """
+        SELECT indexdef FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = %s
+          AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)
+        """,
+        [TABLE, TABLE],
+    )
+    return [indexdef for (indexdef,) in cursor.fetchall()]
+
+
+def _rebuild(cursor, partitions):
+    """Copy the table into a new one, hash-partitioned into ``partitions`` or plain if None."""
+    indexes = _secondary_indexes(cursor)
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {TABLE}")
+    (max_id,) = cursor.fetchone()
+
+    cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}")
+    # Detach the id sequence (identity or serial) so it goes away with the old table
+    cursor.execute(f"ALTER TABLE {OLD_TABLE} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+    cursor.execute(f"ALTER TABLE {OLD_TABLE} ALTER COLUMN id DROP DEFAULT")
+    cursor.execute(f"DROP SEQUENCE IF EXISTS {TABLE}_id_seq")
+
+    partition_by = " PARTITION BY HASH (root_id)" if partitions else ""
+    cursor.execute(f"CREATE TABLE {TABLE} (LIKE {OLD_TABLE} INCLUDING DEFAULTS){partition_by}")
+    for remainder in range(partitions or 0):
+        cursor.execute(
+            f"CREATE TABLE {TABLE}_p{remainder} PARTITION OF {TABLE}"
+            f" FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        )
+    cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}")
+    cursor.execute(f"DROP TABLE {OLD_TABLE}")
+
+    # Sequence, keys and indexes after the copy, so rows are loaded unindexed
+    cursor.execute(f"CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id")
+    cursor.execute(f"SELECT setval('{TABLE}_id_seq', %s, false)", [max_id + 1])
+    cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+    if partitions:
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN root_id SET NOT NULL")
+        cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (root_id, id)")
+        cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_root_uuid_key UNIQUE (root_id, uuid)")
+    else:
+        cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id)")
+        cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_uuid_key UNIQUE (uuid)")
+    for indexdef in indexes:
+        cursor.execute(indexdef)
+
+
+def partition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        # The partition key can't be NULL: top-level rows are their own root
+        cursor.execute(f"UPDATE {TABLE} SET root_id = id WHERE root_id IS NULL")
+        _rebuild(cursor, PARTITIONS)
+
+
+def unpartition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        _rebuild(cursor, None)
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN root_id DROP NOT NULL")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hierarchy', '0012_archivedasset'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='asset',
+            name='parent',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='hierarchy.asset'),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='root',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hierarchy.asset'),
+        ),
+        migrations.RunPython(partition, unpartition),
+    ]
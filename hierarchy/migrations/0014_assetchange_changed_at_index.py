@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hierarchy', '0013_partition_asset_by_root'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='assetchange',
+            name='changed_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:56
+
+import hierarchy.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hierarchy', '0014_assetchange_changed_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assetchange',
+            name='xact_id',
+            field=models.BigIntegerField(db_default=hierarchy.models.CurrentTransactionId(), editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='assetchange',
+            index=models.Index(fields=['xact_id', 'seq'], name='assetchange_xact_seq_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hierarchy', '0015_assetchange_xact_id'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='asset',
+            name='asset_active_type_name_idx',
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['asset_type', 'asset_name', 'id'], name='asset_active_type_name_id_idx'),
+        ),
+    ]
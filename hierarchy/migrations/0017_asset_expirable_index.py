@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hierarchy', '0016_asset_keyset_order_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(condition=models.Q(('is_active', False), ('end_date__isnull', False), _connector='OR'), fields=['id'], name='asset_expirable_id_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+"""
+Declare on the model what migration 0013 put in the PostgreSQL database:
+uuid is unique per organization, (root_id, uuid), not across the table.
+
+PostgreSQL already has the constraint under this name, so only the state
+changes there. Other databases still enforce the original unique uuid and
+get the same schema change for real, so every backend agrees with the model.
+"""
+
+import uuid
+
+from django.db import migrations, models
+
+
+class OutsidePostgreSQL(migrations.operations.base.Operation):
+    """``operation``, with its schema change skipped on PostgreSQL."""
+
+    reduces_to_sql = False
+    reversible = True
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    def deconstruct(self):
+        return self.__class__.__name__, [self.operation], {}
+
+    def state_forwards(self, app_label, state):
+        self.operation.state_forwards(app_label, state)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            self.operation.database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            self.operation.database_backwards(app_label, schema_editor, from_state, to_state)
+
+    def describe(self):
+        return f"{self.operation.describe()} (PostgreSQL has it since 0013)"
+
+
+OPERATIONS = [
+    migrations.AlterField(
+        model_name='asset',
+        name='uuid',
+        field=models.UUIDField(default=uuid.uuid4, editable=False),
+    ),
+    migrations.AddConstraint(
+        model_name='asset',
+        constraint=models.UniqueConstraint(fields=('root', 'uuid'), name='hierarchy_asset_root_uuid_key'),
+    ),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hierarchy', '0017_asset_expirable_index'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=OPERATIONS,
+            database_operations=[OutsidePostgreSQL(operation) for operation in OPERATIONS],
+        ),
+    ]
@@ -1,7 +1,63 @@
-from django.db import models
-from django.core.exceptions import ValidationError
+from django.db import connections, models, router, transaction
+from django.core.exceptions import EmptyResultSet, ValidationError
+import operator
 import uuid
 
+# Longest ancestor chain followed when looking for cycles
+MAX_TREE_DEPTH = 10_000
+# Namespaces the advisory lock keys of Asset.lock_organizations
+MOVE_LOCK_NAMESPACE = 'hierarchy_asset.move'
+
+
+def fetch_values(queryset, fields):
+    """
+    ``values_list(*fields)`` rows exactly as the database driver returns them,
+    skipping Django's per-value ``from_db`` converters (UUID parsing etc.).
+    """
+    query = queryset.values_list(*fields).query
+    try:
+        sql, params = query.get_compiler(using=queryset.db).as_sql()
+    except EmptyResultSet:
+        return []
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def descendant_order(asset_id, rows, pk_of, parent_of):
+    """
+    Descendants of ``asset_id`` in the children endpoint's order: the asset's
+    children, then each child's own descendants in turn. ``rows`` must already
+    be sorted by (asset_name, id), which then is the order among siblings.
+    """
+    children = {}
+    for row in rows:
+        children.setdefault(parent_of(row), []).append(row)
+
+    ordered = list(children.get(asset_id, ()))
+    pending = [iter(ordered)]
+    while pending:
+        row = next(pending[-1], None)
+        if row is None:
+            pending.pop()
+            continue
+        kids = children.pop(pk_of(row), None)  # popped: a cycle is followed once
+        if kids:
+            ordered.extend(kids)
+            pending.append(iter(kids))
+    return ordered
+
+
+class AssetQuerySet(models.QuerySet):
+    def delete(self):
+        from .changes import batched_tombstones  # changes imports this module
+
+        with batched_tombstones(self.db):
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
 
 class Asset(models.Model):
     ASSET_TYPES = [
@@ -17,18 +73,64 @@ class Asset(models.Model):
         ('other', 'Other'),
     ]
 
-    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    # Unique per organization (see Meta): a partitioned table's unique
+    # constraints must include the partition key (migration 0013)
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False)
     asset_name = models.CharField(max_length=255)
     asset_type = models.CharField(max_length=50, choices=ASSET_TYPES, db_index=True)
     hierarchy_level = models.PositiveIntegerField(default=0, editable=True)
-    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='children', db_index=True)
+    # No database foreign keys: on PostgreSQL the table is hash-partitioned by
+    # root (migration 0013) and its primary key is (root_id, id), which a
+    # foreign key to id alone cannot reference. Cascades are done by Django and
+    # check_hierarchy_integrity reports orphans.
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='children', db_index=True, db_constraint=False)
+    # Denormalized top-level organization of this asset (itself for organizations).
+    # Every tree query is scoped by it, so it leads the composite indexes below
+    # and, on PostgreSQL, picks the partition a row lives in.
+    root = models.ForeignKey('self', null=True, blank=True, editable=False, on_delete=models.CASCADE, related_name='+', db_index=False, db_constraint=False)
     description = models.TextField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
     start_date = models.DateField(default="2025-10-15")
     end_date = models.DateField(null=True, blank=True)
 
+    objects = AssetQuerySet.as_manager()
+
     class Meta:
         ordering = ['asset_name']
+        constraints = [
+            models.UniqueConstraint(fields=['root', 'uuid'], name='hierarchy_asset_root_uuid_key'),
+        ]
+        indexes = [
+            models.Index(fields=['root', 'parent'], name='asset_root_parent_idx'),
+            models.Index(fields=['root', 'asset_type'], name='asset_root_type_idx'),
+            # List filters and facet counts (hierarchy/filters.py)
+            models.Index(fields=['asset_type', 'is_active'], name='asset_type_active_idx'),
+            models.Index(fields=['asset_type', 'start_date'], name='asset_type_start_idx'),
+            # Expired-asset candidates in id order (hierarchy/archive.py). The
+            # condition is implied by the job's "inactive or end_date < today"
+            # filter for any date, so the index does not depend on today
+            models.Index(
+                fields=['id'],
+                condition=models.Q(is_active=False) | models.Q(end_date__isnull=False),
+                name='asset_expirable_id_idx',
+            ),
+            # Most list reads want active rows only, in the keyset order
+            # (asset_name, id) of hierarchy/pagination.py
+            models.Index(
+                fields=['asset_type', 'asset_name', 'id'],
+                condition=models.Q(is_active=True),
+                name='asset_active_type_name_id_idx',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored root so save() only rewrites subtrees that moved,
+        # and the stored parent so the change feed can tell moves from updates
+        instance._loaded_root_id = instance.__dict__.get('root_id')
+        instance._loaded_parent_id = instance.__dict__.get('parent_id')
+        return instance
 
     def clean(self):
         # Organization can be top-level
@@ -38,14 +140,281 @@ class Asset(models.Model):
         if self.parent:
             if self.asset_type == 'organization':
                 raise ValidationError("An Organization cannot have a parent asset.")
-            if self.parent.asset_type == 'machine':
-                raise ValidationError("A Machine cannot have a child asset.")
+            if getattr(self, '_loaded_parent_id', None) != self.parent_id and self.creates_cycle(self.parent_id):
+                raise ValidationError("An asset cannot be placed under itself or one of its descendants.")
+
+    def creates_cycle(self, parent_id):
+        """
+        True if making ``parent_id`` the parent of this asset would make the
+        asset its own ancestor. One recursive query, whatever the depth.
+        """
+        if self.pk is None or parent_id is None:
+            return False
+        if parent_id == self.pk:
+            return True
+
+        connection = connections[router.db_for_write(Asset)]
+        table = connection.ops.quote_name(self._meta.db_table)
+        with connection.cursor() as cursor:
+            # Ancestors share the new parent's root, so the walk stays in its partition
+            cursor.execute(
+                f"""
+                WITH RECURSIVE ancestors (id, parent_id, root_id, depth) AS (
+                    SELECT id, parent_id, root_id, 0 FROM {table} WHERE id = %s
+                    UNION ALL
+                    SELECT a.id, a.parent_id, a.root_id, ancestors.depth + 1
+                    FROM {table} a JOIN ancestors
+                        ON a.root_id = ancestors.root_id AND a.id = ancestors.parent_id
+                    WHERE ancestors.depth < %s
+                )
+                SELECT 1 FROM ancestors WHERE id = %s LIMIT 1
+                """,
+                [parent_id, MAX_TREE_DEPTH, self.pk],
+            )
+            return cursor.fetchone() is not None
+
+    @classmethod
+    def allocate_id(cls, using):
+        """
+        Draw the next id from the table's sequence on PostgreSQL, so a new
+        organization is inserted with its root (itself) already set instead of
+        being inserted and then moved into its partition. None elsewhere.
+        """
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'id'))", [cls._meta.db_table])
+            return cursor.fetchone()[0]
+
+    @classmethod
+    def lock_organizations(cls, using, root_ids):
+        """
+        Take PostgreSQL's transaction-level advisory move lock of each
+        organization in ``root_ids``, in id order so two movers cannot
+        deadlock. Held until commit, so moves touching the same organization
+        run their cycle checks one after the other. A no-op elsewhere.
+        """
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            return
+        with connection.cursor() as cursor:
+            for root_id in sorted(set(root_ids) - {None}):
+                cursor.execute(
+                    "SELECT pg_advisory_xact_lock(hashtextextended(%s, %s))", [MOVE_LOCK_NAMESPACE, root_id]
+                )
 
     def save(self, *args, **kwargs):
-        self.full_clean()  # enforce validation
+        if self.pk is None or self.parent_id is None or getattr(self, '_loaded_parent_id', None) == self.parent_id:
+            return self._save(*args, **kwargs)
+
+        # A move. Two concurrent moves (A under B, B under A) would each pass a
+        # cycle check that cannot see the other, so validate and write under
+        # the move lock of the asset's organization and the new parent's,
+        # both read fresh. Any move that could close a cycle with this one
+        # shares one of them.
+        using = kwargs.get('using') or router.db_for_write(Asset, instance=self)
+        with transaction.atomic(using=using):
+            self.lock_organizations(
+                using,
+                Asset.objects.using(using).filter(id__in=[self.pk, self.parent_id]).values_list('root_id', flat=True),
+            )
+            return self._save(*args, **kwargs)
+
+    def _save(self, *args, **kwargs):
+        self.full_clean(exclude=['root'])  # enforce validation
+        if self.parent_id:
+            self.root_id = self.parent.root_id or self.parent_id
+        elif self.pk:
+            self.root_id = self.pk
+        else:
+            pk = self.allocate_id(kwargs.get('using') or router.db_for_write(Asset, instance=self))
+            if pk is not None:
+                self.pk = self.root_id = pk
+                kwargs['force_insert'] = True
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'parent' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'root'}
+
         super().save(*args, **kwargs)
 
+        if self.root_id is None:
+            # New top-level asset: it is its own root once it has a primary key
+            self.root_id = self.pk
+            Asset.objects.filter(pk=self.pk).update(root_id=self.pk)
+        elif getattr(self, '_loaded_root_id', self.root_id) != self.root_id:
+            self._propagate_root()
+        self._loaded_root_id = self.root_id
+
+    def delete(self, using=None, keep_parents=False):
+        from .changes import batched_tombstones
+
+        with batched_tombstones(using or router.db_for_write(Asset, instance=self)):
+            return super().delete(using=using, keep_parents=keep_parents)
+
+    def _propagate_root(self):
+        """Moved to another organization: rewrite root on the whole subtree, level by level."""
+        # The descendants are still stored under the old root
+        old_root = Asset.objects.filter(root_id=self._loaded_root_id)
+        seen = {self.pk}
+        frontier = [self.pk]
+        while frontier:
+            frontier = [
+                pk for pk in old_root.filter(parent_id__in=frontier).values_list('id', flat=True)
+                if pk not in seen
+            ]
+            seen.update(frontier)
+            if frontier:
+                old_root.filter(id__in=frontier).update(root_id=self.root_id)
+
+    def get_descendants(self, *fields):
+        """
+        All descendants in ``descendant_order``: children by name, then each
+        child's descendants. The tree is read one level per query, pruned to
+        this asset's organization through the (root, parent) index.
+
+        With field names, returns raw ``fetch_values`` tuples instead of
+        instances; ``'id'`` and ``'parent_id'`` must be among them.
+        """
+        queryset = Asset.objects.filter(root_id=self.root_id).order_by('asset_name', 'id')
+        if fields:
+            fetch = lambda qs: fetch_values(qs, fields)
+            pk_of = operator.itemgetter(fields.index('id'))
+            parent_of = operator.itemgetter(fields.index('parent_id'))
+        else:
+            fetch = list
+            pk_of = operator.attrgetter('pk')
+            parent_of = operator.attrgetter('parent_id')
+
+        descendants = []
+        seen = {self.pk}
+        frontier = [self.pk]
+        while frontier:
+            level = [row for row in fetch(queryset.filter(parent_id__in=frontier)) if pk_of(row) not in seen]
+            descendants.extend(level)
+            frontier = [pk_of(row) for row in level]
+            seen.update(frontier)
+        return descendant_order(self.pk, descendants, pk_of, parent_of)
+
+    def get_ancestors(self, *fields):
+        """
+        Ancestors from the parent up to the root, one query per level, each
+        pruned to this asset's organization. Field names work as in
+        ``get_descendants``; ``'parent_id'`` is then required as well.
+        """
+        queryset = Asset.objects.filter(root_id=self.root_id)
+        if fields:
+            fetch = lambda pk: next(iter(fetch_values(queryset.filter(pk=pk), fields)), None)
+            parent_of = operator.itemgetter(fields.index('parent_id'))
+        else:
+            fetch = lambda pk: queryset.filter(pk=pk).first()
+            parent_of = operator.attrgetter('parent_id')
+
+        ancestors = []
+        seen = {self.pk}
+        parent_id = self.parent_id
+        while parent_id is not None and parent_id not in seen:
+            row = fetch(parent_id)
+            if row is None:
+                break
+            ancestors.append(row)
+            seen.add(parent_id)
+            parent_id = parent_of(row)
+        return ancestors
+
     def __str__(self):
         return f"{self.asset_name} ({self.asset_type})"
 
 
+
+
+class ArchivedAsset(models.Model):
+    """
+    Assets moved out of hierarchy_asset by the ``archive_assets`` command.
+    Same columns as Asset, keeping the original id; parent and root are plain
+    ids because either may be live or archived.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    uuid = models.UUIDField(unique=True)
+    asset_name = models.CharField(max_length=255)
+    asset_type = models.CharField(max_length=50, choices=Asset.ASSET_TYPES)
+    hierarchy_level = models.PositiveIntegerField(default=0)
+    parent_id = models.BigIntegerField(null=True, blank=True)
+    root_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    description = models.TextField(blank=True, null=True)
+    is_active = models.BooleanField(default=False)
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    # Columns copied from Asset when archiving
+    COPIED_FIELDS = ['id', 'uuid', 'asset_name', 'asset_type', 'hierarchy_level', 'parent_id',
+                     'root_id', 'description', 'is_active', 'start_date', 'end_date']
+
+    class Meta:
+        ordering = ['asset_name']
+
+    def __str__(self):
+        return f"{self.asset_name} ({self.asset_type}, archived)"
+
+
+class CurrentTransactionId(models.Func):
+    """
+    The writing transaction's id on PostgreSQL (``pg_current_xact_id()``), 0
+    elsewhere: SQLite has a single writer, so commit order is insert order.
+    """
+    output_field = models.BigIntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return '0', []
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return 'pg_current_xact_id()::text::bigint', []
+
+
+class AssetChange(models.Model):
+    """
+    Append-only change log of Asset rows. ``seq`` is allocated at insert time,
+    so a transaction holding a lower seq can commit after one holding a higher
+    one; the feed is therefore read in (xact_id, seq) order and only up to the
+    oldest transaction still running (hierarchy/changes.py).
+    Rows are not foreign keys: tombstones outlive the deleted asset.
+    """
+    OPERATIONS = [
+        ('create', 'Create'),
+        ('update', 'Update'),
+        ('move', 'Move'),
+        ('delete', 'Delete'),
+    ]
+
+    seq = models.BigAutoField(primary_key=True)
+    asset_id = models.BigIntegerField(db_index=True)
+    asset_uuid = models.UUIDField()
+    operation = models.CharField(max_length=10, choices=OPERATIONS)
+    # Indexed for prune_changes, which drops old superseded changes
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    xact_id = models.BigIntegerField(db_default=CurrentTransactionId(), editable=False)
+
+    class Meta:
+        ordering = ['seq']
+        indexes = [
+            # Feed order (hierarchy/changes.py)
+            models.Index(fields=['xact_id', 'seq'], name='assetchange_xact_seq_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.operation} asset {self.asset_id}"
+
+
+class ThrottleCounter(models.Model):
+    """
+    One request counter per throttle key and time window, shared by every
+    worker. Used by hierarchy.throttling.DatabaseCounterStore.
+    """
+    key = models.CharField(max_length=255, primary_key=True)
+    count = models.PositiveIntegerField(default=0)
+    expires_at = models.FloatField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key}={self.count}"
@@ -0,0 +1,97 @@
+"""
+Keyset pagination of the asset list.
+
+A page holds at most ``?limit=`` rows (default 500, max 5000) ordered by
+(asset_name, id) and comes back as
+
+    {"results": [...], "has_more": true, "next_cursor": "WzAsIk..."}
+
+Pass ``?cursor=<next_cursor>`` for the next page. The cursor is the sort key
+of the last row returned, so every page is one index range scan however far
+the client has paged, and rows inserted meanwhile are neither skipped nor
+repeated. Several querysets (live, then archived assets) are paged as one
+sequence; the cursor also records which of them it points into.
+"""
+
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .models import fetch_values
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+ORDERING = ('asset_name', 'id')
+
+
+def encode_cursor(source, asset_name, asset_id):
+    return base64.urlsafe_b64encode(json.dumps([source, asset_name, asset_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        source, asset_name, asset_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValidationError({"cursor": ["Invalid cursor"]})
+    if not (isinstance(source, int) and isinstance(asset_name, str) and isinstance(asset_id, int)):
+        raise ValidationError({"cursor": ["Invalid cursor"]})
+    return source, asset_name, asset_id
+
+
+def after_q(asset_name, asset_id):
+    """
+    Rows sorting after (asset_name, asset_id) in ORDERING. The redundant
+    ``asset_name >= name`` bound is what the planner can turn into an index
+    range start; the OR alone would make it scan from the first row.
+    """
+    return Q(asset_name__gte=asset_name) & (Q(asset_name__gt=asset_name) | Q(asset_name=asset_name, id__gt=asset_id))
+
+
+class KeysetPaginator:
+    """``?limit`` and ``?cursor`` of one request."""
+
+    def __init__(self, params):
+        try:
+            self.limit = min(max(int(params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            raise ValidationError({"limit": ["Must be a number"]})
+        cursor = params.get('cursor')
+        self.after = decode_cursor(cursor) if cursor else None
+
+    @staticmethod
+    def requested(params):
+        return 'limit' in params or 'cursor' in params
+
+    def paginate(self, querysets, reader):
+        """
+        The next page across ``querysets`` in order: a list of serialized
+        rows per queryset, has_more and the cursor of the following page.
+        """
+        columns = reader.query_columns(*ORDERING)
+        name_index, id_index = columns.index('asset_name'), columns.index('id')
+        start, asset_name, asset_id = self.after or (0, None, None)
+
+        page = []  # (source, row), one row more than the limit to detect has_more
+        for source, queryset in enumerate(querysets):
+            wanted = self.limit + 1 - len(page)
+            if source < start or wanted <= 0:
+                continue
+            queryset = queryset.order_by(*ORDERING)
+            if source == start and asset_name is not None:
+                queryset = queryset.filter(after_q(asset_name, asset_id))
+            page.extend((source, row) for row in fetch_values(queryset[:wanted], columns))
+
+        has_more = len(page) > self.limit
+        page = page[:self.limit]
+        next_cursor = None
+        if has_more:
+            source, row = page[-1]
+            next_cursor = encode_cursor(source, row[name_index], row[id_index])
+
+        results = [
+            reader.serialize_rows([row for row_source, row in page if row_source == source])
+            for source in range(len(querysets))
+        ]
+        return results, has_more, next_cursor
@@ -0,0 +1,161 @@
+"""
+On-demand CPU and memory profiling of single requests.
+
+RequestTracingMiddleware profiles a request when it carries
+``X-Profile: <PROFILING_TOKEN>`` or is picked by PROFILING_SAMPLE_RATE.
+It records a cProfile of the request thread and tracemalloc's peak and top
+allocation sites, and keeps the last PROFILING_BUFFER_SIZE results in this
+process (``/api/profiles/``, admins only). With no token and a zero sample
+rate the middleware never calls into this module.
+
+Only one request per process is profiled at a time: tracemalloc is
+process-wide, so a concurrent profile would mix both requests' allocations.
+Requests arriving meanwhile run unprofiled.
+"""
+
+import cProfile
+import datetime
+import hmac
+import itertools
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+from django.conf import settings
+
+HEADER = 'HTTP_X_PROFILE'
+
+_profiles = deque(maxlen=getattr(settings, 'PROFILING_BUFFER_SIZE', 50))
+_profiles_lock = threading.Lock()
+_ids = itertools.count(1)
+_active = threading.Lock()
+
+
+def enabled():
+    return bool(getattr(settings, 'PROFILING_TOKEN', '')) or getattr(settings, 'PROFILING_SAMPLE_RATE', 0) > 0
+
+
+def trigger(request):
+    """'header', 'sample' or None (don't profile)."""
+    token = getattr(settings, 'PROFILING_TOKEN', '')
+    supplied = request.META.get(HEADER)
+    if token and supplied and hmac.compare_digest(supplied.encode(), token.encode()):
+        return 'header'
+    rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+    if rate > 0 and random.random() < rate:
+        return 'sample'
+    return None
+
+
+class RequestProfile:
+    """Profiling state of one in-flight request."""
+
+    def __init__(self, trigger):
+        self.trigger = trigger
+        self.profiler = cProfile.Profile()
+        self.started_tracemalloc = False
+
+    @classmethod
+    def start(cls, trigger):
+        """A running profile, or None if another request is being profiled."""
+        if not _active.acquire(blocking=False):
+            return None
+        profile = cls(trigger)
+        try:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                profile.started_tracemalloc = True
+            tracemalloc.reset_peak()
+            profile.started_at = time.time()
+            profile.profiler.enable()
+        except BaseException:
+            profile._release()
+            raise
+        return profile
+
+    def _release(self):
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+        _active.release()
+
+    def finish(self, request, response):
+        """Stop profiling and store the result; returns its id."""
+        try:
+            self.profiler.disable()
+            duration = time.time() - self.started_at
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)]
+            )
+        finally:
+            self._release()
+
+        top = getattr(settings, 'PROFILING_TOP_N', 25)
+        record = {
+            "id": next(_ids),
+            "trace_id": getattr(request, 'trace_id', None),
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "trigger": self.trigger,
+            "started_at": datetime.datetime.fromtimestamp(self.started_at, tz=datetime.timezone.utc).isoformat(),
+            "duration_ms": round(duration * 1000, 3),
+            "memory": {
+                "peak_kb": round(peak / 1024, 1),
+                "current_kb": round(current / 1024, 1),
+                "top_allocations": [
+                    {
+                        "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                        "size_kb": round(stat.size / 1024, 1),
+                        "count": stat.count,
+                    }
+                    for stat in snapshot.statistics('lineno')[:top]
+                ],
+            },
+            "cpu": cpu_summary(self.profiler, top),
+        }
+        with _profiles_lock:
+            _profiles.append(record)
+        return record["id"]
+
+
+def cpu_summary(profiler, top):
+    """Call count and the ``top`` functions by cumulative time."""
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+    return {
+        "total_calls": stats.total_calls,
+        "total_time_ms": round(stats.total_tt * 1000, 3),
+        "top_functions": [
+            {
+                "function": f"{filename}:{lineno}({name})",
+                "calls": calls,
+                "own_time_ms": round(own_time * 1000, 3),
+                "cumulative_time_ms": round(cumulative_time * 1000, 3),
+            }
+            for (filename, lineno, name), (_, calls, own_time, cumulative_time, _) in rows
+        ],
+    }
+
+
+def list_profiles():
+    """Newest first, without the detailed sections."""
+    with _profiles_lock:
+        profiles = list(_profiles)
+    return [
+        {key: value for key, value in profile.items() if key not in ('memory', 'cpu')}
+        for profile in reversed(profiles)
+    ]
+
+
+def get_profile(profile_id):
+    with _profiles_lock:
+        return next((profile for profile in _profiles if profile["id"] == profile_id), None)
+
+
+def clear():
+    with _profiles_lock:
+        _profiles.clear()
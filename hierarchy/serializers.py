@@ -1,8 +1,23 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import CharField, Func
+from django.db.models.functions import Cast
 from rest_framework import serializers
-from .models import Asset
+from .models import Asset, fetch_values
 
 
 class AssetSerializer(serializers.ModelSerializer):
+    """
+    Accepts an optional ``fields`` argument to return only a subset of the
+    fields (sparse fieldsets).
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Asset
         fields = [
@@ -13,12 +28,138 @@ class AssetSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'uuid']
 
     def validate(self, attrs):
-        asset_type = attrs.get('asset_type')
-        parent = attrs.get('parent')
+        # Partial updates fall back to the stored values
+        instance = self.instance
+        asset_type = attrs.get('asset_type', getattr(instance, 'asset_type', None))
+        parent = attrs['parent'] if 'parent' in attrs else getattr(instance, 'parent', None)
 
         if asset_type == 'organization' and parent is not None:
             raise serializers.ValidationError("An Organization cannot have a parent asset.")
         if asset_type != 'organization' and parent is None:
             raise serializers.ValidationError(f"A {asset_type} must have a parent asset.")
+        if instance is not None and attrs.get('parent') is not None and instance.creates_cycle(parent.pk):
+            raise serializers.ValidationError("An asset cannot be placed under itself or one of its descendants.")
 
         return attrs
+
+    def update(self, instance, validated_data):
+        try:
+            return super().update(instance, validated_data)
+        except DjangoValidationError as exc:
+            # Asset.save checks moves again under the move lock; a concurrent
+            # move can make the check above stale
+            raise serializers.ValidationError(exc.messages)
+
+
+# Converters are specialized on the first non-null value of each column, so the
+# same serializer handles whatever types the database driver hands back
+# (UUID objects or hex strings, date objects or ISO strings, bools or 0/1).
+def _uuid_converter(sample):
+    if isinstance(sample, str):
+        if len(sample) == 32:  # stored as bare hex (SQLite)
+            return lambda v: f"{v[:8]}-{v[8:12]}-{v[12:16]}-{v[16:20]}-{v[20:]}"
+        return None
+    return str
+
+
+def _date_converter(sample):
+    return None if isinstance(sample, str) else _to_iso
+
+
+def _bool_converter(sample):
+    return None if isinstance(sample, bool) else bool
+
+
+def _to_iso(value):
+    return value.isoformat()
+
+
+class ISODate(Func):
+    """
+    A date column rendered as 'YYYY-MM-DD' text by the database, so rows skip
+    Python-side date parsing. Other backends return dates, which
+    ``_date_converter`` formats.
+    """
+    template = '%(expressions)s'
+    output_field = CharField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='CAST(%(expressions)s AS TEXT)', **extra_context)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="to_char(%(expressions)s, 'YYYY-MM-DD')", **extra_context)
+
+
+class AssetReadSerializer:
+    """
+    Read-only fast path producing exactly what AssetSerializer returns.
+
+    Rows are read as raw tuples (``fetch_values``) and turned into dicts by a
+    generated row function with per-column converters, skipping model
+    instances and DRF's field-by-field ``to_representation``. Use it for
+    large list responses; writes and validation still go through
+    AssetSerializer.
+    """
+
+    # field name -> (database column or expression, converter factory or None)
+    COLUMNS = {
+        'id': ('id', None),
+        # Fetched as text: parsing into uuid.UUID only to format it again is
+        # the single most expensive step of serializing a row
+        'uuid': (Cast('uuid', output_field=CharField()), _uuid_converter),
+        'asset_name': ('asset_name', None),
+        'asset_type': ('asset_type', None),
+        'hierarchy_level': ('hierarchy_level', None),
+        'parent': ('parent_id', None),
+        'description': ('description', None),
+        'start_date': (ISODate('start_date'), _date_converter),
+        'end_date': (ISODate('end_date'), _date_converter),
+        'is_active': ('is_active', _bool_converter),
+    }
+
+    def __init__(self, fields=None):
+        self.fields = list(AssetSerializer.Meta.fields if fields is None else fields)
+        self.columns = [self.COLUMNS[name][0] for name in self.fields]
+
+    def query_columns(self, *extra):
+        """Columns to fetch: the serialized ones first, then any extra ones needed by the caller."""
+        return self.columns + [column for column in extra if column not in self.columns]
+
+    def serialize_rows(self, rows):
+        """Serialize tuples whose leading columns match ``self.columns``."""
+        if not rows:
+            return []
+        if not self.fields:
+            return [{} for _ in rows]
+        return self._compile(rows)(rows)
+
+    def _compile(self, rows):
+        """
+        Generate a list comprehension that unpacks each row and builds its
+        dict in one expression, with each column's converter chosen from the
+        first non-null value the driver returned for it.
+        """
+        width = len(rows[0])
+        names = [f'c{index}' for index in range(width)]
+        namespace = {}
+        items = []
+        for index, field in enumerate(self.fields):
+            factory = self.COLUMNS[field][1]
+            value = names[index]
+            if factory is not None:
+                sample = next((row[index] for row in rows if row[index] is not None), None)
+                convert = factory(sample) if sample is not None else None
+                if convert is not None:
+                    namespace[f'convert_{index}'] = convert
+                    value = f'(None if {value} is None else convert_{index}({value}))'
+            items.append(f'{field!r}: {value}')
+
+        source = (
+            "def serialize_rows(rows):\n"
+            f"    return [{{{', '.join(items)}}} for {', '.join(names)}, in rows]\n"
+        )
+        exec(source, namespace)
+        return namespace['serialize_rows']
+
+    def serialize(self, queryset):
+        return self.serialize_rows(fetch_values(queryset, self.columns or ['id']))
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.db import transaction
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate
+from . import tree_index
+from .changes import record_change, record_deletion
+from .models import Asset
+
+User = get_user_model()
+
+
+# -------------------- Auth cache invalidation --------------------
+@receiver(post_delete, sender=Token)
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_auth_cache(sender, **kwargs):
+    # Covers token deletion, deactivation, password changes and permission updates
+    invalidate()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_auth_cache_on_membership(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate()
+
+
+# -------------------- Asset change feed --------------------
+@receiver(post_save, sender=Asset)
+def record_asset_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:  # loaddata
+        return
+    if created:
+        operation = 'create'
+    elif getattr(instance, '_loaded_parent_id', instance.parent_id) != instance.parent_id:
+        operation = 'move'
+    else:
+        operation = 'update'
+    record_change(instance, operation)
+    transaction.on_commit(tree_index.mark_stale)
+    instance._loaded_parent_id = instance.parent_id
+
+
+@receiver(pre_delete, sender=Asset)
+def record_asset_deleted(sender, instance, **kwargs):
+    # Queued while Asset.delete()/QuerySet.delete() is running and inserted
+    # in one statement with the DELETEs (changes.batched_tombstones)
+    record_deletion(instance)
+    transaction.on_commit(tree_index.mark_stale)
@@ -0,0 +1,96 @@
+"""
+Lazy OpenTelemetry bootstrap.
+
+Nothing from the OpenTelemetry SDK, exporters or instrumentors is imported
+until ``configure_tracing()`` runs (from ``HierarchyConfig.ready()``), and
+only when ``TELEMETRY_ENABLED`` is true for the current process.  Management
+commands and the test runner skip it entirely (see ``manage.py``).
+"""
+
+import logging
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_configured = False
+_lock = threading.Lock()
+
+
+def _build_exporter(name):
+    if name == 'jaeger':
+        try:
+            from opentelemetry.exporter.jaeger.thrift import JaegerExporter
+        except ImportError:
+            logger.warning("Jaeger exporter is not installed; spans will not be exported")
+            return None
+        return JaegerExporter(
+            agent_host_name=settings.JAEGER_AGENT_HOST,
+            agent_port=settings.JAEGER_AGENT_PORT,
+        )
+    if name == 'otlp':
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=settings.OTLP_TRACES_ENDPOINT)
+    if name == 'console':
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        return ConsoleSpanExporter()
+    return None
+
+
+def _instrument_postgresql():
+    """
+    Instrument the driver Django's PostgreSQL backend loads: psycopg 3 when it
+    is installed (it is, for DB_POOL_ENABLED), psycopg2 otherwise.
+    """
+    try:
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    except ImportError:
+        return  # no PostgreSQL driver installed
+    try:
+        if is_psycopg3:
+            from opentelemetry.instrumentation.psycopg import PsycopgInstrumentor as Instrumentor
+        else:
+            from opentelemetry.instrumentation.psycopg2 import Psycopg2Instrumentor as Instrumentor
+    except ImportError:
+        logger.warning("No OpenTelemetry instrumentation for the PostgreSQL driver; database spans are off")
+        return
+    Instrumentor().instrument()
+
+
+def configure_tracing():
+    """
+    Install the tracer provider, exporter and instrumentors once per process.
+    Returns True if tracing was configured by this call.
+    """
+    global _configured
+
+    if not getattr(settings, 'TELEMETRY_ENABLED', False):
+        return False
+
+    with _lock:
+        if _configured:
+            return False
+
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.instrumentation.django import DjangoInstrumentor
+        from opentelemetry.instrumentation.requests import RequestsInstrumentor
+
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": settings.TELEMETRY_SERVICE_NAME})
+        )
+        exporter = _build_exporter(settings.TELEMETRY_EXPORTER)
+        if exporter is not None:
+            provider.add_span_processor(BatchSpanProcessor(exporter))
+        trace.set_tracer_provider(provider)
+
+        # Instrument Django, Requests, PostgreSQL
+        DjangoInstrumentor().instrument()
+        RequestsInstrumentor().instrument()
+        _instrument_postgresql()
+
+        _configured = True
+        return True
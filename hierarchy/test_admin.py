@@ -0,0 +1,100 @@
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from hierarchy.admin import AssetAdmin, EstimatedCountPaginator
+from hierarchy.models import Asset
+
+
+class AssetAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pass"))
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization")
+        for i in range(5):
+            Asset.objects.create(asset_name=f"Group {i}", asset_type="group", parent=self.org)
+
+    def test_changelist_query_count_does_not_grow_with_rows(self):
+        url = reverse('admin:hierarchy_asset_changelist')
+        # session, user, count, one joined page query (plus the estimate on PostgreSQL)
+        with self.assertNumQueries(5 if connection.vendor == 'postgresql' else 4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Tree view")
+
+    def test_change_form_uses_autocomplete_for_parent(self):
+        response = self.client.get(reverse('admin:hierarchy_asset_change', args=[self.org.pk]))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, '<option value="%d"' % self.org.pk)
+
+    def test_tree_children_loads_one_level(self):
+        url = reverse('admin:hierarchy_asset_tree_children')
+        roots = self.client.get(url).json()["children"]
+        self.assertEqual([(n["asset_name"], n["has_children"]) for n in roots], [("Org", True)])
+
+        children = self.client.get(url, {"parent": self.org.pk}).json()["children"]
+        self.assertEqual(len(children), 5)
+        self.assertFalse(children[0]["has_children"])
+
+        self.assertEqual(self.client.get(reverse('admin:hierarchy_asset_tree')).status_code, 200)
+
+    def test_tree_children_rejects_bad_parameters(self):
+        url = reverse('admin:hierarchy_asset_tree_children')
+        for params in ({"parent": "abc"}, {"parent": self.org.pk, "root": "x"}, {"cursor": "garbage"}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn("error", response.json())
+
+    def test_tree_children_pages_through_a_level(self):
+        url = reverse('admin:hierarchy_asset_tree_children')
+        params = {"parent": self.org.pk, "root": self.org.pk}
+        names = []
+        with patch.object(AssetAdmin, 'tree_page_size', 2):
+            while True:
+                body = self.client.get(url, params).json()
+                self.assertLessEqual(len(body["children"]), 2)
+                names += [node["asset_name"] for node in body["children"]]
+                if not body["has_more"]:
+                    break
+                params["cursor"] = body["next_cursor"]
+        self.assertEqual(names, [f"Group {i}" for i in range(5)])
+        self.assertIsNone(body["next_cursor"])
+
+
+@skipUnless(connection.vendor == 'postgresql', "planner estimates are PostgreSQL-only")
+class EstimatedCountTests(TestCase):
+    def setUp(self):
+        org = Asset.objects.create(asset_name="Org", asset_type="organization")
+        for i in range(5):
+            Asset.objects.create(asset_name=f"Group {i}", asset_type="group", parent=org)
+
+    def count(self):
+        paginator = EstimatedCountPaginator(Asset.objects.order_by('id'), 100)
+        with patch.object(EstimatedCountPaginator, 'estimate_threshold', 1), \
+                CaptureQueriesContext(connection) as queries:
+            count = paginator.count
+        return count, [q['sql'] for q in queries if 'COUNT(' in q['sql'].upper()]
+
+    def test_estimate_sums_the_partitions(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE relname = 'hierarchy_asset'")
+            self.assertEqual(cursor.fetchone()[0], 'p')
+            cursor.execute("ANALYZE hierarchy_asset")
+
+        count, count_queries = self.count()
+        self.assertEqual(count, 6)
+        self.assertEqual(count_queries, [])
+
+    def test_unanalyzed_partitions_count_exactly(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE pg_class SET reltuples = -1 WHERE oid IN "
+                "(SELECT inhrelid FROM pg_inherits WHERE inhparent = 'hierarchy_asset'::regclass)"
+            )
+        count, count_queries = self.count()
+        self.assertEqual(count, 6)
+        self.assertEqual(len(count_queries), 1)
@@ -0,0 +1,118 @@
+import datetime
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from hierarchy.archive import archivable, archive_batch, archive_batches
+from hierarchy.models import ArchivedAsset, Asset, AssetChange
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization")
+        self.closed_org = Asset.objects.create(asset_name="Closed", asset_type="organization", is_active=False)
+        self.closed_group = Asset.objects.create(
+            asset_name="Closed group", asset_type="group", parent=self.closed_org, is_active=False)
+        self.closed_plant = Asset.objects.create(
+            asset_name="Closed plant", asset_type="plant", parent=self.closed_group, is_active=False)
+        # Expired, but still has a live child: must stay
+        self.expired_group = Asset.objects.create(
+            asset_name="Expired group", asset_type="group", parent=self.org, end_date=datetime.date(2020, 1, 1))
+        self.live_plant = Asset.objects.create(asset_name="Live plant", asset_type="plant", parent=self.expired_group)
+
+    def test_batches_drain_expired_subtrees_leaves_first(self):
+        # Only the leaf of the closed subtree; the next batch starts after it
+        self.assertEqual(archive_batch(10), (1, self.closed_plant.pk))
+        self.assertEqual(list(ArchivedAsset.objects.values_list('id', flat=True)), [self.closed_plant.pk])
+        self.assertEqual(archive_batch(10, after_id=self.closed_plant.pk), (0, None))
+        # Each later pass starts over and takes the parents that became leaves
+        self.assertEqual(
+            list(archive_batches(10)),
+            [(1, self.closed_group.pk), (1, self.closed_org.pk)],
+        )
+
+        self.assertEqual(
+            set(Asset.objects.values_list('id', flat=True)),
+            {self.org.pk, self.expired_group.pk, self.live_plant.pk},
+        )
+        archived = ArchivedAsset.objects.get(pk=self.closed_plant.pk)
+        self.assertEqual((archived.uuid, archived.parent_id, archived.root_id),
+                         (self.closed_plant.uuid, self.closed_group.pk, self.closed_org.pk))
+        self.assertTrue(AssetChange.objects.filter(asset_id=self.closed_org.pk, operation='delete').exists())
+
+    def test_batches_do_not_rescan_earlier_ids(self):
+        leaves = [
+            Asset.objects.create(asset_name=f"Old {i}", asset_type="plant", parent=self.org, is_active=False)
+            for i in range(3)
+        ]
+        self.assertEqual(archive_batch(1, after_id=leaves[0].pk), (1, leaves[1].pk))
+        self.assertEqual(archive_batch(1, after_id=leaves[1].pk), (1, leaves[2].pk))
+        self.assertTrue(Asset.objects.filter(pk=leaves[0].pk).exists())
+
+    def test_command_is_resumable(self):
+        out = StringIO()
+        call_command('archive_assets', '--batch-size=1', '--max-batches=1', stdout=out)
+        self.assertIn(f"resume with --after-id={self.closed_plant.pk}", out.getvalue())
+        self.assertIn("Archived 1 asset(s) in 1 batch(es)", out.getvalue())
+        call_command('archive_assets', f'--after-id={self.closed_plant.pk}', stdout=out)
+        self.assertEqual(ArchivedAsset.objects.count(), 3)
+
+    def test_end_date_is_relative_to_today(self):
+        call_command('archive_assets', '--today=2019-01-01', stdout=StringIO())
+        self.assertFalse(ArchivedAsset.objects.filter(pk__in=[self.expired_group.pk, self.live_plant.pk]).exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', "query plans are checked on PostgreSQL")
+class ArchiveIndexTests(TestCase):
+    def test_candidate_scan_uses_the_expired_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'asset_expirable_id_idx'::regclass"
+            )
+            partition_indexes = {name for (name,) in cursor.fetchall()}
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = archivable().filter(id__gt=0).values_list('id', flat=True)[:10].explain()
+        self.assertTrue(partition_indexes)
+        self.assertTrue(any(name in plan for name in partition_indexes), plan)
+
+
+class IncludeArchivedTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("tester"))
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization")
+        self.closed_org = Asset.objects.create(asset_name="Closed", asset_type="organization", is_active=False)
+        list(archive_batches(10))
+
+    def test_list(self):
+        self.assertEqual([row["asset_name"] for row in self.client.get("/api/assets/").json()], ["Org"])
+
+        rows = self.client.get("/api/assets/", {"include_archived": "true", "fields": "asset_name"}).json()["results"]
+        self.assertEqual(rows, [{"asset_name": "Org", "archived": False}, {"asset_name": "Closed", "archived": True}])
+
+        # Pages run through the live rows, then the archived ones
+        first = self.client.get("/api/assets/", {"include_archived": "true", "limit": 1}).json()
+        self.assertEqual([row["asset_name"] for row in first["results"]], ["Org"])
+        self.assertTrue(first["has_more"])
+        second = self.client.get(
+            "/api/assets/", {"include_archived": "true", "limit": 1, "cursor": first["next_cursor"]}).json()
+        self.assertEqual([(row["asset_name"], row["archived"]) for row in second["results"]], [("Closed", True)])
+        self.assertFalse(second["has_more"])
+
+        body = self.client.get("/api/assets/", {"include_archived": "true", "facets": "is_active"}).json()
+        self.assertEqual(body["count"], 2)
+        self.assertEqual(body["facets"]["is_active"], {"true": 1, "false": 1})
+
+    def test_retrieve(self):
+        url = f"/api/assets/{self.closed_org.pk}/"
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        response = self.client.get(url, {"include_archived": "true"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["uuid"], str(self.closed_org.uuid))
+        self.assertTrue(response.json()["archived"])
@@ -0,0 +1,134 @@
+import base64
+from unittest.mock import patch
+
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+
+from hierarchy.authentication import (
+    VERSION_KEY, CachedBasicAuthentication, CachedTokenAuthentication, TTLCache, auth_cache,
+)
+
+
+class TTLCacheTests(TestCase):
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+
+    def test_expiry(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        with patch('hierarchy.authentication.time.monotonic', return_value=0):
+            cache.set('a', 1)
+        with patch('hierarchy.authentication.time.monotonic', return_value=61):
+            self.assertIsNone(cache.get('a'))
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        auth_cache.clear()
+        cache.delete(VERSION_KEY)
+        self.user = User.objects.create_user("tester", password="s3cret-pass")
+        self.token = Token.objects.create(user=self.user)
+        self.factory = APIRequestFactory()
+
+    def token_request(self):
+        return self.factory.get('/api/assets/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_is_resolved_from_cache(self):
+        auth = CachedTokenAuthentication()
+        user, _ = auth.authenticate(self.token_request())
+        self.assertEqual(user, self.user)
+        with self.assertNumQueries(0):
+            user, _ = auth.authenticate(self.token_request())
+        self.assertEqual(user, self.user)
+
+    def test_deleted_token_is_evicted(self):
+        auth = CachedTokenAuthentication()
+        auth.authenticate(self.token_request())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            auth.authenticate(self.token_request())
+
+    def test_deactivated_user_is_evicted(self):
+        auth = CachedTokenAuthentication()
+        auth.authenticate(self.token_request())
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            auth.authenticate(self.token_request())
+
+    def test_basic_auth_hashes_password_once(self):
+        credentials = base64.b64encode(b'tester:s3cret-pass').decode()
+        request = self.factory.get('/api/assets/', HTTP_AUTHORIZATION=f'Basic {credentials}')
+        auth = CachedBasicAuthentication()
+        with patch('django.contrib.auth.base_user.check_password', wraps=check_password) as hashed:
+            for _ in range(3):
+                user, _ = auth.authenticate(request)
+        self.assertEqual(user, self.user)
+        self.assertEqual(hashed.call_count, 1)
+
+    def test_wrong_password_is_not_cached(self):
+        credentials = base64.b64encode(b'tester:wrong').decode()
+        request = self.factory.get('/api/assets/', HTTP_AUTHORIZATION=f'Basic {credentials}')
+        with self.assertRaises(AuthenticationFailed):
+            CachedBasicAuthentication().authenticate(request)
+        self.assertEqual(len(auth_cache), 0)
+
+    def test_invalidation_by_another_worker(self):
+        auth = CachedTokenAuthentication()
+        auth.authenticate(self.token_request())
+        # Another process replaced the shared version; this worker's entry
+        # is still in its local cache but no longer served
+        cache.set(VERSION_KEY, 'changed elsewhere')
+        with self.assertNumQueries(1):
+            auth.authenticate(self.token_request())
+        with self.assertNumQueries(0):
+            auth.authenticate(self.token_request())
+
+    def test_lookup_racing_a_change_is_not_served(self):
+        lookup = TokenAuthentication.authenticate_credentials
+
+        def racing(auth, key):
+            result = lookup(auth, key)
+            cache.set(VERSION_KEY, 'changed during lookup')
+            return result
+
+        auth = CachedTokenAuthentication()
+        with patch.object(TokenAuthentication, 'authenticate_credentials', racing):
+            auth.authenticate(self.token_request())
+        with self.assertNumQueries(1):
+            auth.authenticate(self.token_request())
+
+    def test_permission_changes_are_evicted(self):
+        auth = CachedTokenAuthentication()
+        auth.authenticate(self.token_request())
+        group = Group.objects.create(name="editors")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(group)
+        with self.assertNumQueries(1):
+            auth.authenticate(self.token_request())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            group.permissions.add(Permission.objects.get(codename='change_asset'))
+        with self.assertNumQueries(1):
+            auth.authenticate(self.token_request())
+
+    def test_each_request_gets_its_own_user(self):
+        auth = CachedTokenAuthentication()
+        first, token = auth.authenticate(self.token_request())
+        first._perm_cache = {'hierarchy.change_asset'}
+        second, second_token = auth.authenticate(self.token_request())
+        self.assertIsNot(first, second)
+        self.assertIs(second_token.user, second)
+        self.assertFalse(hasattr(second, '_perm_cache'))
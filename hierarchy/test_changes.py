@@ -0,0 +1,229 @@
+import datetime
+import threading
+import time
+from io import StringIO
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from hierarchy.archive import archive_batch
+from hierarchy.changes import prune_changes
+from hierarchy.models import Asset, AssetChange
+
+
+def change_inserts(queries):
+    return [q["sql"] for q in queries if q["sql"].startswith("INSERT") and "hierarchy_assetchange" in q["sql"]]
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("tester"))
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization")
+        self.other_org = Asset.objects.create(asset_name="Other", asset_type="organization")
+        self.group = Asset.objects.create(asset_name="Group", asset_type="group", parent=self.org)
+
+    def feed(self, **params):
+        response = self.client.get("/api/assets/changes/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_operations_are_recorded(self):
+        group = Asset.objects.get(pk=self.group.pk)
+        group.description = "renamed"
+        group.save()
+        group.parent = self.other_org
+        group.save()
+        group.delete()
+        self.assertEqual(
+            list(AssetChange.objects.filter(asset_id=self.group.pk).values_list('operation', flat=True)),
+            ['create', 'update', 'move', 'delete'],
+        )
+
+    def test_feed_returns_latest_state_and_tombstones(self):
+        start = self.feed()["cursor"]
+
+        group = Asset.objects.get(pk=self.group.pk)
+        group.description = "v2"
+        group.save()
+        group.description = "v3"
+        group.save()
+        other_pk = self.other_org.pk
+        self.other_org.delete()
+
+        feed = self.feed(since=start)
+        self.assertEqual([c["id"] for c in feed["changes"]], [self.group.pk, other_pk])
+        self.assertEqual(feed["changes"][0]["operation"], "update")
+        self.assertEqual(feed["changes"][0]["asset"]["description"], "v3")
+        self.assertEqual(feed["changes"][1]["operation"], "delete")
+        self.assertIsNone(feed["changes"][1]["asset"])
+        self.assertFalse(feed["has_more"])
+
+        self.assertEqual(self.feed(since=feed["cursor"])["changes"], [])
+
+    def test_pagination(self):
+        feed = self.feed(limit=2)
+        self.assertEqual(len(feed["changes"]), 2)
+        self.assertTrue(feed["has_more"])
+        rest = self.feed(since=feed["cursor"], limit=2)
+        self.assertEqual([c["id"] for c in rest["changes"]], [self.group.pk])
+        self.assertFalse(rest["has_more"])
+
+    def test_sparse_fields(self):
+        change = self.feed(fields="id,asset_name")["changes"][0]
+        self.assertEqual(change["asset"], {"id": self.org.pk, "asset_name": "Org"})
+
+    @patch('hierarchy.changes.POLL_INTERVAL', 0.05)
+    def test_long_poll(self):
+        cursor = self.feed()["cursor"]
+
+        started = time.monotonic()
+        self.assertEqual(self.feed(since=cursor, wait=0.2)["changes"], [])
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+        started = time.monotonic()
+        self.assertEqual(len(self.feed(since=0, wait=10)["changes"]), 3)
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_invalid_since(self):
+        for since in ("abc", "12", "1.2.3"):
+            response = self.client.get("/api/assets/changes/", {"since": since})
+            self.assertEqual(response.status_code, 400)
+
+
+class TombstoneBatchTests(TestCase):
+    def setUp(self):
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization")
+        self.groups = [
+            Asset.objects.create(asset_name=f"Group {i}", asset_type="group", parent=self.org) for i in range(3)
+        ]
+        self.plants = [
+            Asset.objects.create(asset_name=f"Plant {i}", asset_type="plant", parent=group)
+            for i, group in enumerate(self.groups)
+        ]
+        self.start = AssetChange.objects.order_by('-seq').values_list('seq', flat=True)[0]
+
+    def tombstones(self):
+        return set(AssetChange.objects.filter(seq__gt=self.start, operation='delete').values_list('asset_id', flat=True))
+
+    def test_subtree_delete_inserts_tombstones_in_one_statement(self):
+        ids = {self.org.pk, *(a.pk for a in self.groups + self.plants)}
+        with CaptureQueriesContext(connection) as queries:
+            Asset.objects.get(pk=self.org.pk).delete()
+        self.assertEqual(len(change_inserts(queries)), 1)
+        self.assertEqual(self.tombstones(), ids)
+
+    def test_queryset_delete_inserts_tombstones_in_one_statement(self):
+        with CaptureQueriesContext(connection) as queries:
+            Asset.objects.filter(asset_type='plant').delete()
+        self.assertEqual(len(change_inserts(queries)), 1)
+        self.assertEqual(self.tombstones(), {plant.pk for plant in self.plants})
+
+    def test_archive_batch_inserts_tombstones_in_one_statement(self):
+        Asset.objects.filter(asset_type='plant').update(is_active=False)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(archive_batch(500)[0], 3)
+        self.assertEqual(len(change_inserts(queries)), 1)
+        self.assertEqual(self.tombstones(), {plant.pk for plant in self.plants})
+
+    def test_failed_delete_records_nothing(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.org.delete()
+            raise RuntimeError
+        self.assertEqual(self.tombstones(), set())
+        self.assertEqual(Asset.objects.count(), 7)
+
+
+class PruneChangesTests(TestCase):
+    def setUp(self):
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization")
+        self.kept = Asset.objects.create(asset_name="Kept", asset_type="group", parent=self.org)
+        self.edited = Asset.objects.create(asset_name="Edited", asset_type="group", parent=self.org)
+        self.edited.description = "v2"
+        self.edited.save()
+        gone = Asset.objects.create(asset_name="Gone", asset_type="group", parent=self.org)
+        self.gone_pk = gone.pk
+        gone.delete()
+        AssetChange.objects.update(changed_at=timezone.now() - datetime.timedelta(days=40))
+        self.edited.description = "v3"
+        self.edited.save()  # recent
+
+    def operations(self):
+        return list(AssetChange.objects.values_list('asset_id', 'operation'))
+
+    def test_keeps_the_latest_change_of_every_live_asset(self):
+        self.assertEqual(prune_changes(timezone.now() - datetime.timedelta(days=30), batch_size=2), 4)
+        self.assertEqual(self.operations(), [
+            (self.org.pk, 'create'), (self.kept.pk, 'create'), (self.edited.pk, 'update'),
+        ])
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("tester"))
+        feed = client.get("/api/assets/changes/", {"since": 0}).json()
+        self.assertEqual({c["id"] for c in feed["changes"]}, {self.org.pk, self.kept.pk, self.edited.pk})
+
+    def test_command(self):
+        out = StringIO()
+        call_command("prune_changes", "--dry-run", stdout=out)
+        self.assertIn("4 change(s) can be pruned", out.getvalue())
+        self.assertEqual(len(self.operations()), 7)
+
+        call_command("prune_changes", "--days=60", stdout=out)
+        self.assertIn("Pruned 0 change(s)", out.getvalue())
+        call_command("prune_changes", stdout=out)
+        self.assertIn("Pruned 4 change(s) older than 30 day(s)", out.getvalue())
+        self.assertNotIn(self.gone_pk, [asset_id for asset_id, _ in self.operations()])
+
+
+@skipIf(connection.vendor == 'sqlite', "SQLite has a single writer, so transactions never interleave")
+class InterleavedTransactionTests(TransactionTestCase):
+    """A change committed late with a low seq is still delivered."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("tester"))
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization")
+
+    def feed(self, since):
+        response = self.client.get("/api/assets/changes/", {"since": since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_slow_writer_is_not_skipped(self):
+        written, finish = threading.Event(), threading.Event()
+
+        def slow_writer():
+            try:
+                with transaction.atomic():
+                    Asset.objects.create(asset_name="Slow", asset_type="group", parent=self.org)
+                    written.set()
+                    finish.wait(10)
+            finally:
+                connection.close()
+
+        start = self.feed(0)["cursor"]
+        thread = threading.Thread(target=slow_writer)
+        thread.start()
+        try:
+            self.assertTrue(written.wait(10))
+            fast = Asset.objects.create(asset_name="Fast", asset_type="group", parent=self.org)
+            self.assertTrue(AssetChange.objects.filter(asset_id=fast.pk).exists())
+
+            # "Fast" is committed, but the slow writer still runs and holds a
+            # lower seq: nothing after it may be handed out yet
+            held = self.feed(start)
+            self.assertEqual(held["changes"], [])
+            self.assertEqual(held["cursor"], start)
+        finally:
+            finish.set()
+            thread.join()
+
+        names = [change["asset"]["asset_name"] for change in self.feed(start)["changes"]]
+        self.assertEqual(sorted(names), ["Fast", "Slow"])
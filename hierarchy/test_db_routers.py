@@ -0,0 +1,213 @@
+import time
+from unittest.mock import Mock, patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from hierarchy import db_routers
+from hierarchy.db_routers import (
+    ReplicaRouter, begin_request, end_request, is_pinned, pin_to_primary, request_replica, unpin,
+)
+from hierarchy.middleware import ReplicaPinningMiddleware
+from hierarchy.models import Asset
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'], REPLICA_HEALTH_CHECK_INTERVAL=60)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        db_routers._health.clear()
+        self.router = ReplicaRouter()
+
+    def tearDown(self):
+        db_routers._health.clear()
+
+    @patch('hierarchy.db_routers._check_replica', return_value=True)
+    def test_reads_go_to_replicas(self, _check):
+        self.assertIn(self.router.db_for_read(Asset), {'replica_1', 'replica_2'})
+
+    def test_writes_go_to_primary(self):
+        self.assertEqual(self.router.db_for_write(Asset), 'default')
+
+    @patch('hierarchy.db_routers._check_replica', return_value=True)
+    def test_other_apps_read_from_primary(self, _check):
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+    @patch('hierarchy.db_routers._check_replica', return_value=True)
+    def test_pinned_context_reads_from_primary(self, _check):
+        token = pin_to_primary()
+        try:
+            self.assertEqual(self.router.db_for_read(Asset), 'default')
+        finally:
+            unpin(token)
+        self.assertFalse(is_pinned())
+
+    @patch('hierarchy.db_routers._check_replica', side_effect=lambda alias: alias == 'replica_2')
+    def test_unhealthy_replica_is_skipped(self, _check):
+        for _ in range(10):
+            self.assertEqual(self.router.db_for_read(Asset), 'replica_2')
+
+    @patch('hierarchy.db_routers._check_replica', return_value=False)
+    def test_falls_back_to_primary_when_no_replica_is_healthy(self, _check):
+        self.assertEqual(self.router.db_for_read(Asset), 'default')
+
+    @patch('hierarchy.db_routers._check_replica', return_value=True)
+    def test_health_is_cached(self, check):
+        for _ in range(5):
+            self.router.db_for_read(Asset)
+        self.assertEqual(check.call_count, 2)
+
+    @patch('hierarchy.db_routers._check_replica', return_value=True)
+    def test_one_replica_per_request(self, _check):
+        with patch('hierarchy.db_routers.choose_replica', wraps=db_routers.choose_replica) as choose:
+            token = begin_request()
+            try:
+                aliases = {self.router.db_for_read(Asset) for _ in range(20)}
+                self.assertEqual(aliases, {request_replica()})
+            finally:
+                end_request(token)
+        self.assertEqual(choose.call_count, 1)
+        self.assertIsNone(request_replica())
+
+
+class ReplicaHealthCheckTests(SimpleTestCase):
+    def check(self, connection):
+        with patch('hierarchy.db_routers.connections', {'replica_1': connection}):
+            return db_routers._check_replica('replica_1')
+
+    def test_open_connection_is_probed(self):
+        alive = Mock(connection=object(), **{'is_usable.return_value': True})
+        self.assertTrue(self.check(alive))
+        alive.is_usable.assert_called_once()
+        alive.close.assert_not_called()
+
+    def test_dead_open_connection_is_reopened(self):
+        dead = Mock(connection=object(), **{
+            'is_usable.return_value': False,
+            'ensure_connection.side_effect': OperationalError("connection refused"),
+        })
+        self.assertFalse(self.check(dead))
+        dead.close.assert_called()
+        dead.ensure_connection.assert_called_once()
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRouterTransactionTests(TransactionTestCase):
+    @patch('hierarchy.db_routers._check_replica', return_value=True)
+    def test_reads_inside_transaction_use_primary(self, _check):
+        router = ReplicaRouter()
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Asset), 'default')
+
+
+@override_settings(REPLICA_STICKY_SECONDS=30)
+class ReplicaPinningMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.seen_pinned = None
+
+    def get_response(self, request):
+        self.seen_pinned = is_pinned()
+        return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+    def call(self, request):
+        return ReplicaPinningMiddleware(self.get_response)(request)
+
+    def test_write_request_is_pinned(self):
+        self.call(self.factory.post('/api/assets/', HTTP_AUTHORIZATION='Token abc'))
+        self.assertTrue(self.seen_pinned)
+        self.assertFalse(is_pinned())
+
+    def test_reads_after_write_stick_to_primary(self):
+        self.call(self.factory.get('/api/assets/', HTTP_AUTHORIZATION='Token abc'))
+        self.assertFalse(self.seen_pinned)
+
+        response = self.call(self.factory.post('/api/assets/', HTTP_AUTHORIZATION='Token abc'))
+        self.assertEqual(response.cookies['pin_primary'].value, '1')
+
+        self.call(self.factory.get('/api/assets/', HTTP_AUTHORIZATION='Token abc'))
+        self.assertTrue(self.seen_pinned)
+
+        # Another client is unaffected
+        self.call(self.factory.get('/api/assets/', HTTP_AUTHORIZATION='Token xyz'))
+        self.assertFalse(self.seen_pinned)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'], REPLICA_STICKY_SECONDS=30)
+class ReplicaDatabaseTests(TransactionTestCase):
+    """
+    End to end with a real second alias: ``replica_1`` mirrors the test
+    database the way a streaming replica mirrors the primary. The alias is
+    added once the runner has set up the databases (a mirror needs no setup),
+    and '__all__' lets this class use it.
+    """
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        connections.settings['replica_1'] = {
+            **connections['default'].settings_dict,
+            'TEST': {**connections['default'].settings_dict['TEST'], 'MIRROR': 'default'},
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica_1'].close()
+        del connections['replica_1']
+        del connections.settings['replica_1']
+
+    def setUp(self):
+        cache.clear()
+        db_routers._health.clear()
+        user = User.objects.create_user("writer")
+        self.writer = APIClient(REMOTE_ADDR='10.0.0.1')
+        self.writer.force_authenticate(user)
+        self.reader = APIClient(REMOTE_ADDR='10.0.0.2')
+        self.reader.force_authenticate(user)
+
+    def asset_reads(self, client):
+        """Aliases that served hierarchy_asset reads during one list request."""
+        served = set()
+        for alias in ('default', 'replica_1'):
+            with CaptureQueriesContext(connections[alias]) as queries:
+                response = client.get('/api/assets/')
+            self.assertEqual(response.status_code, 200)
+            if any('hierarchy_asset' in q['sql'] and q['sql'].lstrip().upper().startswith('SELECT') for q in queries):
+                served.add(alias)
+        return served, [row['asset_name'] for row in response.json()]
+
+    def test_write_then_read(self):
+        self.assertEqual(self.asset_reads(self.reader)[0], {'replica_1'})
+
+        response = self.writer.post('/api/assets/', {'asset_name': 'Org', 'asset_type': 'organization'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        # The writer reads its own write from the primary...
+        self.assertEqual(self.asset_reads(self.writer), ({'default'}, ['Org']))
+        # ...other clients read from the replica, which has it once replicated
+        self.assertEqual(self.asset_reads(self.reader), ({'replica_1'}, ['Org']))
+
+    def test_failed_replica_falls_back_to_primary(self):
+        Asset.objects.create(asset_name='Org', asset_type='organization')
+
+        def down(execute, sql, params, many, context):
+            raise OperationalError("server closed the connection unexpectedly")
+
+        db_routers._health['replica_1'] = (True, time.monotonic())
+        with patch('hierarchy.db_routers._check_replica', return_value=False) as check, \
+                connections['replica_1'].execute_wrapper(down), \
+                CaptureQueriesContext(connections['default']) as primary:
+            response = self.reader.get('/api/assets/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['asset_name'] for row in response.json()], ['Org'])
+        check.assert_called_once_with('replica_1')
+        self.assertFalse(db_routers._health['replica_1'][0])
+        self.assertTrue(any('hierarchy_asset' in q['sql'] for q in primary))
@@ -0,0 +1,150 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from hierarchy.models import Asset
+
+
+class AssetFilterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("tester"))
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization")
+        self.closed_org = Asset.objects.create(asset_name="Closed", asset_type="organization", is_active=False)
+        self.group = Asset.objects.create(asset_name="Group", asset_type="group", parent=self.org)
+        self.plant = Asset.objects.create(
+            asset_name="Plant", asset_type="plant", parent=self.group, start_date=datetime.date(2024, 1, 1))
+        self.old_plant = Asset.objects.create(
+            asset_name="Old plant", asset_type="plant", parent=self.group, is_active=False,
+            start_date=datetime.date(2020, 1, 1), end_date=datetime.date(2022, 1, 1))
+        Asset.objects.create(asset_name="Plant X", asset_type="plant", parent=self.closed_org)
+
+    def names(self, **params):
+        response = self.client.get("/api/assets/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        rows = body["results"] if isinstance(body, dict) else body
+        return [row["asset_name"] for row in rows]
+
+    def test_defaults_to_organizations(self):
+        self.assertEqual(self.names(), ["Closed", "Org"])
+
+    def test_filters(self):
+        self.assertEqual(self.names(asset_type="plant"), ["Old plant", "Plant", "Plant X"])
+        self.assertEqual(self.names(asset_type="plant,group", is_active="true"), ["Group", "Plant", "Plant X"])
+        self.assertEqual(self.names(root=self.org.pk), ["Group", "Old plant", "Org", "Plant"])
+        self.assertEqual(self.names(root=self.org.pk, asset_type="plant", is_active="false"), ["Old plant"])
+        self.assertEqual(self.names(asset_type="plant", start_date_to="2024-06-01"), ["Old plant", "Plant"])
+        self.assertEqual(self.names(asset_type="plant", end_date_to="2023-01-01"), ["Old plant"])
+
+    def test_invalid_filters(self):
+        response = self.client.get("/api/assets/", {
+            "asset_type": "spaceship", "is_active": "maybe", "start_date_from": "yesterday", "facets": "colour",
+        })
+        self.assertEqual(response.status_code, 400)
+        body = str(response.json())
+        for param in ("asset_type", "is_active", "start_date_from", "facets"):
+            self.assertIn(param, body)
+
+    def test_facets_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/assets/", {
+                "root": self.org.pk, "asset_type": "plant", "is_active": "true", "facets": "asset_type,is_active",
+            })
+        body = response.json()
+        asset_queries = [q["sql"] for q in queries if "hierarchy_asset" in q["sql"]]
+        count_queries = [sql for sql in asset_queries if "COUNT" in sql.upper()]
+        self.assertEqual(len(count_queries), 1)
+        # One group per (asset_type, is_active), not a filtered count per value
+        self.assertIn("GROUP BY", count_queries[0].upper())
+        self.assertNotIn("FILTER", count_queries[0].upper())
+
+        self.assertEqual(body["count"], 1)
+        self.assertEqual([row["asset_name"] for row in body["results"]], ["Plant"])
+        # Each facet ignores its own filter but applies the others
+        self.assertEqual(body["facets"]["asset_type"]["plant"], 1)
+        self.assertEqual(body["facets"]["asset_type"]["group"], 1)
+        self.assertEqual(body["facets"]["asset_type"]["organization"], 1)
+        self.assertEqual(body["facets"]["is_active"], {"true": 1, "false": 1})
+
+    def test_facet_counts_apply_unrequested_facet_filters(self):
+        body = self.client.get("/api/assets/", {"asset_type": "plant", "is_active": "false", "facets": "asset_type"}).json()
+        self.assertEqual(body["count"], 1)
+        self.assertEqual(body["facets"]["asset_type"]["plant"], 1)
+        self.assertEqual(body["facets"]["asset_type"]["organization"], 1)
+        self.assertEqual(body["facets"]["asset_type"]["group"], 0)
+        self.assertNotIn("is_active", body["facets"])
+
+    def test_detail_routes_still_only_serve_organizations(self):
+        self.assertEqual(self.client.get(f"/api/assets/{self.plant.pk}/").status_code, 404)
+
+
+class AssetListPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("tester"))
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization")
+        # Same names with different ids, and name order unlike id order
+        for name in ["Plant C", "Plant A", "Plant B", "Plant A", "Plant D"]:
+            Asset.objects.create(asset_name=name, asset_type="plant", parent=self.org)
+
+    def get(self, **params):
+        response = self.client.get("/api/assets/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_default_organization_list_is_a_bare_list(self):
+        self.assertEqual([row["asset_name"] for row in self.get()], ["Org"])
+        self.assertEqual(self.get(limit=1)["results"][0]["asset_name"], "Org")
+
+    def test_broad_filters_are_paged_by_name_and_id(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {"asset_type": "plant", "limit": 2, "fields": "id,asset_name"}
+            if cursor:
+                params["cursor"] = cursor
+            body = self.get(**params)
+            self.assertLessEqual(len(body["results"]), 2)
+            seen += [(row["asset_name"], row["id"]) for row in body["results"]]
+            cursor = body["next_cursor"]
+            self.assertEqual(body["has_more"], cursor is not None)
+            if not body["has_more"]:
+                break
+
+        self.assertEqual(seen, sorted(Asset.objects.filter(asset_type="plant").values_list("asset_name", "id")))
+
+    def test_page_size_is_capped(self):
+        body = self.get(root=self.org.pk)
+        self.assertEqual(len(body["results"]), 6)
+        self.assertFalse(body["has_more"])
+        self.assertIsNone(body["next_cursor"])
+
+        with mock.patch('hierarchy.pagination.DEFAULT_LIMIT', 2), mock.patch('hierarchy.pagination.MAX_LIMIT', 3):
+            self.assertEqual(len(self.get(root=self.org.pk)["results"]), 2)
+            body = self.get(root=self.org.pk, limit=100_000)
+        self.assertEqual(len(body["results"]), 3)
+        self.assertTrue(body["has_more"])
+
+    def test_page_queries_use_the_limit(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.get(asset_type="plant", limit=2)
+        selects = [q["sql"] for q in queries if q["sql"].startswith("SELECT") and "hierarchy_asset" in q["sql"]]
+        self.assertEqual(len(selects), 1)
+        self.assertIn("LIMIT 3", selects[0])
+
+    def test_next_page_starts_at_an_index_bound(self):
+        cursor = self.get(asset_type="plant", limit=2)["next_cursor"]
+        with CaptureQueriesContext(connection) as queries:
+            self.get(asset_type="plant", limit=2, cursor=cursor)
+        select = next(q["sql"] for q in queries if q["sql"].startswith("SELECT") and "hierarchy_asset" in q["sql"])
+        self.assertRegex(select, r'"asset_name" >= ')
+
+    def test_invalid_cursor_and_limit(self):
+        self.assertEqual(self.client.get("/api/assets/", {"asset_type": "plant", "cursor": "nope"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/assets/", {"asset_type": "plant", "limit": "many"}).status_code, 400)
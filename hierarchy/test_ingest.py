@@ -0,0 +1,127 @@
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+from unittest import mock, skipIf
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from hierarchy.ingest import IngestError, pack, parallel_ingest, split_subtrees
+from hierarchy.models import Asset
+
+
+def rows():
+    return [
+        {"asset_name": "Org A", "asset_type": "organization"},
+        {"asset_name": "Org B", "asset_type": "organization"},
+        {"asset_name": "A1", "asset_type": "group", "parent": "Org A"},
+        {"asset_name": "A2", "asset_type": "group", "parent": "Org A"},
+        {"asset_name": "A1 plant", "asset_type": "plant", "parent": "A1"},
+        {"asset_name": "A1 plant 2", "asset_type": "plant", "parent": "A1"},
+        {"asset_name": "B1", "asset_type": "group", "parent": "Org B"},
+        {"asset_name": "B1 plant", "asset_type": "plant", "parent": "B1"},
+    ]
+
+
+class PartitioningTests(SimpleTestCase):
+    def test_split_by_subtree_below_organization(self):
+        subtrees = split_subtrees(rows())
+        self.assertEqual(
+            {key: [row["asset_name"] for row in value] for key, value in subtrees.items()},
+            {"A1": ["A1", "A1 plant", "A1 plant 2"], "A2": ["A2"], "B1": ["B1", "B1 plant"]},
+        )
+
+    def test_pack_balances_row_counts(self):
+        subtrees = split_subtrees(rows())
+        self.assertEqual(pack(subtrees, 2), [["A1"], ["B1", "A2"]])
+        self.assertEqual(pack(subtrees, 8), [["A1"], ["B1"], ["A2"]])
+
+    def test_broken_ancestry_fails_before_writing(self):
+        for data in (
+            rows() + [{"asset_name": "Lost", "asset_type": "plant", "parent": "Nowhere"}],
+            rows() + [{"asset_name": "X", "asset_type": "group", "parent": "Y"},
+                      {"asset_name": "Y", "asset_type": "group", "parent": "X"}],
+        ):
+            with self.assertRaises(IngestError):
+                split_subtrees(data)
+
+
+class ParallelIngestTests(TestCase):
+    def test_merged_result(self):
+        result = parallel_ingest(rows(), workers=2)
+
+        self.assertEqual(result["count"], 8)
+        self.assertEqual(result["organizations"], 2)
+        self.assertEqual([p["count"] for p in result["partitions"]], [3, 3])
+        plant = Asset.objects.get(asset_name="A1 plant")
+        self.assertEqual(plant.parent.asset_name, "A1")
+        self.assertEqual(plant.root.asset_name, "Org A")
+
+    def test_failed_partition_is_rolled_back_alone(self):
+        data = rows()
+        data[7] = {**data[7], "asset_type": "spaceship"}
+        result = parallel_ingest(data, workers=2)
+
+        failed = [p for p in result["partitions"] if "error" in p]
+        self.assertEqual([p["subtrees"] for p in failed], [["B1", "A2"]])
+        self.assertEqual(result["count"], 5)
+        self.assertFalse(Asset.objects.filter(asset_name__in=["A2", "B1"]).exists())
+        self.assertTrue(Asset.objects.filter(asset_name="A1 plant 2").exists())
+
+    def test_upload_endpoint_never_forks(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("tester"))
+        with mock.patch('hierarchy.ingest.ProcessPoolExecutor') as pool:
+            response = client.post("/api/assets/bulk/?parallel=true", rows(), format="json")
+        pool.assert_not_called()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["count"], 8)
+
+        response = client.post("/api/assets/bulk/?parallel=true",
+                               [{"asset_name": "Lost", "asset_type": "plant", "parent": "Nowhere"}], format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "assets.json")
+            with open(path, "w") as fh:
+                json.dump({"assets": rows()}, fh)
+            out = StringIO()
+            call_command("bulk_ingest", path, "--workers=3", stdout=out)
+        self.assertIn("Created 8 asset(s) (2 organization(s))", out.getvalue())
+
+
+@skipIf(connection.vendor == 'sqlite', "SQLite allows a single writer, so partitions never run in processes there")
+class ProcessPoolIngestTests(TransactionTestCase):
+    """Partitions committed by forked processes, each on its own connection."""
+
+    def ingest(self, data):
+        with mock.patch('hierarchy.ingest.ProcessPoolExecutor', wraps=ProcessPoolExecutor) as pool:
+            result = parallel_ingest(data, workers=2)
+        pool.assert_called_once()
+        return result
+
+    def test_partitions_commit_from_worker_processes(self):
+        result = self.ingest(rows())
+
+        self.assertEqual(result["count"], 8)
+        self.assertEqual([p["count"] for p in result["partitions"]], [3, 3])
+        self.assertEqual(Asset.objects.count(), 8)
+        plant = Asset.objects.get(asset_name="B1 plant")
+        self.assertEqual((plant.parent.asset_name, plant.root.asset_name), ("B1", "Org B"))
+
+    def test_failed_partition_is_rolled_back_alone(self):
+        data = rows()
+        data[7] = {**data[7], "asset_type": "spaceship"}
+        result = self.ingest(data)
+
+        self.assertEqual([p["subtrees"] for p in result["partitions"] if "error" in p], [["B1", "A2"]])
+        self.assertEqual(
+            set(Asset.objects.values_list("asset_name", flat=True)),
+            {"Org A", "Org B", "A1", "A1 plant", "A1 plant 2"},
+        )
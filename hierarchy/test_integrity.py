@@ -0,0 +1,152 @@
+import io
+import threading
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from hierarchy.models import Asset
+from hierarchy.serializers import AssetSerializer
+
+
+class CyclePreventionTests(TestCase):
+    def setUp(self):
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization")
+        self.group = Asset.objects.create(asset_name="Group", asset_type="group", parent=self.org, hierarchy_level=1)
+        self.plant = Asset.objects.create(asset_name="Plant", asset_type="plant", parent=self.group, hierarchy_level=2)
+
+    def test_cannot_move_under_own_descendant(self):
+        group = Asset.objects.get(pk=self.group.pk)
+        group.parent = self.plant
+        with self.assertRaises(ValidationError):
+            group.save()
+
+    def test_cannot_be_own_parent(self):
+        group = Asset.objects.get(pk=self.group.pk)
+        group.parent_id = group.pk
+        with self.assertRaises(ValidationError):
+            group.save()
+
+    def test_cycle_check_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(self.group.creates_cycle(self.plant.pk))
+        with self.assertNumQueries(1):
+            self.assertFalse(self.plant.creates_cycle(self.org.pk))
+
+    def test_serializer_rejects_cycle_on_partial_update(self):
+        serializer = AssetSerializer(self.group, data={"parent": self.plant.pk}, partial=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("descendants", str(serializer.errors))
+
+    def test_partial_update_without_type_keeps_stored_values(self):
+        serializer = AssetSerializer(self.plant, data={"description": "new"}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_children_endpoint_survives_existing_cycle(self):
+        # Corrupt data written around validation must not hang the worker
+        Asset.objects.filter(pk=self.group.pk).update(parent_id=self.plant.pk)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("tester"))
+        response = client.get(f"/api/assets/{self.org.pk}/children/")
+        self.assertEqual(response.status_code, 200)
+
+
+@skipUnless(connection.vendor == 'postgresql', "the move lock is a PostgreSQL advisory lock")
+class ConcurrentMoveTests(TransactionTestCase):
+    def setUp(self):
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization")
+        self.a = Asset.objects.create(asset_name="A", asset_type="group", parent=self.org)
+        self.b = Asset.objects.create(asset_name="B", asset_type="group", parent=self.org)
+
+    def test_crossing_moves_cannot_both_pass(self):
+        moved, finish = threading.Event(), threading.Event()
+        errors = []
+
+        def move_a_under_b():
+            try:
+                with transaction.atomic():
+                    a = Asset.objects.get(pk=self.a.pk)
+                    a.parent = self.b
+                    a.save()
+                    moved.set()
+                    finish.wait(10)
+            finally:
+                connection.close()
+
+        def move_b_under_a():
+            try:
+                # Validated before A's move commits, so the early check passes
+                serializer = AssetSerializer(Asset.objects.get(pk=self.b.pk), data={"parent": self.a.pk}, partial=True)
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+                serializer.save()
+            except serializers.ValidationError as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        first = threading.Thread(target=move_a_under_b)
+        first.start()
+        self.assertTrue(moved.wait(10))
+        second = threading.Thread(target=move_b_under_a)
+        second.start()
+        second.join(0.5)
+        self.assertTrue(second.is_alive())  # waiting for the move lock
+        finish.set()
+        first.join()
+        second.join(10)
+
+        self.assertEqual(len(errors), 1)
+        self.assertIn("descendants", str(errors[0].detail))
+        self.assertEqual(Asset.objects.get(pk=self.a.pk).parent_id, self.b.pk)
+        self.assertEqual(Asset.objects.get(pk=self.b.pk).parent_id, self.org.pk)
+
+
+class IntegrityScanTests(TestCase):
+    def setUp(self):
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization")
+        self.group = Asset.objects.create(asset_name="Group", asset_type="group", parent=self.org, hierarchy_level=1)
+        self.plant = Asset.objects.create(asset_name="Plant", asset_type="plant", parent=self.group, hierarchy_level=2)
+
+    def scan(self, **options):
+        out = io.StringIO()
+        call_command('check_hierarchy_integrity', stdout=out, chunk_size=2, **options)
+        return out.getvalue()
+
+    def test_clean_tree(self):
+        self.assertIn("No integrity issues found", self.scan(fail_on_issues=True))
+
+    def test_reports_issues(self):
+        room = Asset.objects.create(asset_name="Room", asset_type="Rooms", parent=self.plant, hierarchy_level=7)
+        Asset.objects.create(asset_name="Line", asset_type="Line", parent=room, hierarchy_level=4)
+        Asset.objects.filter(pk=self.plant.pk).update(parent_id=room.pk)          # plant <-> room cycle
+        Asset.objects.filter(pk=self.group.pk).update(root_id=self.plant.pk)      # wrong root
+        with connection.cursor() as cursor:                                     # orphan
+            cursor.execute(
+                "INSERT INTO hierarchy_asset (uuid, asset_name, asset_type, hierarchy_level, parent_id, root_id, is_active, start_date)"
+                " VALUES (%s, 'Lost', 'Line', 1, 999999, 999999, %s, '2025-01-01')",
+                ['0123456789abcdef0123456789abcdef', True],
+            )
+        try:
+            output = self.scan()
+            self.assertIn("cycle: 2", output)
+            self.assertIn("orphan: 1", output)
+            self.assertIn("detached: 1", output)
+            self.assertIn("wrong_root: 1", output)
+            self.assertIn(f"cycle\tid={room.pk}", output)
+            with self.assertRaises(CommandError):
+                self.scan(fail_on_issues=True)
+        finally:
+            Asset.objects.filter(asset_name="Lost").delete()
+
+    def test_reports_wrong_level_and_type_rule(self):
+        Asset.objects.filter(pk=self.plant.pk).update(hierarchy_level=5)
+        Asset.objects.filter(pk=self.group.pk).update(asset_type='organization')
+        output = self.scan()
+        self.assertIn("wrong_level: 1", output)
+        self.assertIn("type_rule: 1", output)
@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+
+from django.test import SimpleTestCase
+
+from .logging_utils import JSONFormatter, QueueListenerHandler, RateLimitFilter
+
+
+def make_record(msg='hello %s', args=('world',), level=logging.INFO, name='hierarchy.test', **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class JSONFormatterTests(SimpleTestCase):
+    def test_one_object_per_record_with_extras(self):
+        line = JSONFormatter().format(make_record(trace_id='abc', status=200))
+        payload = json.loads(line)
+
+        self.assertEqual(payload['message'], 'hello world')
+        self.assertEqual(payload['level'], 'INFO')
+        self.assertEqual(payload['logger'], 'hierarchy.test')
+        self.assertEqual(payload['trace_id'], 'abc')
+        self.assertEqual(payload['status'], 200)
+        self.assertNotIn('args', payload)
+
+    def test_exception_and_unserialisable_extras(self):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = logging.LogRecord('x', logging.ERROR, __file__, 1, 'failed', (), sys.exc_info())
+        record.request = object()
+
+        payload = json.loads(JSONFormatter().format(record))
+        self.assertIn('ValueError: boom', payload['exc_info'])
+        self.assertIn('object', payload['request'])
+
+
+class RateLimitFilterTests(SimpleTestCase):
+    def test_burst_then_drop_per_logger(self):
+        rate_limit = RateLimitFilter(rate=0.001, burst=3)
+
+        kept = [rate_limit.filter(make_record()) for _ in range(10)]
+        self.assertEqual(kept.count(True), 3)
+        # Buckets are per logger
+        self.assertTrue(rate_limit.filter(make_record(name='hierarchy.other')))
+
+    def test_warnings_always_pass(self):
+        rate_limit = RateLimitFilter(rate=0.001, burst=1, sample=0.0)
+        self.assertFalse(rate_limit.filter(make_record()))
+        self.assertTrue(rate_limit.filter(make_record(level=logging.WARNING)))
+
+
+class QueueListenerHandlerTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'logs', 'app.log')
+
+    def test_records_are_written_by_background_thread(self):
+        handler = QueueListenerHandler(filename=self.path, console=False)
+        self.addCleanup(handler.close)
+        written_by = []
+        handler.targets[0].emit = lambda record, emit=handler.targets[0].emit: (
+            written_by.append(threading.current_thread()), emit(record))
+
+        handler.handle(make_record(trace_id='t-1'))
+        handler.flush()
+
+        self.assertNotIn(threading.current_thread(), written_by)
+        with open(self.path) as fh:
+            payload = json.loads(fh.readline())
+        self.assertEqual(payload['message'], 'hello world')
+        self.assertEqual(payload['trace_id'], 't-1')
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = QueueListenerHandler(filename=self.path, console=False, maxsize=1)
+        self.addCleanup(handler.close)
+        handler.listener.stop()  # nothing drains the queue
+
+        for _ in range(5):
+            handler.handle(make_record())
+
+        self.assertEqual(handler.dropped, 4)
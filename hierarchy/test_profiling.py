@@ -0,0 +1,67 @@
+import tracemalloc
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from hierarchy import profiling
+from hierarchy.models import Asset
+
+
+@override_settings(PROFILING_TOKEN="s3cret", PROFILING_SAMPLE_RATE=0.0)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        profiling.clear()
+        self.addCleanup(profiling.clear)
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization")
+        Asset.objects.create(asset_name="Group", asset_type="group", parent=self.org)
+        self.admin = APIClient()
+        self.admin.force_authenticate(User.objects.create_user("admin", is_staff=True))
+        self.user = APIClient()
+        self.user.force_authenticate(User.objects.create_user("tester"))
+
+    def test_header_profiles_request(self):
+        response = self.user.get(f"/api/assets/{self.org.pk}/children/", HTTP_X_PROFILE="s3cret")
+        profile_id = response["X-Profile-ID"]
+
+        summary = self.admin.get("/api/profiles/").json()
+        self.assertEqual([p["id"] for p in summary], [int(profile_id)])
+        self.assertNotIn("cpu", summary[0])
+
+        detail = self.admin.get(f"/api/profiles/{profile_id}/").json()
+        self.assertEqual(detail["trigger"], "header")
+        self.assertEqual(detail["status"], 200)
+        self.assertTrue(detail["path"].endswith("/children/"))
+        self.assertGreater(detail["cpu"]["total_calls"], 0)
+        self.assertTrue(any("views.py" in f["function"] for f in detail["cpu"]["top_functions"]))
+        self.assertGreater(detail["memory"]["peak_kb"], 0)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_wrong_or_missing_token_is_not_profiled(self):
+        for headers in ({}, {"HTTP_X_PROFILE": "guess"}):
+            response = self.user.get("/api/assets/", **headers)
+            self.assertNotIn("X-Profile-ID", response)
+        self.assertEqual(profiling.list_profiles(), [])
+
+    def test_sampling(self):
+        with override_settings(PROFILING_TOKEN="", PROFILING_SAMPLE_RATE=1.0):
+            response = APIClient().get("/api/health/liveness/")
+        self.assertEqual(profiling.get_profile(int(response["X-Profile-ID"]))["trigger"], "sample")
+
+    def test_one_profile_at_a_time(self):
+        with profiling._active:
+            response = self.user.get("/api/assets/", HTTP_X_PROFILE="s3cret")
+        self.assertNotIn("X-Profile-ID", response)
+
+    def test_endpoints_are_admin_only(self):
+        self.assertEqual(self.user.get("/api/profiles/").status_code, 403)
+        self.assertEqual(self.admin.get("/api/profiles/999/").status_code, 404)
+
+    def test_disabled_hook_skips_profiling_module(self):
+        with override_settings(PROFILING_TOKEN="", PROFILING_SAMPLE_RATE=0.0), \
+                patch.object(profiling, "trigger") as trigger:
+            client = APIClient()
+            client.force_authenticate(User.objects.get(username="tester"))
+            client.get("/api/assets/", HTTP_X_PROFILE="s3cret")
+        trigger.assert_not_called()
@@ -0,0 +1,119 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from hierarchy.models import Asset
+
+
+class AssetRootTests(TestCase):
+    def setUp(self):
+        self.org = Asset.objects.create(asset_name="Org A", asset_type="organization")
+        self.other_org = Asset.objects.create(asset_name="Org B", asset_type="organization")
+        self.group = Asset.objects.create(asset_name="Group", asset_type="group", parent=self.org, hierarchy_level=1)
+        self.plant = Asset.objects.create(asset_name="Plant", asset_type="plant", parent=self.group, hierarchy_level=2)
+
+    def test_root_is_maintained_on_create(self):
+        self.assertEqual(self.org.root_id, self.org.pk)
+        self.assertEqual(Asset.objects.get(pk=self.org.pk).root_id, self.org.pk)
+        self.assertEqual(Asset.objects.get(pk=self.plant.pk).root_id, self.org.pk)
+
+    def test_move_rewrites_subtree_root(self):
+        group = Asset.objects.get(pk=self.group.pk)
+        group.parent = self.other_org
+        group.save()
+        self.assertEqual(Asset.objects.get(pk=self.group.pk).root_id, self.other_org.pk)
+        self.assertEqual(Asset.objects.get(pk=self.plant.pk).root_id, self.other_org.pk)
+
+    def test_model_declares_the_database_uniqueness(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Asset._meta.db_table)
+        in_database = {
+            name: constraint['columns'] for name, constraint in constraints.items()
+            if constraint['unique'] and not constraint['primary_key']
+        }
+        declared = {
+            constraint.name: [Asset._meta.get_field(field).column for field in constraint.fields]
+            for constraint in Asset._meta.constraints
+        }
+        self.assertEqual(in_database, declared)
+        self.assertEqual(declared, {'hierarchy_asset_root_uuid_key': ['root_id', 'uuid']})
+
+    def test_uuid_is_unique_per_organization(self):
+        Asset.objects.create(asset_name="Copy", asset_type="group", parent=self.other_org, uuid=self.group.uuid)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Asset.objects.create(asset_name="Clash", asset_type="plant", parent=self.group, uuid=self.group.uuid)
+
+    def test_get_descendants_stays_in_one_organization(self):
+        Asset.objects.create(asset_name="Elsewhere", asset_type="group", parent=self.other_org)
+        self.assertEqual(
+            [a.asset_name for a in self.org.get_descendants()],
+            ["Group", "Plant"],
+        )
+
+    def test_get_descendants_keeps_the_original_order(self):
+        # Names disagree with ids: the asset's children by name, then each
+        # child's descendants in turn (not one level sorted by name)
+        beta = Asset.objects.create(asset_name="Beta", asset_type="group", parent=self.other_org)
+        alpha = Asset.objects.create(asset_name="Alpha", asset_type="group", parent=self.other_org)
+        Asset.objects.create(asset_name="Zulu", asset_type="plant", parent=alpha)
+        Asset.objects.create(asset_name="Yankee", asset_type="plant", parent=beta)
+        Asset.objects.create(asset_name="Able", asset_type="plant", parent=alpha)
+        expected = ["Alpha", "Beta", "Able", "Zulu", "Yankee"]
+
+        self.assertEqual([a.asset_name for a in self.other_org.get_descendants()], expected)
+        rows = self.other_org.get_descendants('id', 'parent_id', 'asset_name')
+        self.assertEqual([name for _, _, name in rows], expected)
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("tester"))
+        response = client.get(f"/api/assets/{self.other_org.pk}/children/?fields=asset_name")
+        self.assertEqual([row["asset_name"] for row in response.json()], expected)
+
+    def test_children_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("tester"))
+        response = client.get(f"/api/assets/{self.org.pk}/children/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["asset_name"] for row in response.json()], ["Group", "Plant"])
+        self.assertNotIn("root", response.json()[0])
+
+        response = client.get(f"/api/assets/{self.org.pk}/children/?asset_type=plant")
+        self.assertEqual([row["asset_name"] for row in response.json()], ["Plant"])
+
+
+@skipUnless(connection.vendor == 'postgresql', "hierarchy_asset is only partitioned on PostgreSQL")
+class AssetPartitionTests(TestCase):
+    def setUp(self):
+        self.org = Asset.objects.create(asset_name="Org A", asset_type="organization")
+        self.other_org = Asset.objects.create(asset_name="Org B", asset_type="organization")
+        self.group = Asset.objects.create(asset_name="Group", asset_type="group", parent=self.org, hierarchy_level=1)
+
+    def partitions_scanned(self, queryset):
+        return set(re.findall(r'hierarchy_asset_p\d+', queryset.explain()))
+
+    def test_root_scoped_queries_prune_to_one_partition(self):
+        self.assertEqual(len(self.partitions_scanned(Asset.objects.filter(root_id=self.org.pk, parent_id=self.org.pk))), 1)
+        self.assertEqual(len(self.partitions_scanned(Asset.objects.filter(root_id=self.org.pk, id__in=[self.group.pk]))), 1)
+        self.assertGreater(len(self.partitions_scanned(Asset.objects.filter(parent_id=self.org.pk))), 1)
+
+    def test_organization_is_inserted_with_its_root(self):
+        with CaptureQueriesContext(connection) as queries:
+            org = Asset.objects.create(asset_name="Org C", asset_type="organization")
+        self.assertEqual(org.root_id, org.pk)
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE')])
+        self.assertEqual(Asset.objects.get(root_id=org.pk, pk=org.pk).asset_name, "Org C")
+
+    def test_move_to_another_organization_moves_partition(self):
+        plant = Asset.objects.create(asset_name="Plant", asset_type="plant", parent=self.group, hierarchy_level=2)
+        group = Asset.objects.get(pk=self.group.pk)
+        group.parent = self.other_org
+        group.save()
+        self.assertEqual(
+            set(Asset.objects.filter(root_id=self.other_org.pk).values_list('id', flat=True)),
+            {self.other_org.pk, self.group.pk, plant.pk},
+        )
@@ -0,0 +1,105 @@
+import datetime
+import io
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from hierarchy.models import Asset
+from hierarchy.renderers import FastJSONRenderer
+from hierarchy.serializers import AssetSerializer, AssetReadSerializer
+
+
+class AssetReadSerializerTests(TestCase):
+    def setUp(self):
+        self.org = Asset.objects.create(
+            asset_name="Org — Zürich \u2028", asset_type="organization",
+            description='Quotes " and \\ backslashes', end_date=datetime.date(2030, 12, 31),
+        )
+        self.group = Asset.objects.create(
+            asset_name="Group", asset_type="group", parent=self.org,
+            hierarchy_level=1, is_active=False,
+        )
+
+    def render_both(self, queryset):
+        expected = JSONRenderer().render(AssetSerializer(queryset, many=True).data)
+        actual = FastJSONRenderer().render(AssetReadSerializer().serialize(queryset))
+        return expected, actual
+
+    def test_output_matches_model_serializer_byte_for_byte(self):
+        expected, actual = self.render_both(Asset.objects.all())
+        self.assertEqual(actual, expected)
+
+    def test_empty_queryset(self):
+        expected, actual = self.render_both(Asset.objects.none())
+        self.assertEqual(actual, expected)
+
+    def test_field_subset(self):
+        data = AssetReadSerializer(fields=['id', 'parent']).serialize(Asset.objects.filter(pk=self.group.pk))
+        self.assertEqual(data, [{'id': self.group.pk, 'parent': self.org.pk}])
+
+    def test_list_and_children_endpoints_match_model_serializer(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("tester"))
+
+        response = client.get("/api/assets/")
+        self.assertEqual(
+            response.content,
+            JSONRenderer().render(AssetSerializer(Asset.objects.filter(asset_type='organization'), many=True).data),
+        )
+
+        response = client.get(f"/api/assets/{self.org.pk}/children/")
+        self.assertEqual(
+            response.content,
+            JSONRenderer().render(AssetSerializer([self.group], many=True).data),
+        )
+
+    def test_indented_output_uses_stdlib_encoder(self):
+        rendered = FastJSONRenderer().render([{'a': 1}], 'application/json; indent=2')
+        self.assertEqual(rendered, b'[\n  {\n    "a": 1\n  }\n]')
+
+    def test_benchmark_command(self):
+        call_command('benchmark_serializers', rows=200, repeat=1, min_speedup=0, stdout=io.StringIO())
+        self.assertEqual(Asset.objects.count(), 2)  # benchmark rows are rolled back
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("tester"))
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization", description="x" * 1000)
+        self.group = Asset.objects.create(asset_name="Group", asset_type="group", parent=self.org, hierarchy_level=1)
+
+    def test_list_fields(self):
+        response = self.client.get("/api/assets/?fields=id,asset_name,asset_type,parent")
+        self.assertEqual(response.json(), [
+            {"id": self.org.pk, "asset_name": "Org", "asset_type": "organization", "parent": None},
+        ])
+
+    def test_children_exclude(self):
+        response = self.client.get(f"/api/assets/{self.org.pk}/children/?exclude=description,uuid")
+        row = response.json()[0]
+        self.assertNotIn("description", row)
+        self.assertNotIn("uuid", row)
+        self.assertEqual(row["parent"], self.org.pk)
+
+    def test_children_fields_without_filter_columns(self):
+        response = self.client.get(f"/api/assets/{self.org.pk}/children/?fields=asset_name&asset_type=group")
+        self.assertEqual(response.json(), [{"asset_name": "Group"}])
+
+    def test_retrieve_defers_unrequested_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f"/api/assets/{self.org.pk}/?fields=id,asset_name")
+        self.assertEqual(response.json(), {"id": self.org.pk, "asset_name": "Org"})
+        asset_queries = [q["sql"] for q in ctx.captured_queries if "hierarchy_asset" in q["sql"]]
+        self.assertEqual(len(asset_queries), 1)
+        self.assertNotIn("description", asset_queries[0])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get("/api/assets/?fields=id,password")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", str(response.json()["error"]))
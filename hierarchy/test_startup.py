@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+import types
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from hierarchy import telemetry
+
+# Cold-start budget for `django.setup()` in a fresh interpreter. Pods
+# autoscale, so a regression here directly delays new capacity.
+STARTUP_BUDGET_SECONDS = float(os.environ.get('STARTUP_BUDGET_SECONDS', '1.5'))
+
+STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "elapsed": elapsed,
+    "otel_sdk_loaded": "opentelemetry.sdk.trace" in sys.modules,
+}))
+"""
+
+
+def run_startup_probe(**env):
+    child_env = dict(os.environ, **env)
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP_PROBE],
+        env=child_env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class StartupBudgetTests(SimpleTestCase):
+    def test_telemetry_disabled_skips_sdk_imports(self):
+        probe = run_startup_probe(TELEMETRY_ENABLED='False')
+        self.assertFalse(probe['otel_sdk_loaded'])
+
+    def test_cold_start_within_budget(self):
+        # Best of three runs to smooth out noisy CI machines
+        elapsed = min(
+            run_startup_probe(TELEMETRY_ENABLED='False')['elapsed']
+            for _ in range(3)
+        )
+        self.assertLess(
+            elapsed, STARTUP_BUDGET_SECONDS,
+            f"django.setup() took {elapsed:.3f}s (budget {STARTUP_BUDGET_SECONDS}s)",
+        )
+
+
+class PostgresInstrumentationTests(SimpleTestCase):
+    """Database spans follow the driver Django actually loads."""
+
+    def instrumented(self, is_psycopg3):
+        modules = {
+            'opentelemetry.instrumentation.psycopg': types.SimpleNamespace(PsycopgInstrumentor=mock.Mock()),
+            'opentelemetry.instrumentation.psycopg2': types.SimpleNamespace(Psycopg2Instrumentor=mock.Mock()),
+        }
+        with mock.patch.dict(sys.modules, modules), \
+                mock.patch('django.db.backends.postgresql.psycopg_any.is_psycopg3', is_psycopg3):
+            telemetry._instrument_postgresql()
+        return {
+            name for name, module in modules.items()
+            if next(iter(vars(module).values())).return_value.instrument.called
+        }
+
+    def test_psycopg3(self):
+        self.assertEqual(self.instrumented(True), {'opentelemetry.instrumentation.psycopg'})
+
+    def test_psycopg2(self):
+        self.assertEqual(self.instrumented(False), {'opentelemetry.instrumentation.psycopg2'})
@@ -0,0 +1,91 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from hierarchy.models import ThrottleCounter
+from hierarchy.throttling import ScopedSlidingWindowThrottle, UserSlidingWindowThrottle
+
+RATES = {'user': '3/minute', 'anon': '3/minute', 'cheap': '5/minute', 'expensive': '1/minute'}
+
+
+class CheapView(APIView):
+    throttle_scope = 'cheap'
+
+
+class ExpensiveView(APIView):
+    throttle_scope = 'expensive'
+
+
+@patch.dict('rest_framework.throttling.SimpleRateThrottle.THROTTLE_RATES', RATES, clear=True)
+class SlidingWindowThrottleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("tester")
+        self.factory = APIRequestFactory()
+
+    def request(self):
+        request = APIView().initialize_request(self.factory.get('/api/assets/'))
+        force_authenticate(request, self.user)
+        request.user = self.user
+        return request
+
+    def allow(self, throttle_class, view=CheapView, now=1000.0):
+        throttle = throttle_class()
+        throttle.timer = lambda: now
+        return throttle.allow_request(self.request(), view()), throttle
+
+    def test_limit_is_shared_between_throttle_instances(self):
+        # Each call builds a new throttle, as separate workers would
+        results = [self.allow(UserSlidingWindowThrottle)[0] for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+        self.assertEqual(ThrottleCounter.objects.get(key__endswith=':16').count, 3)
+
+    def test_denied_requests_are_not_counted(self):
+        for _ in range(10):
+            self.allow(UserSlidingWindowThrottle, now=1000.0)
+        # Only the 3 allowed requests weigh on the next window: 3 * 1/6 + 2 <= 3
+        self.assertTrue(self.allow(UserSlidingWindowThrottle, now=1070.0)[0])
+        self.assertTrue(self.allow(UserSlidingWindowThrottle, now=1070.0)[0])
+        self.assertFalse(self.allow(UserSlidingWindowThrottle, now=1070.0)[0])
+
+    def test_backends_without_upsert(self):
+        with patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            results = [self.allow(UserSlidingWindowThrottle)[0] for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+        self.assertEqual(ThrottleCounter.objects.get(key__endswith=':16').count, 3)
+
+    def test_one_query_per_allowed_request(self):
+        self.allow(UserSlidingWindowThrottle)
+        with self.assertNumQueries(1):
+            self.assertTrue(self.allow(UserSlidingWindowThrottle)[0])
+
+    def test_previous_window_is_weighted(self):
+        for _ in range(3):
+            self.allow(UserSlidingWindowThrottle, now=1000.0)
+        # Halfway into the next window half of the previous 3 requests still count
+        allowed, _ = self.allow(UserSlidingWindowThrottle, now=1050.0)
+        self.assertTrue(allowed)
+        allowed, throttle = self.allow(UserSlidingWindowThrottle, now=1050.0)
+        self.assertFalse(allowed)
+        self.assertGreater(throttle.wait(), 0)
+
+    def test_scopes_have_independent_budgets(self):
+        self.assertTrue(self.allow(ScopedSlidingWindowThrottle, ExpensiveView)[0])
+        self.assertFalse(self.allow(ScopedSlidingWindowThrottle, ExpensiveView)[0])
+        self.assertTrue(self.allow(ScopedSlidingWindowThrottle, CheapView)[0])
+
+    def test_views_without_scope_are_not_scoped(self):
+        self.assertTrue(self.allow(ScopedSlidingWindowThrottle, APIView)[0])
+        self.assertFalse(ThrottleCounter.objects.exists())
+
+    @override_settings(THROTTLE_STORE='hierarchy.throttling.CacheCounterStore')
+    def test_cache_store(self):
+        cache.clear()
+        results = [self.allow(UserSlidingWindowThrottle)[0] for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+        self.assertFalse(ThrottleCounter.objects.exists())
+        self.assertEqual(cache.get(f"throttle:{self.allow(UserSlidingWindowThrottle)[1].key}:16"), 3)
@@ -0,0 +1,250 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from hierarchy import changes as change_feed
+from hierarchy import tree_index
+from hierarchy.models import Asset
+from hierarchy.tree_index import TreeIndex
+
+
+class TreeIndexTests(TestCase):
+    def setUp(self):
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization")
+        self.other_org = Asset.objects.create(asset_name="Other", asset_type="organization")
+        self.group = Asset.objects.create(asset_name="Group", asset_type="group", parent=self.org)
+        self.plant_a = Asset.objects.create(asset_name="Plant A", asset_type="plant", parent=self.group)
+        self.plant_b = Asset.objects.create(asset_name="Plant B", asset_type="plant", parent=self.group)
+        self.subgroup = Asset.objects.create(asset_name="Sub", asset_type="subgroup", parent=self.org)
+
+    def test_tree_queries(self):
+        index = TreeIndex.from_database()
+
+        self.assertEqual(len(index), 6)
+        self.assertEqual(
+            index.descendant_ids(self.org.pk),
+            [self.group.pk, self.plant_a.pk, self.plant_b.pk, self.subgroup.pk],
+        )
+        self.assertEqual(index.descendant_ids(self.org.pk, 'plant'), [self.plant_a.pk, self.plant_b.pk])
+        self.assertEqual(index.descendant_ids(self.org.pk, 'Rooms'), [])
+        self.assertEqual(index.ancestor_ids(self.plant_b.pk), [self.group.pk, self.org.pk])
+        self.assertTrue(index.is_ancestor(self.org.pk, self.plant_a.pk))
+        self.assertFalse(index.is_ancestor(self.plant_a.pk, self.org.pk))
+        self.assertFalse(index.is_ancestor(self.other_org.pk, self.plant_a.pk))
+        self.assertEqual(index.depth_of(self.plant_a.pk), 2)
+        self.assertEqual(index.lowest_common_ancestor(self.plant_a.pk, self.plant_b.pk), self.group.pk)
+        self.assertEqual(index.lowest_common_ancestor(self.plant_a.pk, self.subgroup.pk), self.org.pk)
+        self.assertIsNone(index.lowest_common_ancestor(self.plant_a.pk, self.other_org.pk))
+        self.assertNotIn(10**9, index)
+
+    def test_cycles_are_left_out(self):
+        index = TreeIndex.build([(1, None, 'organization'), (2, 3, 'group'), (3, 2, 'group')], version=(0, 0))
+        self.assertEqual(list(index.ids), [1])
+
+    def test_snapshot_round_trip(self):
+        index = TreeIndex.from_database()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'nested', 'tree.bin')
+            index.write(path)
+            loaded = TreeIndex.load(path)
+
+            self.assertEqual(TreeIndex.snapshot_version(path), index.version)
+            self.assertEqual(loaded.type_names, index.type_names)
+            for name, _ in TreeIndex.ARRAYS:
+                self.assertEqual(list(getattr(loaded, name)), list(getattr(index, name)))
+            self.assertEqual(loaded.ancestor_ids(self.plant_a.pk), [self.group.pk, self.org.pk])
+
+
+class TreeIndexRefreshTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        overrides = override_settings(
+            TREE_INDEX_ENABLED=True,
+            TREE_INDEX_PATH=os.path.join(self.tmp.name, 'tree.bin'),
+            TREE_INDEX_CHECK_INTERVAL=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        tree_index.reset()
+        self.addCleanup(tree_index.reset)
+
+        self.org = Asset.objects.create(asset_name="Org", asset_type="organization")
+        self.other_org = Asset.objects.create(asset_name="Other", asset_type="organization")
+        self.group = Asset.objects.create(asset_name="Group", asset_type="group", parent=self.org)
+        self.plant = Asset.objects.create(asset_name="Plant", asset_type="plant", parent=self.group)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("tester"))
+
+    def load_index(self):
+        """Write the snapshot as build_tree_index would and map it."""
+        tree_index.write_snapshot()
+        index = tree_index.get_index()
+        self.assertIsNotNone(index)
+        return index
+
+    def test_disabled_by_default(self):
+        with override_settings(TREE_INDEX_ENABLED=False):
+            self.assertIsNone(tree_index.get_index())
+
+    def test_no_snapshot_means_sql(self):
+        with mock.patch.object(TreeIndex, 'from_database') as from_database:
+            self.assertIsNone(tree_index.get_index())
+        from_database.assert_not_called()
+
+    def test_plain_updates_keep_the_snapshot(self):
+        first = self.load_index()
+        group = Asset.objects.get(pk=self.group.pk)
+        group.description = "renamed"
+        group.save()
+
+        second = tree_index.get_index()
+        self.assertIs(second, first)
+        self.assertEqual(second.version, change_feed.latest_position())
+        self.assertEqual(second.dirty_roots, set())
+        self.assertTrue(second.covers(self.plant.pk, self.org.pk))
+
+    def test_changes_mark_their_organizations(self):
+        third_org = Asset.objects.create(asset_name="Third", asset_type="organization")
+        first = self.load_index()
+        group = Asset.objects.get(pk=self.group.pk)
+        group.parent = self.other_org
+        group.save()
+
+        with mock.patch.object(TreeIndex, 'from_database') as from_database:
+            second = tree_index.get_index()
+        from_database.assert_not_called()
+        self.assertIs(second, first)
+        self.assertEqual(second.dirty_roots, {self.org.pk, self.other_org.pk})
+        self.assertFalse(second.covers(self.plant.pk, self.other_org.pk))
+        self.assertTrue(second.covers(third_org.pk, third_org.pk))
+
+        plant = Asset.objects.create(asset_name="New plant", asset_type="plant", parent=third_org)
+        self.assertIn(third_org.pk, tree_index.get_index().dirty_roots)
+        plant.delete()
+        self.assertEqual(tree_index.get_index().version, change_feed.latest_position())
+
+    def test_type_changes_mark_their_organization(self):
+        self.load_index()
+        plant = Asset.objects.get(pk=self.plant.pk)
+        plant.asset_type = "Rooms"
+        plant.save()
+        self.assertEqual(tree_index.get_index().dirty_roots, {self.org.pk})
+
+    def test_dirty_organizations_are_answered_from_sql(self):
+        self.load_index()
+        group = Asset.objects.get(pk=self.group.pk)
+        group.parent = self.other_org
+        group.save()
+
+        with mock.patch.object(TreeIndex, 'descendant_ids') as descendant_ids:
+            response = self.client.get(f"/api/assets/{self.other_org.pk}/children/")
+        descendant_ids.assert_not_called()
+        self.assertEqual([row["asset_name"] for row in response.json()], ["Group", "Plant"])
+        response = self.client.get(f"/api/assets/{self.plant.pk}/ancestors/?fields=asset_name")
+        self.assertEqual(response.json(), [{"asset_name": "Group"}, {"asset_name": "Other"}])
+
+    def test_newer_snapshot_is_mapped(self):
+        first = self.load_index()
+        group = Asset.objects.get(pk=self.group.pk)
+        group.parent = self.other_org
+        group.save()
+        self.assertTrue(tree_index.get_index().dirty_roots)
+
+        tree_index.write_snapshot(only_if_stale=True)
+        second = tree_index.get_index()
+        self.assertIsNot(second, first)
+        self.assertEqual(second.dirty_roots, set())
+        self.assertEqual(second.ancestor_ids(self.plant.pk), [self.group.pk, self.other_org.pk])
+
+    def test_too_many_pending_changes_fall_back_to_sql(self):
+        self.load_index()
+        Asset.objects.create(asset_name="Plant 2", asset_type="plant", parent=self.group)
+        Asset.objects.create(asset_name="Plant 3", asset_type="plant", parent=self.group)
+        with mock.patch.object(tree_index, 'MAX_PENDING', 1), \
+                mock.patch.object(TreeIndex, 'from_database') as from_database:
+            self.assertIsNone(tree_index.get_index())
+        from_database.assert_not_called()
+
+    def test_other_workers_map_the_written_snapshot(self):
+        first = self.load_index()
+        tree_index.reset()
+        with self.assertNumQueries(1):  # only the version check
+            second = tree_index.get_index()
+        self.assertEqual(list(second.ids), list(first.ids))
+
+    def test_endpoints_match_sql(self):
+        urls = [
+            f"/api/assets/{self.org.pk}/children/",
+            f"/api/assets/{self.org.pk}/children/?asset_type=plant&fields=id,asset_name",
+            f"/api/assets/{self.plant.pk}/ancestors/",
+            f"/api/assets/{self.plant.pk}/ancestors/?fields=asset_name",
+        ]
+        self.load_index()
+        indexed = [self.client.get(url).json() for url in urls]
+        with override_settings(TREE_INDEX_ENABLED=False):
+            from_sql = [self.client.get(url).json() for url in urls]
+
+        self.assertEqual(indexed, from_sql)
+        self.assertEqual([row["asset_name"] for row in indexed[0]], ["Group", "Plant"])
+        self.assertEqual(indexed[3], [{"asset_name": "Group"}, {"asset_name": "Org"}])
+
+    def test_falls_back_to_sql_while_another_thread_refreshes(self):
+        with tree_index._refresh_lock:
+            self.assertIsNone(tree_index.get_index())
+            response = self.client.get(f"/api/assets/{self.org.pk}/children/")
+        self.assertEqual([row["asset_name"] for row in response.json()], ["Group", "Plant"])
+
+    def test_children_order_matches_sql_when_names_and_ids_differ(self):
+        org = Asset.objects.create(asset_name="Zed", asset_type="organization")
+        beta = Asset.objects.create(asset_name="Beta", asset_type="group", parent=org)
+        alpha = Asset.objects.create(asset_name="Alpha", asset_type="group", parent=org)
+        Asset.objects.create(asset_name="Zulu", asset_type="plant", parent=alpha)
+        Asset.objects.create(asset_name="Yankee", asset_type="plant", parent=beta)
+        Asset.objects.create(asset_name="Able", asset_type="plant", parent=alpha)
+
+        url = f"/api/assets/{org.pk}/children/?fields=asset_name"
+        self.load_index()
+        indexed = self.client.get(url).json()
+        with override_settings(TREE_INDEX_ENABLED=False):
+            from_sql = self.client.get(url).json()
+
+        # Children by name, then each child's descendants in turn
+        expected = ["Alpha", "Beta", "Able", "Zulu", "Yankee"]
+        self.assertEqual([row["asset_name"] for row in from_sql], expected)
+        self.assertEqual(indexed, from_sql)
+
+
+class BuildTreeIndexCommandTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'tree.bin')
+        Asset.objects.create(asset_name="Org", asset_type="organization")
+
+    def test_build(self):
+        out = StringIO()
+        call_command('build_tree_index', path=self.path, stdout=out)
+        self.assertEqual(TreeIndex.snapshot_version(self.path), change_feed.latest_position())
+        self.assertIn("Indexed 1 assets", out.getvalue())
+
+    def test_watch_rebuilds_only_after_changes(self):
+        def sleep(seconds):
+            if sleep.calls == 1:
+                Asset.objects.create(asset_name="Other", asset_type="organization")
+            elif sleep.calls == 3:
+                raise KeyboardInterrupt
+            sleep.calls += 1
+        sleep.calls = 0
+
+        out = StringIO()
+        with mock.patch('time.sleep', side_effect=sleep), self.assertRaises(KeyboardInterrupt):
+            call_command('build_tree_index', path=self.path, watch=True, interval=0, stdout=out)
+        self.assertEqual(out.getvalue().count("Indexed"), 2)
+        self.assertEqual(len(TreeIndex.load(self.path)), 2)
@@ -0,0 +1,186 @@
+"""
+Sliding-window-counter throttles backed by a shared store.
+
+DRF's built-in throttles keep a list of request timestamps per client in the
+default cache (per-process locmem here), rewriting the whole list on every
+request, so limits are multiplied by the number of workers. These throttles
+keep two integer counters per client (current and previous window), bump the
+current one with an atomic increment in a shared store, and estimate the
+request rate over the last ``duration`` seconds as::
+
+    previous * (1 - elapsed / duration) + current
+
+Only allowed requests count: a denied request takes its increment back, so
+clients retrying while throttled don't push their own limit further out.
+
+Select the store with ``THROTTLE_STORE``. In production use
+``CacheCounterStore`` with a shared cache (Redis or Memcached, via
+``THROTTLE_CACHE_ALIAS``): it keeps the counters off the primary database.
+``DatabaseCounterStore`` (the default, since the default cache is
+per-process) costs one upsert per throttle on PostgreSQL and SQLite.
+"""
+
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+from rest_framework.throttling import AnonRateThrottle, ScopedRateThrottle, UserRateThrottle
+
+from .models import ThrottleCounter
+
+
+class DatabaseCounterStore:
+    # Fraction of new windows that also purge expired counters
+    cleanup_probability = 0.01
+
+    def hit(self, key, window, ttl):
+        """Increment the counter of ``window`` and return (current, previous) counts."""
+        current_key = f"{key}:{window}"
+        previous_key = f"{key}:{window - 1}"
+        now = time.time()
+        # Counters are read right after being written, so never from a replica
+        db = router.db_for_write(ThrottleCounter)
+        features = connections[db].features
+        if features.supports_update_conflicts_with_target and features.can_return_columns_from_insert:
+            current, previous = self._upsert(db, current_key, previous_key, now + ttl)
+        else:
+            current, previous = self._update_or_create(db, current_key, previous_key, now + ttl)
+
+        if current == 1 and random.random() < self.cleanup_probability:
+            # First hit of a new window
+            ThrottleCounter.objects.using(db).filter(expires_at__lt=now).delete()
+        return current, previous
+
+    def _upsert(self, db, current_key, previous_key, expires_at):
+        """One round trip: insert or increment, returning both counts."""
+        connection = connections[db]
+        quote = connection.ops.quote_name
+        table = quote(ThrottleCounter._meta.db_table)
+        key, count, expires = quote('key'), quote('count'), quote('expires_at')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({key}, {count}, {expires}) VALUES (%s, 1, %s) "
+                f"ON CONFLICT ({key}) DO UPDATE SET {count} = {table}.{count} + 1 "
+                f"RETURNING {count}, (SELECT {count} FROM {table} WHERE {key} = %s)",
+                [current_key, expires_at, previous_key],
+            )
+            current, previous = cursor.fetchone()
+        return current, previous or 0
+
+    def _update_or_create(self, db, current_key, previous_key, expires_at):
+        counters = ThrottleCounter.objects.using(db)
+        updated = counters.filter(key=current_key).update(count=F('count') + 1)
+        if not updated:
+            try:
+                with transaction.atomic(using=db):
+                    counters.create(key=current_key, count=1, expires_at=expires_at)
+            except IntegrityError:
+                # Another worker created the window first
+                counters.filter(key=current_key).update(count=F('count') + 1)
+
+        counts = dict(counters.filter(key__in=[current_key, previous_key]).values_list('key', 'count'))
+        return counts.get(current_key, 0), counts.get(previous_key, 0)
+
+    def undo(self, key, window):
+        """Take back the increment of a denied request."""
+        ThrottleCounter.objects.using(router.db_for_write(ThrottleCounter)).filter(
+            key=f"{key}:{window}", count__gt=0,
+        ).update(count=F('count') - 1)
+
+
+class CacheCounterStore:
+    cache_alias = 'default'
+
+    def hit(self, key, window, ttl):
+        cache = caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', self.cache_alias)]
+        current_key = f"throttle:{key}:{window}"
+        previous_key = f"throttle:{key}:{window - 1}"
+
+        cache.add(current_key, 0, timeout=ttl)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.add(current_key, 1, timeout=ttl)
+            current = 1
+        return current, cache.get(previous_key, 0)
+
+    def undo(self, key, window):
+        cache = caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', self.cache_alias)]
+        try:
+            cache.decr(f"throttle:{key}:{window}")
+        except ValueError:
+            pass  # already expired
+
+
+_stores = {}
+
+
+def get_store():
+    path = getattr(settings, 'THROTTLE_STORE', 'hierarchy.throttling.DatabaseCounterStore')
+    if path not in _stores:
+        _stores[path] = import_string(path)()
+    return _stores[path]
+
+
+class SlidingWindowMixin:
+    """Replaces SimpleRateThrottle's timestamp history with a sliding-window counter."""
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, offset = divmod(self.now, self.duration)
+        store = get_store()
+        current, previous = store.hit(self.key, int(window), ttl=2 * self.duration)
+
+        # wait() needs the counts as they would be with this request included
+        self.current, self.previous = current, previous
+        self.elapsed_fraction = offset / self.duration
+        estimate = previous * (1 - self.elapsed_fraction) + current
+        if estimate > self.num_requests:
+            store.undo(self.key, int(window))  # denied requests don't count
+            return self.throttle_failure()
+        return True
+
+    def wait(self):
+        remaining = self.duration * (1 - self.elapsed_fraction)
+        if self.current >= self.num_requests or not self.previous:
+            # Nothing left in this window: wait for the next one
+            return remaining
+        # Wait until enough of the previous window has slid out
+        needed = (self.previous + self.current - self.num_requests) / self.previous
+        return max(needed * self.duration - self.elapsed_fraction * self.duration, 0.0)
+
+
+class UserSlidingWindowThrottle(SlidingWindowMixin, UserRateThrottle):
+    pass
+
+
+class AnonSlidingWindowThrottle(SlidingWindowMixin, AnonRateThrottle):
+    pass
+
+
+class ScopedSlidingWindowThrottle(SlidingWindowMixin, ScopedRateThrottle):
+    """
+    Per-endpoint limits: views set ``throttle_scope`` (e.g. 'bulk_upload') and
+    get their own budget from THROTTLE_RATES, so expensive endpoints can't
+    starve cheap ones. Views without a scope are not limited by this class.
+    """
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
@@ -0,0 +1,363 @@
+"""
+In-process index of the asset tree for descendant/ancestor queries.
+
+The tree is flattened into pre-order: node ``i``'s subtree is the slice
+``i + 1 .. end[i] - 1``, so descendants, is-ancestor checks, depth and lowest
+common ancestor are array lookups. All arrays live in one snapshot file that
+every worker maps read-only, so N Gunicorn workers share a single copy in the
+page cache.
+
+Snapshots are written by ``manage.py build_tree_index --watch``, a process of
+its own, never by a serving worker. A snapshot carries the change-feed
+position it was built at. Every TREE_INDEX_CHECK_INTERVAL seconds (and right
+after a local commit) a worker maps a newer snapshot if there is one and
+applies the changes committed since, read in feed order (hierarchy/changes.py):
+creates, moves, deletes and type changes mark the organizations they touch
+as dirty. Assets under a dirty organization are answered from SQL (one
+partition, see migration 0013) until a snapshot includes the change; every
+other organization keeps using the index. Edits that leave the tree shape and
+types alone change nothing. With more than MAX_PENDING changes to apply, or
+no snapshot at all, ``get_index()`` returns None and all reads use SQL.
+"""
+
+import bisect
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.db import transaction
+
+from . import changes as change_feed
+from .models import Asset
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'TIDX'
+FORMAT_VERSION = 2
+# magic, format version, node count, change-feed position (xact_id, seq),
+# length of the type table
+HEADER = struct.Struct('<4sIQqqI')
+# Most changes a worker applies in one check; beyond that it answers from SQL
+# until build_tree_index maps a newer snapshot
+MAX_PENDING = 10_000
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+class TreeIndex:
+    """
+    Read-only tree over arrays indexed by pre-order position:
+
+    ``ids`` (asset id), ``parent`` (position, -1 for roots), ``end`` (one past
+    the last descendant), ``depth`` and ``types`` (index into
+    ``type_names``). ``sorted_ids``/``sorted_pos`` map ids to positions by
+    binary search, so no per-process dict is needed.
+
+    ``version`` is the change-feed position the index is current up to and
+    ``dirty_roots`` the organizations changed since the snapshot (built at
+    ``built_at``), whose part of the arrays may be out of date.
+    """
+
+    ARRAYS = (('ids', 'q'), ('sorted_ids', 'q'), ('sorted_pos', 'i'),
+              ('parent', 'i'), ('end', 'i'), ('depth', 'i'), ('types', 'b'))
+
+    def __init__(self, version, type_names, **arrays):
+        self.version = self.built_at = tuple(version)
+        self.dirty_roots = set()
+        self.type_names = list(type_names)
+        self._type_codes = {name: code for code, name in enumerate(self.type_names)}
+        for name, _ in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+    # -------------------- Construction --------------------
+    @classmethod
+    def build(cls, rows, version):
+        """Index ``(id, parent_id, asset_type)`` rows. Nodes on cycles are left out."""
+        children = {}
+        asset_types = {}
+        for asset_id, parent_id, asset_type in rows:
+            children.setdefault(parent_id, []).append(asset_id)
+            asset_types[asset_id] = asset_type
+        type_names = sorted(set(asset_types.values()))
+        type_codes = {name: code for code, name in enumerate(type_names)}
+
+        ids, parent, end, depth, types = (array(code) for code in 'qiiib')
+        # Roots, plus orphans whose parent row is missing
+        stack = [(asset_id, -1, 0) for parent_id, kids in children.items()
+                 if parent_id is None or parent_id not in asset_types for asset_id in kids]
+        stack.sort(reverse=True)
+        open_nodes = []  # positions whose subtree is still being emitted
+        while stack:
+            asset_id, parent_pos, level = stack.pop()
+            while open_nodes and depth[open_nodes[-1]] >= level:
+                end[open_nodes.pop()] = len(ids)
+            position = len(ids)
+            ids.append(asset_id)
+            parent.append(parent_pos)
+            end.append(0)
+            depth.append(level)
+            types.append(type_codes[asset_types[asset_id]])
+            open_nodes.append(position)
+            stack.extend((kid, position, level + 1) for kid in sorted(children.get(asset_id, ()), reverse=True))
+        for position in open_nodes:
+            end[position] = len(ids)
+
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        return cls(
+            version, type_names, ids=ids, parent=parent, end=end, depth=depth, types=types,
+            sorted_ids=array('q', (ids[i] for i in order)), sorted_pos=array('i', order),
+        )
+
+    @classmethod
+    def from_database(cls, using=None):
+        queryset = Asset.objects.using(using) if using else Asset.objects.all()
+        with transaction.atomic(using=queryset.db):
+            # Read the version first: rows may only be newer than it, never older
+            version = change_feed.latest_position(using=queryset.db)
+            rows = queryset.order_by().values_list('id', 'parent_id', 'asset_type').iterator(chunk_size=10_000)
+            return cls.build(rows, version)
+
+    # -------------------- Snapshot file --------------------
+    def write(self, path):
+        """Write the snapshot to ``path`` atomically (temp file + rename)."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        type_table = json.dumps(self.type_names).encode()
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tree_index.')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(self), *self.built_at, len(type_table)))
+                fh.write(type_table)
+                for name, _ in self.ARRAYS:
+                    fh.write(b'\0' * (_align(fh.tell()) - fh.tell()))
+                    fh.write(memoryview(getattr(self, name)).cast('B'))
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """Map a snapshot read-only; the arrays are views into the mapping."""
+        with open(path, 'rb') as fh:
+            buffer = memoryview(mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ))
+        magic, format_version, count, xact_id, seq, type_length = HEADER.unpack_from(buffer)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a tree index snapshot")
+        offset = HEADER.size
+        type_names = json.loads(bytes(buffer[offset:offset + type_length]))
+        offset += type_length
+
+        arrays = {}
+        for name, code in cls.ARRAYS:
+            offset = _align(offset)
+            size = struct.calcsize(code) * count
+            arrays[name] = buffer[offset:offset + size].cast(code)
+            offset += size
+        return cls((xact_id, seq), type_names, **arrays)
+
+    @staticmethod
+    def snapshot_version(path):
+        """Version stored in the snapshot header, or None if there is none."""
+        try:
+            with open(path, 'rb') as fh:
+                magic, format_version, _, xact_id, seq, _ = HEADER.unpack(fh.read(HEADER.size))
+        except (OSError, struct.error):
+            return None
+        return (xact_id, seq) if magic == MAGIC and format_version == FORMAT_VERSION else None
+
+    # -------------------- Queries --------------------
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, asset_id):
+        return self.position(asset_id) is not None
+
+    def position(self, asset_id):
+        i = bisect.bisect_left(self.sorted_ids, asset_id)
+        if i < len(self.sorted_ids) and self.sorted_ids[i] == asset_id:
+            return self.sorted_pos[i]
+        return None
+
+    def covers(self, asset_id, root_id):
+        """Whether the index answers exactly for ``asset_id`` in organization ``root_id``."""
+        return root_id not in self.dirty_roots and asset_id in self
+
+    def root_of(self, asset_id):
+        position = self.position(asset_id)
+        while self.parent[position] != -1:
+            position = self.parent[position]
+        return self.ids[position]
+
+    def asset_type(self, asset_id):
+        return self.type_names[self.types[self.position(asset_id)]]
+
+    def depth_of(self, asset_id):
+        return self.depth[self.position(asset_id)]
+
+    def descendant_ids(self, asset_id, asset_type=None):
+        """
+        Descendant ids in pre-order (siblings by id), optionally of one asset
+        type. The index holds no names: order rows by name with
+        ``models.descendant_order``.
+        """
+        start = self.position(asset_id)
+        ids = self.ids[start + 1:self.end[start]]
+        if asset_type is None:
+            return list(ids)
+        code = self._type_codes.get(asset_type)
+        types = self.types[start + 1:self.end[start]]
+        return [asset_id for asset_id, type_code in zip(ids, types) if type_code == code]
+
+    def ancestor_ids(self, asset_id):
+        """Ancestor ids from the parent up to the root."""
+        ancestors = []
+        position = self.parent[self.position(asset_id)]
+        while position != -1:
+            ancestors.append(self.ids[position])
+            position = self.parent[position]
+        return ancestors
+
+    def is_ancestor(self, ancestor_id, asset_id):
+        ancestor, position = self.position(ancestor_id), self.position(asset_id)
+        return ancestor < position < self.end[ancestor]
+
+    def lowest_common_ancestor(self, first_id, second_id):
+        """Deepest asset that is an ancestor of (or equal to) both, or None."""
+        first, second = self.position(first_id), self.position(second_id)
+        while self.depth[first] > self.depth[second]:
+            first = self.parent[first]
+        while self.depth[second] > self.depth[first]:
+            second = self.parent[second]
+        while first != second:
+            first, second = self.parent[first], self.parent[second]
+            if first == -1:
+                return None
+        return self.ids[first]
+
+
+# -------------------- Per-process index --------------------
+_index = None
+_checked_at = 0.0
+_refresh_lock = threading.Lock()
+
+
+def snapshot_path():
+    return str(getattr(settings, 'TREE_INDEX_PATH', os.path.join(settings.BASE_DIR, 'var', 'tree_index.bin')))
+
+
+def is_enabled():
+    return getattr(settings, 'TREE_INDEX_ENABLED', False)
+
+
+def mark_stale():
+    """Force a version check on the next ``get_index()`` (after local commits)."""
+    global _checked_at
+    _checked_at = 0.0
+
+
+def write_snapshot(path=None, only_if_stale=False):
+    """
+    Build the index from the database and write it to ``path`` while holding
+    an exclusive lock on ``<path>.lock``, so two builders never run at once.
+    With ``only_if_stale``, nothing is built when the snapshot already is at
+    the latest change. Returns the new index, or None if none was built.
+    """
+    path = path or snapshot_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f'{path}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if only_if_stale:
+            version = TreeIndex.snapshot_version(path)
+            if version is not None and version >= change_feed.latest_position():
+                return None
+        index = TreeIndex.from_database()
+        index.write(path)
+        return index
+
+
+def apply_changes(index, changes):
+    """
+    Mark the organizations touched by ``changes`` ((asset_id, operation)
+    pairs, in feed order) dirty in ``index``. Updates count only when they
+    changed the asset's type.
+    """
+    current = {
+        asset_id: (root_id or asset_id, asset_type)
+        for asset_id, root_id, asset_type in Asset.objects.filter(
+            id__in={asset_id for asset_id, operation in changes if operation != 'delete'}
+        ).values_list('id', 'root_id', 'asset_type')
+    }
+    for asset_id, operation in changes:
+        old_root = index.root_of(asset_id) if asset_id in index else None
+        new_root, asset_type = current.get(asset_id, (None, None))
+        if (
+            operation == 'update' and old_root is not None and old_root == new_root
+            and index.asset_type(asset_id) == asset_type
+        ):
+            continue
+        index.dirty_roots.update(root for root in (old_root, new_root) if root is not None)
+
+
+def refresh(index):
+    """
+    ``index``, or a newer snapshot, brought up to the latest change. None if
+    there is no snapshot or too many changes to apply (use SQL).
+    """
+    snapshot_version = TreeIndex.snapshot_version(snapshot_path())
+    if snapshot_version is not None and (index is None or snapshot_version > index.built_at):
+        index = TreeIndex.load(snapshot_path())
+    if index is None:
+        return None
+
+    pending = list(
+        change_feed.after(index.version).order_by('xact_id', 'seq')
+        .values_list('xact_id', 'seq', 'asset_id', 'operation')[:MAX_PENDING + 1]
+    )
+    if len(pending) > MAX_PENDING:
+        logger.info("Tree index is more than %d changes behind; reads use SQL until the next snapshot", MAX_PENDING)
+        return None
+    if pending:
+        apply_changes(index, [(asset_id, operation) for _, _, asset_id, operation in pending])
+        index.version = pending[-1][:2]
+    return index
+
+
+def get_index():
+    """
+    The process-wide index if enabled and mapped, else None (use SQL). Check
+    ``covers()`` before answering from it. Only one thread checks for
+    changes; the others fall back instead of waiting.
+    """
+    global _index, _checked_at
+    if not is_enabled():
+        return None
+    interval = getattr(settings, 'TREE_INDEX_CHECK_INTERVAL', 1.0)
+    if _index is not None and time.monotonic() - _checked_at < interval:
+        return _index
+    if not _refresh_lock.acquire(blocking=False):
+        return None
+    try:
+        _index = refresh(_index)
+        _checked_at = time.monotonic()
+        return _index
+    finally:
+        _refresh_lock.release()
+
+
+def reset():
+    """Drop the process-wide index (tests, after rewriting the snapshot)."""
+    global _index, _checked_at
+    _index, _checked_at = None, 0.0
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AssetViewSet, liveness, readiness, SampleView, BulkUploadView
+from .views import AssetViewSet, liveness, readiness, SampleView, BulkUploadView, ProfileListView, ProfileDetailView
 
 app_name = 'hierarchy'
 
@@ -18,6 +18,10 @@ urlpatterns = [
     path('health/liveness/', liveness, name='liveness'),
     path('health/readiness/', readiness, name='readiness'),
 
+    # Request profiles (admins only)
+    path('profiles/', ProfileListView.as_view(), name='profile-list'),
+    path('profiles/<int:profile_id>/', ProfileDetailView.as_view(), name='profile-detail'),
+
     # Sample view
     path('sample/', SampleView.as_view(), name='sample'),
 ]
@@ -1,6 +1,5 @@
-import csv
-import io
 import logging
+from operator import itemgetter
 
 from django.db import connections
 from django.db.utils import OperationalError
@@ -8,14 +7,20 @@ from django.http import JsonResponse, Http404
 
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from opentelemetry import trace
 
-from .models import Asset
-from .serializers import AssetSerializer
+from . import changes as change_feed
+from . import profiling, tree_index
+from .filters import AssetFilter
+from .pagination import KeysetPaginator
+from .ingest import IngestError, ingest_rows, parallel_ingest, read_csv_rows
+from .models import ArchivedAsset, Asset, descendant_order, fetch_values
+from .serializers import AssetSerializer, AssetReadSerializer
 from .permissions import IsOwnerOrReadOnly
 
 # Logger and Tracer
@@ -27,10 +32,107 @@ tracer = trace.get_tracer(__name__)
 class AssetViewSet(viewsets.ModelViewSet):
     serializer_class = AssetSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
+    throttle_scope = 'assets'
 
     def get_queryset(self):
-        # Only return top-level organizations
-        return Asset.objects.filter(asset_type='organization')
+        if self.action in ('list', 'ancestors'):
+            # list narrows the queryset with AssetFilter (organizations by default)
+            queryset = Asset.objects.all()
+        else:
+            # Only return top-level organizations
+            queryset = Asset.objects.filter(asset_type='organization')
+            if str(self.kwargs.get('pk', '')).isdigit():
+                # An organization is its own root: prune to its partition
+                queryset = queryset.filter(root_id=self.kwargs['pk'])
+        fields = self.get_requested_fields()
+        if fields is not None and self.action == 'retrieve':
+            # Never read unrequested columns such as description
+            queryset = queryset.only(*fields)
+        return queryset
+
+    def get_requested_fields(self):
+        """
+        Sparse fieldsets: ``?fields=id,asset_name`` keeps only the listed
+        fields, ``?exclude=description`` drops fields. Returns None when the
+        full representation is wanted.
+        """
+        if hasattr(self, '_requested_fields'):
+            return self._requested_fields
+
+        available = AssetSerializer.Meta.fields
+        include = self.request.query_params.get('fields')
+        exclude = self.request.query_params.get('exclude')
+        fields = None
+        if include or exclude:
+            include = [name.strip() for name in include.split(',') if name.strip()] if include else available
+            exclude = {name.strip() for name in exclude.split(',') if name.strip()} if exclude else set()
+            unknown = sorted((set(include) | exclude) - set(available))
+            if unknown:
+                raise ValidationError({"fields": [f"Unknown field(s): {', '.join(unknown)}"]})
+            fields = [name for name in available if name in include and name not in exclude]
+
+        self._requested_fields = fields
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request.method == 'GET':
+            kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def include_archived(self):
+        """``?include_archived=true``: audits also see rows moved to ArchivedAsset."""
+        return self.request.query_params.get('include_archived', '').lower() in ('true', '1')
+
+    def list(self, request, *args, **kwargs):
+        """
+        Filter with ?asset_type, ?is_active, ?root and date ranges; see
+        hierarchy/filters.py. With ?include_archived=true archived assets
+        follow the live ones and every row carries an "archived" flag.
+
+        The plain organization list is a bare list. Broader lists (and any
+        request with ?limit or ?cursor) are paginated by (asset_name, id) as
+        {"results", "has_more", "next_cursor"}; see hierarchy/pagination.py.
+        With ?facets=asset_type,is_active the response is an object with
+        "count" and "facets" as well.
+        Example:
+            /api/assets/?asset_type=plant&is_active=true&facets=asset_type&limit=100
+        """
+        asset_filter = AssetFilter(request.query_params)
+        queryset = self.filter_queryset(self.get_queryset())
+        reader = AssetReadSerializer(self.get_requested_fields())
+        archived = ArchivedAsset.objects.all() if self.include_archived() else None
+        sources = [queryset] if archived is None else [queryset, archived]
+        sources = [source.filter(asset_filter.combined()) for source in sources]
+
+        body = {}
+        if asset_filter.broad or archived is not None or KeysetPaginator.requested(request.query_params):
+            pages, body["has_more"], body["next_cursor"] = (
+                KeysetPaginator(request.query_params).paginate(sources, reader)
+            )
+        else:
+            # Read-only fast path: serialize straight from values_list() tuples
+            pages = [reader.serialize(source) for source in sources]
+
+        results = pages[0]
+        if archived is not None:
+            for row in results:
+                row["archived"] = False
+            for row in pages[1]:
+                row["archived"] = True
+            results += pages[1]
+
+        if not asset_filter.facets:
+            return Response({"results": results, **body} if body else results)
+
+        facets = asset_filter.facet_counts(queryset)
+        if archived is not None:
+            for name, counts in asset_filter.facet_counts(archived).items():
+                if name == 'count':
+                    facets[name] += counts
+                else:
+                    for value, count in counts.items():
+                        facets[name][value] += count
+        return Response({"count": facets.pop('count'), "facets": facets, "results": results, **body})
 
     def retrieve(self, request, *args, **kwargs):
         """Custom 404 message for organization lookup"""
@@ -39,6 +141,11 @@ class AssetViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(instance)
             return Response(serializer.data)
         except Http404:
+            if self.include_archived() and str(kwargs['pk']).isdigit():
+                archived = ArchivedAsset.objects.filter(pk=kwargs['pk'], asset_type='organization')
+                rows = AssetReadSerializer(self.get_requested_fields()).serialize(archived)
+                if rows:
+                    return Response({**rows[0], "archived": True})
             return Response(
                 {
                     "success": False,
@@ -74,27 +181,83 @@ class AssetViewSet(viewsets.ModelViewSet):
 
         asset_type = request.query_params.get('asset_type', None)
 
-        # Recursive function to get all descendants
-        def get_all_descendants(asset):
-            descendants = list(asset.children.all())
-            for child in asset.children.all():
-                descendants.extend(get_all_descendants(child))
-            return descendants
-
-        all_children = get_all_descendants(parent)
+        reader = AssetReadSerializer(self.get_requested_fields())
+        columns = reader.query_columns('id', 'parent_id', 'asset_type')
+        index = tree_index.get_index()
+        if index is not None and index.covers(parent.pk, parent.root_id):
+            # One query for the whole subtree, ordered as get_descendants() orders it
+            subtree = Asset.objects.filter(root_id=parent.root_id, id__in=index.descendant_ids(parent.pk))
+            rows = descendant_order(
+                parent.pk, fetch_values(subtree.order_by('asset_name', 'id'), columns),
+                itemgetter(columns.index('id')), itemgetter(columns.index('parent_id')),
+            )
+        else:
+            rows = parent.get_descendants(*columns)
 
         if asset_type:
-            all_children = [child for child in all_children if child.asset_type == asset_type]
+            type_index = columns.index('asset_type')
+            rows = [row for row in rows if row[type_index] == asset_type]
+
+        return Response(reader.serialize_rows(rows))
+
+    @action(detail=True, methods=['get'], url_path='ancestors')
+    def ancestors(self, request, pk=None):
+        """
+        Retrieve the ancestors of any asset, from its parent up to the root.
+        Example:
+            /api/assets/57/ancestors/?fields=id,asset_name
+        """
+        asset = self.get_object()
+        reader = AssetReadSerializer(self.get_requested_fields())
+
+        index = tree_index.get_index()
+        if index is not None and index.covers(asset.pk, asset.root_id):
+            rows = self.fetch_in_order(index.ancestor_ids(asset.pk), reader.query_columns('id'), asset.root_id)
+        else:
+            rows = asset.get_ancestors(*reader.query_columns('id', 'parent_id'))
+        return Response(reader.serialize_rows(rows))
+
+    @staticmethod
+    def fetch_in_order(ids, columns, root_id):
+        """One query for the rows of ``ids`` (all below ``root_id``), returned in the order of ``ids``."""
+        if not ids:
+            return []
+        id_index = columns.index('id')
+        queryset = Asset.objects.filter(root_id=root_id, id__in=ids).order_by()
+        rows = {row[id_index]: row for row in fetch_values(queryset, columns)}
+        return [rows[pk] for pk in ids if pk in rows]
+
+
+    @action(detail=False, methods=['get'], url_path='changes')
+    def changes(self, request):
+        """
+        Delta sync: assets changed after ?since=<cursor> (default 0, the
+        beginning), newest state only, with "asset": null tombstones for
+        deleted ones. Optional: ?limit=<n> (default 500, max 5000) and
+        ?wait=<seconds> to long-poll until a change exists. Continue from the
+        returned "cursor".
+        Example:
+            /api/assets/changes/?since=81342.1042&wait=25
+        """
+        since = change_feed.decode_cursor(request.query_params.get('since'))
+        try:
+            limit = min(max(int(request.query_params.get('limit', 500)), 1), 5000)
+            wait = min(max(float(request.query_params.get('wait', 0)), 0), change_feed.max_wait())
+        except ValueError:
+            raise ValidationError({"detail": "limit and wait must be numbers"})
 
-        serializer = self.get_serializer(all_children, many=True)
-        return Response(serializer.data)
+        if wait:
+            change_feed.wait_for_changes(since, wait)
+
+        reader = AssetReadSerializer(self.get_requested_fields())
+        return Response(change_feed.build_feed(since, limit, reader))
 
 
 # -------------------- Health Probes --------------------
 def liveness(request):
     with tracer.start_as_current_span("liveness_probe") as span:
         trace_id = format(span.get_span_context().trace_id, '032x')
-        logger.info(f"[trace_id={trace_id}] Liveness check")
+        logger.info("[trace_id=%s] Liveness check", trace_id, extra={"trace_id": trace_id})
         return JsonResponse({"status": "alive"})
 
 
@@ -105,10 +268,10 @@ def readiness(request):
         try:
             with tracer.start_as_current_span("db_readiness_check"):
                 db_conn.cursor()
-            logger.info(f"[trace_id={trace_id}] Readiness check passed")
+            logger.info("[trace_id=%s] Readiness check passed", trace_id, extra={"trace_id": trace_id})
             return JsonResponse({"status": "ready"})
         except OperationalError:
-            logger.warning(f"[trace_id={trace_id}] Readiness check failed")
+            logger.warning("[trace_id=%s] Readiness check failed", trace_id, extra={"trace_id": trace_id})
             return JsonResponse({"status": "not ready"}, status=503)
 
 
@@ -116,7 +279,7 @@ def readiness(request):
 def home(request):
     with tracer.start_as_current_span("home") as span:
         trace_id = format(span.get_span_context().trace_id, '032x')
-        logger.info(f"[trace_id={trace_id}] Home page accessed")
+        logger.info("[trace_id=%s] Home page accessed", trace_id, extra={"trace_id": trace_id})
         return JsonResponse({
             "message": "Welcome to the new_api application",
             "status": "alive",
@@ -137,11 +300,32 @@ class SampleView(APIView):
             return Response(result)
 
 
+# -------------------- Request Profiles --------------------
+class ProfileListView(APIView):
+    """Request profiles captured by this worker process, newest first."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(profiling.list_profiles())
+
+
+class ProfileDetailView(APIView):
+    """CPU and memory detail of one captured request profile."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, profile_id):
+        profile = profiling.get_profile(profile_id)
+        if profile is None:
+            return Response({"detail": "Profile not found in this worker"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(profile)
+
+
 # -------------------- Bulk Upload API --------------------
 class BulkUploadView(APIView):
     """
     Handles bulk upload of assets via JSON or CSV files with proper parent-child hierarchy.
     """
+    throttle_scope = 'bulk_upload'
 
     def post(self, request, *args, **kwargs):
         # ---------------- JSON Upload ----------------
@@ -154,55 +338,38 @@ class BulkUploadView(APIView):
         if not file:
             return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
 
-        decoded_file = file.read().decode('utf-8')
-        io_string = io.StringIO(decoded_file)
-        reader = csv.DictReader(io_string)
-        data = list(reader)
-
-        # Convert empty strings to None
-        for row in data:
-            for k, v in row.items():
-                if v == "":
-                    row[k] = None
-
-        return self.handle_bulk_upload(data)
+        return self.handle_bulk_upload(read_csv_rows(file))
 
     def handle_bulk_upload(self, data):
         """
-        Handles bulk creation in order of hierarchy
+        Handles bulk creation in order of hierarchy.
+        With ?parallel=true, subtrees are ingested as independent partitions
+        that succeed or fail on their own. They run in this request; only the
+        bulk_ingest command spreads them over worker processes.
         """
-        created_assets = {}  # Maps asset_name -> Asset instance
-
-        # First pass: create top-level assets (organization)
-        top_level = [d for d in data if d.get('asset_type') == 'organization']
-        for d in top_level:
-            d['parent'] = None
-            serializer = AssetSerializer(data=d)
-            if serializer.is_valid():
-                asset = serializer.save()
-                created_assets[asset.asset_name] = asset
-            else:
-                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-        # Second pass: create child assets
-        children = [d for d in data if d.get('asset_type') != 'organization']
-        for d in children:
-            parent_name = d.get('parent')  # parent should be asset_name now
-            parent_asset = created_assets.get(parent_name)
-            if not parent_asset:
-                return Response(
-                    {"error": f"Parent '{parent_name}' not found. Upload parents first."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            d['parent'] = parent_asset.id
-            serializer = AssetSerializer(data=d)
-            if serializer.is_valid():
-                asset = serializer.save()
-                created_assets[asset.asset_name] = asset
-            else:
-                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if self.request.query_params.get('parallel', '').lower() in ('true', '1'):
+            return self.handle_parallel_upload(data)
+        try:
+            created_assets = ingest_rows(data)
+        except IngestError as exc:
+            return Response(exc.detail, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(
             {"message": "Bulk upload successful", "count": len(created_assets)},
             status=status.HTTP_201_CREATED
         )
+
+    def handle_parallel_upload(self, data):
+        """Merged per-partition result; 207 when some partitions failed and were rolled back."""
+        try:
+            result = parallel_ingest(data, processes=False)
+        except IngestError as exc:
+            return Response(exc.detail, status=status.HTTP_400_BAD_REQUEST)
+
+        failed = [partition for partition in result["partitions"] if "error" in partition]
+        if failed:
+            return Response(
+                {"message": f"{len(failed)} of {len(result['partitions'])} partition(s) failed", **result},
+                status=status.HTTP_207_MULTI_STATUS
+            )
+        return Response({"message": "Bulk upload successful", **result}, status=status.HTTP_201_CREATED)
@@ -7,6 +7,10 @@ import sys
 def main():
     """Run administrative tasks."""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'new_api.settings')
+    # Only the development server traces by default; migrations, shells and
+    # the test runner skip the OpenTelemetry bootstrap to start faster.
+    if 'runserver' not in sys.argv[1:2]:
+        os.environ.setdefault('TELEMETRY_ENABLED', 'False')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -4,10 +4,6 @@ Django settings for asset_tracking project.
 
 from pathlib import Path
 import os
-from opentelemetry import trace
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import SimpleSpanProcessor, ConsoleSpanExporter
 from decouple import config
 
 # Build paths
@@ -48,6 +44,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'hierarchy.middleware.RequestTracingMiddleware',
+    'hierarchy.middleware.ReplicaPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'new_api.urls'
@@ -78,9 +75,76 @@ DATABASES = {
         "PASSWORD": config("DB_PASSWORD", default="new_api_password"),
         "HOST": config("DB_HOST", default="db"),  # <-- change here
         "PORT": config("DB_PORT", default="5432"),
+        # Keep connections open between requests instead of reconnecting
+        # every time; health checks drop connections the server has closed.
+        "CONN_MAX_AGE": config("DB_CONN_MAX_AGE", default=60, cast=int),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {},
     }
 }
 
+# Optional server-side pooling (psycopg 3 with psycopg-pool, see requirements.txt).
+# Each worker process keeps its own pool, so the total number of connections
+# is roughly GUNICORN_WORKERS * DB_POOL_MAX_SIZE.
+if config("DB_POOL_ENABLED", default=False, cast=bool):
+    DATABASES["default"]["CONN_MAX_AGE"] = 0  # pooling and persistent connections are exclusive
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": config("DB_POOL_MIN_SIZE", default=2, cast=int),
+        "max_size": config("DB_POOL_MAX_SIZE", default=10, cast=int),
+        "timeout": config("DB_POOL_TIMEOUT", default=10, cast=float),  # seconds to wait for a free connection
+    }
+
+# Read replicas: comma-separated hosts, exposed as aliases replica_1, replica_2, ...
+# Hierarchy reads are spread across healthy replicas; see hierarchy/db_routers.py.
+DATABASE_REPLICAS = []
+for _index, _host in enumerate(config("DB_REPLICA_HOSTS", default="").split(","), start=1):
+    if not _host.strip():
+        continue
+    _alias = f"replica_{_index}"
+    DATABASES[_alias] = {
+        **DATABASES["default"],
+        "HOST": _host.strip(),
+        # Bounds how long a health check waits for a replica that is down
+        "OPTIONS": {
+            **DATABASES["default"]["OPTIONS"],
+            "connect_timeout": config("REPLICA_CONNECT_TIMEOUT", default=3, cast=int),
+        },
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(_alias)
+
+DATABASE_ROUTERS = ['hierarchy.db_routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=5, cast=int)
+REPLICA_HEALTH_CHECK_INTERVAL = config("REPLICA_HEALTH_CHECK_INTERVAL", default=10, cast=int)
+
+# Longest long-poll a /api/assets/changes/?wait= request may hold a worker thread
+CHANGE_FEED_MAX_WAIT = config("CHANGE_FEED_MAX_WAIT", default=30, cast=int)
+# Days of superseded changes and tombstones kept by `manage.py prune_changes`
+CHANGE_FEED_RETENTION_DAYS = config("CHANGE_FEED_RETENTION_DAYS", default=30, cast=int)
+
+# Per-worker tree index for descendant/ancestor reads (see hierarchy/tree_index.py).
+# Workers share one mmap'd snapshot and never build it: run
+# `manage.py build_tree_index --watch` as a separate process.
+TREE_INDEX_ENABLED = config("TREE_INDEX_ENABLED", default=False, cast=bool)
+TREE_INDEX_PATH = config("TREE_INDEX_PATH", default=str(BASE_DIR / "var" / "tree_index.bin"))
+TREE_INDEX_CHECK_INTERVAL = config("TREE_INDEX_CHECK_INTERVAL", default=1.0, cast=float)
+
+# Processes used by ?parallel=true bulk uploads and `manage.py bulk_ingest` (0 = CPU count)
+BULK_INGEST_WORKERS = config("BULK_INGEST_WORKERS", default=0, cast=int)
+
+# Per-request CPU/memory profiling (see hierarchy/profiling.py): requests sending
+# `X-Profile: <PROFILING_TOKEN>` or picked by the sample rate are profiled.
+PROFILING_TOKEN = config("PROFILING_TOKEN", default="")
+PROFILING_SAMPLE_RATE = config("PROFILING_SAMPLE_RATE", default=0.0, cast=float)
+PROFILING_BUFFER_SIZE = config("PROFILING_BUFFER_SIZE", default=50, cast=int)
+PROFILING_TOP_N = config("PROFILING_TOP_N", default=25, cast=int)
+
+# Throttle counters live in a store shared by all workers (see hierarchy/throttling.py).
+# In production use "hierarchy.throttling.CacheCounterStore" with a shared
+# cache (Redis/Memcached in CACHES), so throttling costs no database round trips.
+THROTTLE_STORE = config("THROTTLE_STORE", default="hierarchy.throttling.DatabaseCounterStore")
+THROTTLE_CACHE_ALIAS = config("THROTTLE_CACHE_ALIAS", default="default")
+
 
 
 # Password validation
@@ -107,6 +171,17 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 
 # Logging setup
+LOG_DIR = BASE_DIR / 'logs'
+LOG_FORMAT = config('LOG_FORMAT', default='json')           # json | text
+LOG_ASYNC = config('LOG_ASYNC', default=True, cast=bool)      # queue + background writer thread
+LOG_REQUESTS = config('LOG_REQUESTS', default=False, cast=bool)  # per-request INFO lines
+LOG_REQUEST_RATE = config('LOG_REQUEST_RATE', default=50, cast=float)  # max request lines/second
+LOG_REQUEST_SAMPLE = config('LOG_REQUEST_SAMPLE', default=1.0, cast=float)  # fraction kept
+
+LOG_DIR.mkdir(exist_ok=True)
+_LOG_HANDLERS = ['async'] if LOG_ASYNC else ['console', 'file']
+_LOG_FORMATTER = 'json' if LOG_FORMAT == 'json' else 'verbose'
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -115,85 +190,98 @@ LOGGING = {
             'format': '[{asctime}] {levelname} in {name}: {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'hierarchy.logging_utils.JSONFormatter',
+        },
+    },
+    'filters': {
+        'request_rate_limit': {
+            '()': 'hierarchy.logging_utils.RateLimitFilter',
+            'rate': LOG_REQUEST_RATE,
+            'sample': LOG_REQUEST_SAMPLE,
+        },
     },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'formatter': _LOG_FORMATTER,
         },
         'file': {
             'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'logs/api_errors.log',
-            'formatter': 'verbose',
+            'filename': LOG_DIR / 'api_errors.log',
+            'formatter': _LOG_FORMATTER,
+            'delay': True,
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': _LOG_HANDLERS,
             'level': 'INFO',
         },
         'hierarchy': {
-            'handlers': ['console', 'file'],
+            'handlers': _LOG_HANDLERS,
             'level': 'WARNING',
             'propagate': False,
         },
+        'hierarchy.middleware': {
+            'handlers': _LOG_HANDLERS,
+            'level': 'INFO' if LOG_REQUESTS else 'WARNING',
+            'filters': ['request_rate_limit'],
+            'propagate': False,
+        },
     },
 }
 
+if LOG_ASYNC:
+    # Only built when used: it starts a background writer thread
+    LOGGING['handlers']['async'] = {
+        '()': 'hierarchy.logging_utils.QueueListenerHandler',
+        'filename': str(LOG_DIR / 'api_errors.log'),
+        'json_format': LOG_FORMAT == 'json',
+    }
 
-from opentelemetry import trace
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.exporter.jaeger.thrift import JaegerExporter
-from opentelemetry.instrumentation.django import DjangoInstrumentor
-from opentelemetry.instrumentation.requests import RequestsInstrumentor
-from opentelemetry.instrumentation.psycopg2 import Psycopg2Instrumentor
-
-# Create a TracerProvider with a service name
-trace.set_tracer_provider(
-    TracerProvider(
-        resource=Resource.create({"service.name": "asset_tracking_api"})
-    )
-)
-
-tracer_provider = trace.get_tracer_provider()
-
-# Configure Jaeger exporter
-jaeger_exporter = JaegerExporter(
-    agent_host_name="jaeger",  # Jaeger agent host
-    agent_port=6831,              # Jaeger agent port (default 6831)
-)
 
-# Add BatchSpanProcessor to tracer
-tracer_provider.add_span_processor(
-    BatchSpanProcessor(jaeger_exporter)
-)
+# Tracing (configured lazily in HierarchyConfig.ready(), see hierarchy/telemetry.py)
+TELEMETRY_ENABLED = config('TELEMETRY_ENABLED', default=True, cast=bool)
+TELEMETRY_EXPORTER = config('TELEMETRY_EXPORTER', default='jaeger')  # jaeger | otlp | console | none
+TELEMETRY_SERVICE_NAME = config('TELEMETRY_SERVICE_NAME', default='asset_tracking_api')
+JAEGER_AGENT_HOST = config('JAEGER_AGENT_HOST', default='jaeger')
+JAEGER_AGENT_PORT = config('JAEGER_AGENT_PORT', default=6831, cast=int)
+OTLP_TRACES_ENDPOINT = config('OTLP_TRACES_ENDPOINT', default='http://localhost:4318/v1/traces')
 
-# Instrument Django, Requests, PostgreSQL
-DjangoInstrumentor().instrument()
-RequestsInstrumentor().instrument()
-Psycopg2Instrumentor().instrument()
 
 
+# Token/Basic credentials are cached in-process (see hierarchy/authentication.py)
+AUTH_CACHE_TTL = config('AUTH_CACHE_TTL', default=60, cast=int)
+AUTH_CACHE_MAXSIZE = config('AUTH_CACHE_MAXSIZE', default=10000, cast=int)
+# Shared cache (Redis/Memcached in CACHES) holding the auth version every
+# worker checks on a hit, so invalidations reach all workers at once
+AUTH_CACHE_ALIAS = config('AUTH_CACHE_ALIAS', default='default')
+BASIC_AUTH_ENABLED = config('BASIC_AUTH_ENABLED', default=True, cast=bool)
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'hierarchy.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication', 
-    ],
+    ] + (['hierarchy.authentication.CachedBasicAuthentication'] if BASIC_AUTH_ENABLED else []),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.UserRateThrottle',  # per-user limit
-        'rest_framework.throttling.AnonRateThrottle',  # anonymous users
+        'hierarchy.throttling.UserSlidingWindowThrottle',   # per-user limit
+        'hierarchy.throttling.AnonSlidingWindowThrottle',   # anonymous users
+        'hierarchy.throttling.ScopedSlidingWindowThrottle', # per-endpoint limit (view.throttle_scope)
     ],
     'DEFAULT_THROTTLE_RATES': {
         'user': '1000/day',   # logged-in users: 1000 requests per day
         'anon': '100/day',    # anonymous users: 100 requests per day
+        'assets': config('THROTTLE_RATE_ASSETS', default='300/minute'),
+        'bulk_upload': config('THROTTLE_RATE_BULK_UPLOAD', default='20/hour'),
     },
+    'DEFAULT_RENDERER_CLASSES': [
+        'hierarchy.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'EXCEPTION_HANDLER': 'hierarchy.exception_handler.custom_exception_handler',
 }
 